@@ -8,7 +8,15 @@ from PIL import Image
 import os
 import datetime
 import decimal
+import hashlib
+import json
 import logging
+import tempfile
+import threading
+import time
+import MySQLdb
+
+MYSQL_DUPLICATE_ENTRY = 1062 # ER_DUP_ENTRY, raised by uq_bookings_confirmed_seat (db/migrations/005_seat_holds.sql)
 
 app = Flask(__name__)
 CORS(app) # Enable Cross-Origin Requests
@@ -39,6 +47,99 @@ UPLOAD_FOLDER = '/app/visa_uploads' # Absolute path INSIDE the Docker container
 os.makedirs(UPLOAD_FOLDER, exist_ok=True) # Create the directory if it doesn't exist inside the container
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.logger.info(f"Upload folder set to: {UPLOAD_FOLDER}")
+# Uploads are OCRed straight from the request stream; they are only written to UPLOAD_FOLDER when kept:
+# 'none', 'failed' (mismatches and errors) or 'all'
+VISA_UPLOAD_RETENTION = os.environ.get('VISA_UPLOAD_RETENTION', 'none')
+
+# --- Retained Visa Documents ---
+# Kept uploads go into the visa-service document store layout (services/visa_service/document_store.py),
+# so both apps share one store and its `import` / `sweep` commands work on it:
+#     <store>/objects/ab/cd/<sha256>        the file, named by content hash (one copy per content)
+#     <store>/objects/ab/cd/<sha256>.json   a record per retention: filename, time, status, owner
+# Storing a file again renews its expiry (the file's mtime); files not stored again within
+# VISA_DOCUMENT_RETENTION_DAYS are deleted by a sweep every VISA_DOCUMENT_SWEEP_SECONDS.
+VISA_DOCUMENT_STORE_DIR = os.environ.get('VISA_DOCUMENT_STORE_DIR', os.path.join(UPLOAD_FOLDER, 'store'))
+VISA_DOCUMENT_TTL_SECONDS = float(os.environ.get('VISA_DOCUMENT_RETENTION_DAYS', '30')) * 86400
+VISA_DOCUMENT_SWEEP_SECONDS = int(os.environ.get('VISA_DOCUMENT_SWEEP_SECONDS', '3600'))
+VISA_DOCUMENT_MAX_RECORDS = 50 # Same as document_store.MAX_RECORDS
+visa_documents_lock = threading.Lock()
+os.makedirs(os.path.join(VISA_DOCUMENT_STORE_DIR, 'objects'), exist_ok=True)
+os.makedirs(os.path.join(VISA_DOCUMENT_STORE_DIR, 'tmp'), exist_ok=True)
+
+
+def store_visa_document(stream, filename, status):
+    """Stores an upload by its SHA-256 (once per content) and records this retention; returns the path."""
+    tmp_dir = os.path.join(VISA_DOCUMENT_STORE_DIR, 'tmp')
+    digest = hashlib.sha256()
+    size = 0
+    handle, tmp_path = tempfile.mkstemp(dir=tmp_dir) # Hashed while copied, so the stream is read once
+    try:
+        with os.fdopen(handle, 'wb') as tmp:
+            for chunk in iter(lambda: stream.read(64 * 1024), b''):
+                digest.update(chunk)
+                size += len(chunk)
+                tmp.write(chunk)
+        digest = digest.hexdigest()
+        blob = os.path.join(VISA_DOCUMENT_STORE_DIR, 'objects', digest[:2], digest[2:4], digest)
+        now = int(time.time())
+        with visa_documents_lock:
+            if os.path.exists(blob):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(tmp_path, blob)
+            os.utime(blob) # Renews the expiry
+            try:
+                with open(f"{blob}.json", 'r', encoding='utf-8') as meta_file:
+                    meta = json.load(meta_file)
+            except (OSError, ValueError):
+                meta = {'sha256': digest, 'size': size, 'first_stored_at': now, 'uploads': []}
+            record = {'filename': filename, 'stored_at': now, 'status': status, 'owner': None}
+            meta['uploads'] = (meta.get('uploads') or [])[-(VISA_DOCUMENT_MAX_RECORDS - 1):] + [record]
+            meta['last_stored_at'] = now
+            meta_tmp = os.path.join(tmp_dir, f"{digest}.{threading.get_ident()}.json")
+            with open(meta_tmp, 'w', encoding='utf-8') as meta_file:
+                json.dump(meta, meta_file)
+            os.replace(meta_tmp, f"{blob}.json")
+        return blob
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def sweep_visa_documents():
+    """Deletes retained documents that were not stored again within the retention period."""
+    now = time.time()
+    removed = 0
+    for dirpath, _, filenames in os.walk(os.path.join(VISA_DOCUMENT_STORE_DIR, 'objects')):
+        for name in filenames:
+            if name.endswith('.json'):
+                continue
+            blob = os.path.join(dirpath, name)
+            with visa_documents_lock: # Re-checked under the lock: a store may have just renewed it
+                try:
+                    if now - os.path.getmtime(blob) <= VISA_DOCUMENT_TTL_SECONDS:
+                        continue
+                    os.remove(blob)
+                except FileNotFoundError:
+                    continue
+                if os.path.exists(f"{blob}.json"):
+                    os.remove(f"{blob}.json")
+            removed += 1
+    if removed:
+        app.logger.info(f"Expired {removed} retained visa documents")
+
+
+def run_visa_document_sweeper():
+    while True:
+        try:
+            sweep_visa_documents()
+        except Exception as e:
+            app.logger.warning(f"Retained visa document sweep failed, will retry: {e}")
+        time.sleep(VISA_DOCUMENT_SWEEP_SECONDS)
+
+
+threading.Thread(target=run_visa_document_sweeper, name='visa-document-sweeper', daemon=True).start()
 
 # === Your API Routes (Keep them exactly as they were) ===
 
@@ -148,7 +249,7 @@ def finalize_booking():
         price = flight_result['price']
         app.logger.debug(f"Price found: {price}")
 
-        # 2. Check seat availability (optional but good)
+        # 2. Check seat availability (fast path; the unique key on bookings is what guarantees it)
         cur.execute("""
             SELECT id FROM bookings
             WHERE flight_id = %s AND seat_number = %s AND status = 'Confirmed'
@@ -158,6 +259,19 @@ def finalize_booking():
             app.logger.warning(f"Seat {data['seat_number']} on flight {flight_id} is already booked.")
             return jsonify({'status': 'error', 'message': f'Seat {data["seat_number"]} is no longer available.'}), 409
 
+        # Respect a live hold placed by another employee through booking-service; consume our own
+        cur.execute("""
+            SELECT employee_id FROM seat_holds
+            WHERE flight_id = %s AND seat_number = %s AND expires_at > NOW(6)
+            FOR UPDATE
+        """, (flight_id, data['seat_number']))
+        hold = cur.fetchone()
+        if hold and hold['employee_id'] != data['employee_id']:
+            mysql.connection.rollback()
+            app.logger.warning(f"Seat {data['seat_number']} on flight {flight_id} is held by another employee.")
+            return jsonify({'status': 'error', 'message': f'Seat {data["seat_number"]} is being booked by someone else.'}), 409
+        cur.execute("DELETE FROM seat_holds WHERE flight_id = %s AND seat_number = %s", (flight_id, data['seat_number']))
+
         # 3. Insert booking
         insert_query = """
             INSERT INTO bookings
@@ -176,6 +290,13 @@ def finalize_booking():
         app.logger.info("Booking successfully finalized and saved.")
         return jsonify({'status': 'success', 'message': 'Booking confirmed successfully'}), 200
 
+    except MySQLdb.IntegrityError as e:
+        mysql.connection.rollback()
+        if e.args and e.args[0] == MYSQL_DUPLICATE_ENTRY:
+            app.logger.warning(f"Seat {data['seat_number']} on flight {data['flight_id']} was booked concurrently.")
+            return jsonify({'status': 'error', 'message': f'Seat {data["seat_number"]} is no longer available.'}), 409
+        app.logger.error(f"Final booking error: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Failed to finalize booking', 'details': str(e)}), 500
     except Exception as e:
         mysql.connection.rollback()
         app.logger.error(f"Final booking error: {str(e)}", exc_info=True)
@@ -200,20 +321,23 @@ def verify_visa():
 
     # Consider sanitizing filename in production!
     filename = file.filename # Simple filename for now
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
 
-    try:
-        file.save(filepath)
-        app.logger.info(f"Visa file saved to: {filepath}")
-    except Exception as e:
-        app.logger.error(f"Error saving uploaded visa file {filename}: {str(e)}", exc_info=True)
-        return jsonify({'status': 'error', 'message': 'Failed to save uploaded file'}), 500
+    def retain_upload(status):
+        """Stores the upload in the retained document store only if the retention policy keeps it."""
+        if VISA_UPLOAD_RETENTION == 'all' or (VISA_UPLOAD_RETENTION == 'failed' and status != 200):
+            try:
+                file.stream.seek(0)
+                filepath = store_visa_document(file.stream, filename, status)
+                app.logger.info(f"Visa file retained at: {filepath}")
+            except Exception as e:
+                app.logger.error(f"Error retaining uploaded visa file {filename}: {str(e)}", exc_info=True)
 
     try:
-        app.logger.debug(f"Starting OCR processing for file: {filepath}")
+        app.logger.debug(f"Starting OCR processing for upload: {filename}")
         # Ensure pytesseract can find the executable if needed (might be okay in Docker PATH)
         # pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract' # Example if needed
-        text = pytesseract.image_to_string(Image.open(filepath))
+        with Image.open(file.stream) as img:
+            text = pytesseract.image_to_string(img)
         app.logger.debug("OCR processing completed.")
 
         # Log first few characters of OCR output for debugging
@@ -232,24 +356,20 @@ def verify_visa():
 
         if name_match and email_match and company_match:
             app.logger.info(f"Visa verification SUCCESS for Name='{name}', Email='{email}', Company='{company}'")
-            # Optional: Remove file after success?
-            # os.remove(filepath)
+            retain_upload(200)
             return jsonify({'status': 'success', 'message': '✅ Visa verified successfully'}), 200
         else:
             app.logger.warning(f"Visa verification FAILED (Mismatch) for Name='{name}', Email='{email}', Company='{company}'")
-            # Optional: Remove file after failure?
-            # os.remove(filepath)
+            retain_upload(403)
             return jsonify({'status': 'error', 'message': '❌ Visa details do not match'}), 403 # Use 403 Forbidden for mismatch
 
     except pytesseract.TesseractNotFoundError:
          app.logger.error("Tesseract executable not found. Ensure it's installed and in the system's PATH within the container.")
          return jsonify({'status': 'error', 'message': 'OCR engine not configured correctly on server'}), 500
     except Exception as e:
-        app.logger.error(f"Error during OCR or verification process for {filepath}: {str(e)}", exc_info=True)
-        # Optional: Remove file after error?
-        # if os.path.exists(filepath): os.remove(filepath)
+        app.logger.error(f"Error during OCR or verification process for {filename}: {str(e)}", exc_info=True)
+        retain_upload(500)
         return jsonify({'status': 'error', 'message': 'OCR processing failed', 'details': str(e)}), 500
-    # Removed finally block for file removal, manage explicitly if needed
 
 
 @app.route('/api/booking-analytics', methods=['GET'])
@@ -0,0 +1,18 @@
+-- db/migrations/001_flights_search_indexes.sql
+-- Indexes backing the server-side filters, sort orders and keyset pagination
+-- of GET /api/flights (flight-service). Every query is scoped by company_id,
+-- so it leads each index; id is appended so (sort_column, id) cursors range-scan.
+
+-- Route / airline filters and the DISTINCT airline picker
+CREATE INDEX idx_flights_company_airline_route
+    ON flights (company_id, airline, origin, destination);
+CREATE INDEX idx_flights_company_route
+    ON flights (company_id, origin, destination);
+
+-- Sort orders + keyset cursors (sort=price, sort=departure_time, sort=arrival_time)
+CREATE INDEX idx_flights_company_price
+    ON flights (company_id, price, id);
+CREATE INDEX idx_flights_company_departure
+    ON flights (company_id, departure_time, id);
+CREATE INDEX idx_flights_company_arrival
+    ON flights (company_id, arrival_time, id);
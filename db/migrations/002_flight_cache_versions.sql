@@ -0,0 +1,41 @@
+-- db/migrations/002_flight_cache_versions.sql
+-- Version counters used by the flight-service in-process cache.
+-- Each write to `flights` bumps the owning company's row and the table-wide row
+-- (scope_id = 0). Flight-service workers poll this small table every few seconds
+-- and drop cached entries built under an older version.
+
+CREATE TABLE IF NOT EXISTS flight_cache_versions (
+    scope_id INT NOT NULL PRIMARY KEY, -- company_id, or 0 for the whole flights table
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO flight_cache_versions (scope_id, version) VALUES (0, 0);
+
+DELIMITER //
+
+CREATE TRIGGER trg_flights_cache_version_ins AFTER INSERT ON flights
+FOR EACH ROW
+BEGIN
+    INSERT INTO flight_cache_versions (scope_id, version) VALUES (NEW.company_id, 1), (0, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1;
+END//
+
+CREATE TRIGGER trg_flights_cache_version_upd AFTER UPDATE ON flights
+FOR EACH ROW
+BEGIN
+    INSERT INTO flight_cache_versions (scope_id, version) VALUES (NEW.company_id, 1), (0, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1;
+    IF OLD.company_id <> NEW.company_id THEN
+        INSERT INTO flight_cache_versions (scope_id, version) VALUES (OLD.company_id, 1)
+            ON DUPLICATE KEY UPDATE version = version + 1;
+    END IF;
+END//
+
+CREATE TRIGGER trg_flights_cache_version_del AFTER DELETE ON flights
+FOR EACH ROW
+BEGIN
+    INSERT INTO flight_cache_versions (scope_id, version) VALUES (OLD.company_id, 1), (0, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1;
+END//
+
+DELIMITER ;
@@ -0,0 +1,37 @@
+-- db/migrations/003_booking_analytics_versions.sql
+-- Per-company version counter for bookings, bumped on every booking write.
+-- analytics-service reads it with one primary-key lookup to build the ETag of
+-- GET /api/booking-analytics and answers 304 without re-running the aggregates.
+
+CREATE TABLE IF NOT EXISTS booking_analytics_versions (
+    company_id INT NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+DELIMITER //
+
+CREATE TRIGGER trg_bookings_analytics_version_ins AFTER INSERT ON bookings
+FOR EACH ROW
+BEGIN
+    INSERT INTO booking_analytics_versions (company_id, version)
+        SELECT e.company_id, 1 FROM employees e WHERE e.id = NEW.employee_id
+        ON DUPLICATE KEY UPDATE version = version + 1;
+END//
+
+CREATE TRIGGER trg_bookings_analytics_version_upd AFTER UPDATE ON bookings
+FOR EACH ROW
+BEGIN
+    INSERT INTO booking_analytics_versions (company_id, version)
+        SELECT e.company_id, 1 FROM employees e WHERE e.id IN (OLD.employee_id, NEW.employee_id)
+        ON DUPLICATE KEY UPDATE version = version + 1;
+END//
+
+CREATE TRIGGER trg_bookings_analytics_version_del AFTER DELETE ON bookings
+FOR EACH ROW
+BEGIN
+    INSERT INTO booking_analytics_versions (company_id, version)
+        SELECT e.company_id, 1 FROM employees e WHERE e.id = OLD.employee_id
+        ON DUPLICATE KEY UPDATE version = version + 1;
+END//
+
+DELIMITER ;
@@ -0,0 +1,7 @@
+-- db/migrations/004_bookings_seat_index.sql
+-- Backs the seat-map load and the seat conflict check in booking-service:
+--   SELECT seat_number FROM bookings WHERE flight_id = ? AND status = 'Confirmed'
+--   SELECT id FROM bookings WHERE flight_id = ? AND seat_number = ? AND status = 'Confirmed'
+
+CREATE INDEX idx_bookings_flight_status_seat
+    ON bookings (flight_id, status, seat_number);
@@ -0,0 +1,29 @@
+-- db/migrations/005_seat_holds.sql
+-- Seat holds and a database-level guarantee of one confirmed booking per seat.
+--
+-- booking-service places a hold (POST /api/seat-holds) when an employee picks a
+-- seat and converts it into a booking in the same transaction as the INSERT at
+-- finalize time. Expired holds are taken over by the next request and swept in
+-- batches.
+
+CREATE TABLE IF NOT EXISTS seat_holds (
+    flight_id INT NOT NULL,
+    seat_number VARCHAR(16) NOT NULL,
+    employee_id INT NOT NULL,
+    hold_token VARCHAR(64) NOT NULL,
+    expires_at DATETIME(6) NOT NULL,
+    created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    PRIMARY KEY (flight_id, seat_number), -- One hold per seat
+    UNIQUE KEY uq_seat_holds_token (hold_token),
+    KEY idx_seat_holds_flight_employee (flight_id, employee_id),
+    KEY idx_seat_holds_expires (expires_at)
+);
+
+-- Only confirmed bookings occupy a seat, so cancelled rows map to NULL (which a
+-- UNIQUE key ignores). Existing duplicates must be resolved before this runs:
+--   SELECT flight_id, seat_number, COUNT(*) FROM bookings
+--   WHERE status = 'Confirmed' GROUP BY flight_id, seat_number HAVING COUNT(*) > 1;
+ALTER TABLE bookings
+    ADD COLUMN confirmed_seat VARCHAR(16)
+        GENERATED ALWAYS AS (IF(status = 'Confirmed', seat_number, NULL)) STORED,
+    ADD UNIQUE KEY uq_bookings_confirmed_seat (flight_id, confirmed_seat);
@@ -0,0 +1,30 @@
+-- db/migrations/006_flight_fare_changes.sql
+-- Append-only log of fare changes. flight-service tails it (by id) and pushes
+-- the affected flight ids to booking-service, which drops them from its local
+-- price cache (POST /api/internal/bookings/price-cache/invalidate).
+-- Rows older than a day are pruned by the same poller.
+
+CREATE TABLE IF NOT EXISTS flight_fare_changes (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    flight_id INT NOT NULL,
+    changed_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    KEY idx_flight_fare_changes_changed_at (changed_at)
+);
+
+DELIMITER //
+
+CREATE TRIGGER trg_flights_fare_change_upd AFTER UPDATE ON flights
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.price <=> NEW.price) THEN
+        INSERT INTO flight_fare_changes (flight_id) VALUES (OLD.id);
+    END IF;
+END//
+
+CREATE TRIGGER trg_flights_fare_change_del AFTER DELETE ON flights
+FOR EACH ROW
+BEGIN
+    INSERT INTO flight_fare_changes (flight_id) VALUES (OLD.id);
+END//
+
+DELIMITER ;
@@ -0,0 +1,8 @@
+-- db/migrations/007_bookings_ticket.sql
+-- Ticket of the write-behind journal entry that created a booking (NULL for
+-- synchronous bookings). Unique, so a journal entry replayed after a crash is
+-- recognised as already booked instead of being inserted again.
+
+ALTER TABLE bookings
+    ADD COLUMN booking_ticket CHAR(32) NULL,
+    ADD UNIQUE KEY uq_bookings_booking_ticket (booking_ticket);
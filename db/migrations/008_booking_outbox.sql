@@ -0,0 +1,77 @@
+-- db/migrations/008_booking_outbox.sql
+-- Transactional outbox for booking events, and the aggregates analytics-service
+-- maintains from them.
+--
+-- booking-service inserts a booking.confirmed row into booking_outbox in the
+-- same transaction as the booking. Its relay publishes committed rows to the
+-- file-backed event log, and analytics-service applies each event once
+-- (analytics_processed_events) to the analytics_* count tables.
+--
+-- Run with booking-service stopped: the backfill below counts the bookings that
+-- exist now, and every later booking arrives as an event.
+
+CREATE TABLE IF NOT EXISTS booking_outbox (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    event_type VARCHAR(64) NOT NULL,
+    aggregate_id BIGINT NOT NULL, -- bookings.id
+    company_id INT NULL,
+    payload JSON NOT NULL,
+    created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    published_at DATETIME(6) NULL,
+    KEY idx_booking_outbox_unpublished (published_at, id)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_airline_counts (
+    company_id INT NOT NULL,
+    airline VARCHAR(100) NOT NULL,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (company_id, airline)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_destination_counts (
+    company_id INT NOT NULL,
+    destination VARCHAR(100) NOT NULL,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (company_id, destination)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_daily_counts (
+    company_id INT NOT NULL,
+    day DATE NOT NULL,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (company_id, day)
+);
+
+-- Event ids already applied (delivery is at-least-once) and the consumer's read position
+CREATE TABLE IF NOT EXISTS analytics_processed_events (
+    event_id BIGINT NOT NULL PRIMARY KEY,
+    processed_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    KEY idx_analytics_processed_events_at (processed_at)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_consumer_offsets (
+    consumer VARCHAR(64) NOT NULL PRIMARY KEY,
+    segment INT NOT NULL,
+    byte_offset BIGINT NOT NULL,
+    events_applied BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+);
+
+-- One-time backfill from the existing bookings
+INSERT INTO analytics_airline_counts (company_id, airline, total)
+    SELECT e.company_id, b.airline, COUNT(*)
+    FROM bookings b JOIN employees e ON b.employee_id = e.id
+    WHERE b.status = 'Confirmed'
+    GROUP BY e.company_id, b.airline;
+
+INSERT INTO analytics_destination_counts (company_id, destination, total)
+    SELECT e.company_id, b.destination, COUNT(*)
+    FROM bookings b JOIN employees e ON b.employee_id = e.id
+    WHERE b.status = 'Confirmed'
+    GROUP BY e.company_id, b.destination;
+
+INSERT INTO analytics_daily_counts (company_id, day, total)
+    SELECT e.company_id, DATE(b.booking_time), COUNT(*)
+    FROM bookings b JOIN employees e ON b.employee_id = e.id
+    WHERE b.status = 'Confirmed'
+    GROUP BY e.company_id, DATE(b.booking_time);
@@ -0,0 +1,60 @@
+-- db/migrations/009_login_cache.sql
+-- Indexes for the login lookup (employees JOIN companies by email and company
+-- name) and the version counter that invalidates auth-service's login cache.
+
+-- WHERE c.name = ? finds the company; (email, company_id) then resolves the
+-- employee and the join key from the index alone. Either join order is covered.
+CREATE INDEX idx_companies_name_id
+    ON companies (name, id);
+CREATE INDEX idx_employees_email_company
+    ON employees (email, company_id);
+
+-- Every write to employees or companies bumps the single row (scope_id = 0).
+-- Auth-service workers poll it every few seconds and drop cached logins,
+-- including cached "unknown email/company" answers, built under an older version.
+CREATE TABLE IF NOT EXISTS login_cache_versions (
+    scope_id INT NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO login_cache_versions (scope_id, version) VALUES (0, 0);
+
+DELIMITER //
+
+CREATE TRIGGER trg_employees_login_version_ins AFTER INSERT ON employees
+FOR EACH ROW
+BEGIN
+    UPDATE login_cache_versions SET version = version + 1 WHERE scope_id = 0;
+END//
+
+CREATE TRIGGER trg_employees_login_version_upd AFTER UPDATE ON employees
+FOR EACH ROW
+BEGIN
+    UPDATE login_cache_versions SET version = version + 1 WHERE scope_id = 0;
+END//
+
+CREATE TRIGGER trg_employees_login_version_del AFTER DELETE ON employees
+FOR EACH ROW
+BEGIN
+    UPDATE login_cache_versions SET version = version + 1 WHERE scope_id = 0;
+END//
+
+CREATE TRIGGER trg_companies_login_version_ins AFTER INSERT ON companies
+FOR EACH ROW
+BEGIN
+    UPDATE login_cache_versions SET version = version + 1 WHERE scope_id = 0;
+END//
+
+CREATE TRIGGER trg_companies_login_version_upd AFTER UPDATE ON companies
+FOR EACH ROW
+BEGIN
+    UPDATE login_cache_versions SET version = version + 1 WHERE scope_id = 0;
+END//
+
+CREATE TRIGGER trg_companies_login_version_del AFTER DELETE ON companies
+FOR EACH ROW
+BEGIN
+    UPDATE login_cache_versions SET version = version + 1 WHERE scope_id = 0;
+END//
+
+DELIMITER ;
@@ -17,6 +17,7 @@ import {
 
 // Import the CSS file
 import './Dashboard.css';
+import { authHeaders } from '../session';
 
 // Register the components ChartJS needs
 ChartJS.register(
@@ -46,7 +47,7 @@ const Dashboard = () => {
       const companyId = user.company.id;
       const apiUrl = process.env.REACT_APP_API_URL || 'http://localhost:8080';
 
-      axios.get(`${apiUrl}/api/booking-analytics?company_id=${companyId}`)
+      axios.get(`${apiUrl}/api/booking-analytics?company_id=${companyId}`, { headers: authHeaders() })
         .then(response => {
           if (response.data && typeof response.data === 'object') {
              // Add basic validation if needed (e.g., check for expected arrays)
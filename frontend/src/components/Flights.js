@@ -2,6 +2,7 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import './Flights.css'; // We'll create this new CSS file
+import { authHeaders } from '../session';
 
 // --- Constants ---
 const SNOWFLAKE_SRC = '/images/snowflake_615669.png';
@@ -22,6 +23,7 @@ const SNOWBALL_THROW_SPEED = 7;
 // --- API Configuration ---
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8080';
 const FLIGHTS_API_ENDPOINT = `${API_BASE_URL}/api/flights`;
+const AIRLINES_API_ENDPOINT = `${API_BASE_URL}/api/flights/airlines`;
 
 // --- Helper ---
 const getRandom = (min, max) => Math.random() * (max - min) + min;
@@ -32,8 +34,8 @@ function Flights() {
   const navigate = useNavigate();
   // Receive user from previous route (Login)
   const user = location.state?.user;
-  const [originalFlights, setOriginalFlights] = useState([]);
   const [airlines, setAirlines] = useState([]);
+  const [airlinesLoaded, setAirlinesLoaded] = useState(false);
   const [fetchError, setFetchError] = useState('');
 
   // --- Interactive Elements State ---
@@ -50,30 +52,30 @@ function Flights() {
      setFetchError('');
 
      if (user?.company?.id) {
-       const url = `${FLIGHTS_API_ENDPOINT}?company_id=${user.company.id}`;
-       fetch(url)
+       // Only the airline names are needed here; flights are fetched per airline on click
+       const url = `${AIRLINES_API_ENDPOINT}?company_id=${user.company.id}`;
+       fetch(url, { headers: authHeaders() })
          .then((res) => {
-             if (!res.ok) { throw new Error(`Failed to fetch flights: ${res.status}`); }
+             if (!res.ok) { throw new Error(`Failed to fetch airlines: ${res.status}`); }
              return res.json();
          })
          .then((data) => {
            if (isMounted) {
                if (Array.isArray(data)) {
-                     setOriginalFlights(data);
-                     const uniqueAirlines = [...new Set(data.map((f) => f.airline))].sort();
-                     setAirlines(uniqueAirlines);
+                     setAirlines(data);
                } else {
-                    console.error("Error fetching flights: Received non-array data", data);
+                    console.error("Error fetching airlines: Received non-array data", data);
                     setFetchError("Received invalid flight data from server.");
-                    setOriginalFlights([]); setAirlines([]);
+                    setAirlines([]);
                }
+               setAirlinesLoaded(true);
            }
          })
          .catch((err) => {
-             console.error("Error fetching flights:", err);
+             console.error("Error fetching airlines:", err);
              if (isMounted) {
                  setFetchError(err.message || "Could not connect to fetch flights.");
-                 setOriginalFlights([]); setAirlines([]);
+                 setAirlines([]);
              }
          });
      } else {
@@ -333,17 +335,27 @@ function Flights() {
         setFetchError("User data missing, cannot proceed.");
         return;
     }
-    const flightsForAirline = originalFlights.filter(f => f.airline === airline);
-    // ***** CHANGE IS HERE *****
-    // Pass the 'user' object along in the navigation state
-    navigate('/locations', {
-        state: {
-            airline,
-            flights: flightsForAirline,
-            user: user // Pass the received user object along
-        }
-    });
-    // *************************
+    // The flight service filters by airline, so only this airline's flights are downloaded
+    const params = new URLSearchParams({ company_id: user.company.id, airline, sort: 'departure_time' });
+    fetch(`${FLIGHTS_API_ENDPOINT}?${params.toString()}`, { headers: authHeaders() })
+      .then((res) => {
+          if (!res.ok) { throw new Error(`Failed to fetch flights: ${res.status}`); }
+          return res.json();
+      })
+      .then((flightsForAirline) => {
+          // Pass the 'user' object along in the navigation state
+          navigate('/locations', {
+              state: {
+                  airline,
+                  flights: Array.isArray(flightsForAirline) ? flightsForAirline : [],
+                  user: user // Pass the received user object along
+              }
+          });
+      })
+      .catch((err) => {
+          console.error("Error fetching flights:", err);
+          setFetchError(err.message || "Could not connect to fetch flights.");
+      });
   };
 
   const handleDashboardClick = () => {
@@ -406,7 +418,7 @@ function Flights() {
           <h4>Select an Airline:</h4>
           <div className="airline-buttons">
             {/* Loading/Empty state handling */}
-            {!fetchError && airlines.length === 0 && !originalFlights.length && <p>Loading airlines...</p> }
+            {!fetchError && !airlinesLoaded && <p>Loading airlines...</p> }
             {/* Airline buttons */}
             {airlines.length > 0 && airlines.map((airline, index) => (
                 <button
@@ -419,7 +431,7 @@ function Flights() {
                 </button>
              ))}
              {/* Message if flights loaded but no airlines found */}
-             {!fetchError && airlines.length === 0 && originalFlights.length > 0 && <p>No airlines found for your company.</p>}
+             {!fetchError && airlinesLoaded && airlines.length === 0 && <p>No airlines found for your company.</p>}
           </div>
         </div>
       </div>
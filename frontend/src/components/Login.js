@@ -2,6 +2,7 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { useNavigate } from 'react-router-dom';
 import './Login.css'; // We'll create this CSS file
+import { setSessionToken } from '../session';
 
 // --- Icon Sources ---
 // Make sure these paths match the files in your public/images folder
@@ -169,6 +170,7 @@ function Login() {
       // Assuming backend returns success status consistently in JSON body
       // AND that the backend now includes the phone number (if needed) in the employee object
       if (data.status === 'success' && data.employee) {
+        setSessionToken(data.token); // Authorizes the following API calls
         // Pass the entire employee object (potentially including phone number) to the next route
         navigate('/flights', { state: { user: data.employee } });
       } else {
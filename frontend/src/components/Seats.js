@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import './Seats.css';
+import { authHeaders } from '../session';
 
 // --- Constants ---
 const IMAGE_SOURCES = [
@@ -15,6 +16,12 @@ const MAX_SPAWN_DELAY = 4000;
 const MIN_FALL_DURATION = 1000;
 const MAX_FALL_DURATION = 3000;
 
+// --- API Configuration ---
+const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8080';
+const SEAT_MAP_ENDPOINT = `${API_BASE_URL}/api/seats`;
+const SEAT_MAP_REFRESH_MS = 10000; // Re-poll so seats taken by colleagues disappear while choosing
+const SEAT_HOLDS_ENDPOINT = `${API_BASE_URL}/api/seat-holds`;
+
 function Seats() {
   const location = useLocation();
   const navigate = useNavigate();
@@ -35,6 +42,9 @@ function Seats() {
   const flightAirline = flightDetails?.airline;
 
   const [selectedSeat, setSelectedSeat] = useState(null);
+  const [takenSeats, setTakenSeats] = useState(new Set());
+  const [isHoldingSeat, setIsHoldingSeat] = useState(false);
+  const [holdError, setHoldError] = useState(null);
 
   // --- Game State ---
   const [fallingItems, setFallingItems] = useState([]);
@@ -84,6 +94,31 @@ function Seats() {
     }
   }, [fallingItems.length, correctlyQueued.length, isGameActive, hasGameBeenWon]); // Dependencies
 
+  // --- Effect to load seat occupancy (booking service seat map) ---
+  useEffect(() => {
+    if (!flightDetails?.id) return undefined;
+    let isMounted = true;
+    const loadSeatMap = () => {
+      fetch(`${SEAT_MAP_ENDPOINT}/${flightDetails.id}`, { headers: authHeaders() })
+        .then((res) => {
+          if (!res.ok) { throw new Error(`Failed to fetch seat map: ${res.status}`); }
+          return res.json();
+        })
+        .then((data) => {
+          if (isMounted && Array.isArray(data.occupied)) {
+            const occupied = new Set(data.occupied);
+            setTakenSeats(occupied);
+            // Drop a selection that someone else has just booked
+            setSelectedSeat((current) => (current && occupied.has(current) ? null : current));
+          }
+        })
+        .catch((err) => console.error("Error fetching seat map:", err)); // Booking still re-checks on finalize
+    };
+    loadSeatMap();
+    const intervalId = setInterval(loadSeatMap, SEAT_MAP_REFRESH_MS);
+    return () => { isMounted = false; clearInterval(intervalId); };
+  }, [flightDetails?.id]);
+
   // --- Effect to Start/Stop Spawning based on game state ---
   useEffect(() => {
     if (isGameActive && !hasGameBeenWon) {
@@ -231,15 +266,16 @@ function Seats() {
         <div key={row} className="seats-pg-seat-row">
           {seatCols.map(col => {
             const id = `${row}${col}`;
-            const allowed = allowedRows.includes(row);
+            const taken = takenSeats.has(id);
+            const allowed = allowedRows.includes(row) && !taken;
             const selected = selectedSeat === id;
             return (
               <button
                 key={id}
-                className={`seats-pg-seat-button ${selected ? 'selected' : allowed ? 'allowed' : 'disallowed'}`}
+                className={`seats-pg-seat-button ${selected ? 'selected' : taken ? 'taken' : allowed ? 'allowed' : 'disallowed'}`}
                 onClick={() => allowed && setSelectedSeat(id)}
-                disabled={!allowed} // Disable button if seat is not allowed
-                aria-label={`Seat ${id}${allowed ? '' : ' (Disallowed)'}${selected ? ' (Selected)' : ''}`} // Accessibility
+                disabled={!allowed} // Disable button if seat is not allowed or already booked
+                aria-label={`Seat ${id}${taken ? ' (Taken)' : allowed ? '' : ' (Disallowed)'}${selected ? ' (Selected)' : ''}`} // Accessibility
               >
                 {id}
               </button>
@@ -250,9 +286,34 @@ function Seats() {
     });
   };
 
-  const handleProceedToVisa = () => {
+  const handleProceedToVisa = async () => {
     // Check all conditions: seat selected, flight details exist, game not active OR game won
-    if (!selectedSeat || !flightDetails || (hasUserStartedGame && !hasGameBeenWon)) return;
+    if (!selectedSeat || !flightDetails || (hasUserStartedGame && !hasGameBeenWon) || isHoldingSeat) return;
+
+    // Hold the seat while the visa is verified; finalize-booking converts the hold into the booking
+    setIsHoldingSeat(true);
+    setHoldError(null);
+    let holdToken = null;
+    try {
+      const res = await fetch(SEAT_HOLDS_ENDPOINT, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', ...authHeaders() },
+        body: JSON.stringify({ employee_id: user?.id, flight_id: flightDetails.id, seat_number: selectedSeat }),
+      });
+      const data = await res.json().catch(() => ({}));
+      if (res.status === 409) {
+        setTakenSeats((current) => new Set(current).add(selectedSeat));
+        setSelectedSeat(null);
+        setHoldError(data.message || `Seat ${selectedSeat} was just taken. Please choose another seat.`);
+        return;
+      }
+      if (!res.ok) { throw new Error(`Failed to hold seat: ${res.status}`); }
+      holdToken = data.hold_token;
+    } catch (err) {
+      console.error("Error holding seat:", err); // Finalize still checks the seat without a hold
+    } finally {
+      setIsHoldingSeat(false);
+    }
 
     console.log("Proceeding to Visa Upload...");
     setIsGameActive(false); // Ensure game state is inactive
@@ -270,6 +331,9 @@ function Seats() {
         arrival_time: arrivalDateTime,     // Pass ISO string
         price: flightDetails.price,
         travel_date: selectedDate,          // "YYYY-MM-DD" string
+        hold_token: holdToken,
+        // One key per booking attempt: retried finalize calls replay the first result instead of booking twice
+        idempotency_key: window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`,
     };
 
     console.log("BookingData object created:", bookingData); // <-- Check the final object!
@@ -286,7 +350,7 @@ function Seats() {
   };
 
   // Determine if the proceed button should be disabled
-  const proceedDisabled = !selectedSeat || !flightDetails || (hasUserStartedGame && !hasGameBeenWon);
+  const proceedDisabled = !selectedSeat || !flightDetails || (hasUserStartedGame && !hasGameBeenWon) || isHoldingSeat;
 
   return (
     <div className="seats-pg-body">
@@ -385,6 +449,9 @@ function Seats() {
          {proceedDisabled && !selectedSeat && (
             <p className="seats-pg-warning-message">Please select an available seat.</p>
         )}
+        {holdError && (
+            <p className="seats-pg-error-message">⚠️ {holdError}</p>
+        )}
       </div>
       {/* --- End Main Content --- */}
     </div>
@@ -3,6 +3,7 @@ import React, { useState, useEffect, useMemo } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import './UploadVisa.css'; // Import the CSS file
+import { authHeaders } from '../session';
 
 // --- Quiz Data ---
 const quizQuestions = [
@@ -121,7 +122,7 @@ function UploadVisa() {
             setMessage('Verifying Visa...'); setMessageType('info');
 
             const verifyResponse = await axios.post(VERIFY_VISA_ENDPOINT, verifyFormData, {
-                headers: { 'Content-Type': 'multipart/form-data' },
+                headers: { 'Content-Type': 'multipart/form-data', ...authHeaders() },
                 timeout: 20000
             });
 
@@ -147,7 +148,11 @@ function UploadVisa() {
                     // This object *must* contain flight_id, seat_number, user_id etc.
                     // required by the backend finalize endpoint.
                     const bookResponse = await axios.post(FINALIZE_BOOKING_ENDPOINT, pendingBooking, {
-                        timeout: 15000 // Timeout for booking call
+                        timeout: 15000, // Timeout for booking call
+                        headers: {
+                            ...authHeaders(),
+                            ...(pendingBooking.idempotency_key ? { 'Idempotency-Key': pendingBooking.idempotency_key } : {}),
+                        },
                     });
 
                     // --- Booking Finalization Success ---
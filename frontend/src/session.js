@@ -0,0 +1,17 @@
+// src/session.js
+// Session token issued by /api/login. Sent as a Bearer token to the travel API
+// (flights, bookings, visa, analytics), which verify it without a DB lookup.
+const TOKEN_KEY = 'sessionToken';
+
+export const setSessionToken = (token) => {
+  if (token) {
+    sessionStorage.setItem(TOKEN_KEY, token);
+  } else {
+    sessionStorage.removeItem(TOKEN_KEY);
+  }
+};
+
+export const authHeaders = () => {
+  const token = sessionStorage.getItem(TOKEN_KEY);
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
@@ -5,10 +5,14 @@ from flask_cors import CORS
 import os
 import logging
 import datetime
-import decimal # Import decimal
+from common.serialization import dumps, json_response
+from common.http_cache import make_etag, body_etag, is_not_modified, not_modified_response, conditional_headers
+from common.event_log import EventLog
+from common.auth_tokens import TokenVerifier, require_token, claims_allow
+from booking_events import BookingEventConsumer
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['ETag'])
 
 # --- Logging ---
 logging.basicConfig(level=logging.INFO)
@@ -28,8 +32,118 @@ except Exception as e:
     app.logger.error(f"Analytics Service: Failed to initialize MySQL: {e}")
     exit(1)
 
+# --- Session Tokens ---
+# Issued by auth-service on login and verified locally; see common/auth_tokens.py for key rotation
+token_verifier = TokenVerifier.from_env()
+
+# --- Booking Events Config ---
+# Booking-service publishes booking events to this directory (shared volume, see docker-compose.yml);
+# the consumer applies them to the analytics_* count tables (db/migrations/008_booking_outbox.sql).
+BOOKING_EVENTS_DIR = os.environ.get('BOOKING_EVENTS_DIR', '/app/events/bookings')
+BOOKING_EVENTS_CONSUMER = os.environ.get('BOOKING_EVENTS_CONSUMER', 'analytics-service')
+BOOKING_EVENTS_POLL_SECONDS = float(os.environ.get('BOOKING_EVENTS_POLL_SECONDS', '1'))
+# Set to 0 to serve analytics from the bookings table scans instead of the aggregates
+ANALYTICS_USE_EVENT_AGGREGATES = os.environ.get('ANALYTICS_USE_EVENT_AGGREGATES', '1') == '1'
+
+booking_events_consumer = None
+if ANALYTICS_USE_EVENT_AGGREGATES:
+    booking_events_consumer = BookingEventConsumer(
+        app, mysql, EventLog(BOOKING_EVENTS_DIR), BOOKING_EVENTS_CONSUMER, BOOKING_EVENTS_POLL_SECONDS
+    )
+    booking_events_consumer.start()
+
+# === Helper: Bookings Version ===
+def get_bookings_version(cur, company_id):
+    """
+    Returns the company's booking version counter (bumped by triggers on `bookings`,
+    see db/migrations/003_booking_analytics_versions.sql), or None if unavailable.
+    A single primary-key lookup, so it is cheap enough to run before the analytics queries.
+    """
+    try:
+        cur.execute("SELECT version FROM booking_analytics_versions WHERE company_id = %s", (company_id,))
+        row = cur.fetchone()
+        return row['version'] if row else 0
+    except Exception as e:
+        app.logger.warning(f"Analytics: booking version counter unavailable, using body ETags: {e}")
+        return None
+
+
+def get_events_applied(cur):
+    """
+    Returns how many events the consumer has applied so far, or None if the
+    aggregates are unavailable. Aggregate-backed responses are versioned by this
+    counter rather than the bookings triggers, which fire before the event lands.
+    """
+    try:
+        cur.execute("SELECT events_applied FROM analytics_consumer_offsets WHERE consumer = %s", (BOOKING_EVENTS_CONSUMER,))
+        row = cur.fetchone()
+        return row['events_applied'] if row else 0
+    except Exception as e:
+        app.logger.warning(f"Analytics: event aggregates unavailable, scanning bookings: {e}")
+        return None
+
+
+# === Helper: Analytics Queries ===
+def query_event_aggregates(cur, company_id):
+    """Reads the per-company counts maintained by BookingEventConsumer; primary-key range scans only."""
+    cur.execute("""
+        SELECT airline, total FROM analytics_airline_counts
+        WHERE company_id = %s ORDER BY total DESC
+    """, (company_id,))
+    bookings_per_airline = cur.fetchall()
+
+    cur.execute("""
+        SELECT day AS date, total FROM analytics_daily_counts
+        WHERE company_id = %s AND day >= DATE(DATE_SUB(NOW(), INTERVAL 30 DAY))
+        ORDER BY day ASC
+    """, (company_id,))
+    bookings_over_time = cur.fetchall()
+
+    cur.execute("""
+        SELECT destination, total FROM analytics_destination_counts
+        WHERE company_id = %s ORDER BY total DESC LIMIT 5
+    """, (company_id,))
+    top_destinations = cur.fetchall()
+    return bookings_per_airline, bookings_over_time, top_destinations
+
+
+def query_bookings_scan(cur, company_id):
+    # NOTE: These queries JOIN across logical service boundaries (bookings, employees) and
+    # rescan the company's bookings on every call. Kept as the fallback for the event aggregates.
+
+    # 1. Bookings per airline
+    cur.execute("""
+        SELECT b.airline, COUNT(*) AS total
+        FROM bookings b JOIN employees e ON b.employee_id = e.id
+        WHERE e.company_id = %s AND b.status = 'Confirmed' /* Added status filter */
+        GROUP BY b.airline ORDER BY total DESC
+    """, (company_id,))
+    bookings_per_airline = cur.fetchall()
+
+    # 2. Bookings over time
+    cur.execute("""
+        SELECT DATE(b.booking_time) AS date, COUNT(*) AS total
+        FROM bookings b JOIN employees e ON b.employee_id = e.id
+        WHERE e.company_id = %s AND b.status = 'Confirmed' /* Added status filter */
+              AND b.booking_time >= DATE_SUB(NOW(), INTERVAL 30 DAY)
+        GROUP BY DATE(b.booking_time) ORDER BY date ASC
+    """, (company_id,))
+    bookings_over_time = cur.fetchall() # DATE values are encoded as ISO strings by the serializer
+
+    # 3. Top 5 destinations
+    cur.execute("""
+        SELECT b.destination, COUNT(*) AS total
+        FROM bookings b JOIN employees e ON b.employee_id = e.id
+        WHERE e.company_id = %s AND b.status = 'Confirmed' /* Added status filter */
+        GROUP BY b.destination ORDER BY total DESC LIMIT 5
+    """, (company_id,))
+    top_destinations = cur.fetchall()
+    return bookings_per_airline, bookings_over_time, top_destinations
+
+
 # === Booking Analytics Endpoint ===
 @app.route('/api/booking-analytics', methods=['GET'])
+@require_token(token_verifier)
 def booking_analytics():
     company_id = request.args.get('company_id')
     app.logger.info(f"Analytics Service received request for {request.endpoint} with company_id: {company_id}")
@@ -43,54 +157,45 @@ def booking_analytics():
     except ValueError:
         app.logger.warning(f"Analytics request received invalid company_id: {company_id}")
         return jsonify({'status': 'error', 'message': 'Invalid company_id format'}), 400
+    if not claims_allow(company_id=company_id_int):
+        app.logger.warning(f"Analytics request for company_id {company_id_int} does not match the session token.")
+        return jsonify({'status': 'error', 'message': 'company_id does not match the signed-in account'}), 403
 
     cur = None
     try:
         cur = mysql.connection.cursor()
-        app.logger.debug(f"Analytics: Querying data for company_id {company_id_int}.")
 
-        # NOTE: These queries still JOIN across logical service boundaries (bookings, employees)
-        # This works initially because they share the DB instance.
-        # Ideal future state: Analytics service gets data via APIs or events.
-
-        # 1. Bookings per airline
-        cur.execute("""
-            SELECT b.airline, COUNT(*) AS total
-            FROM bookings b JOIN employees e ON b.employee_id = e.id
-            WHERE e.company_id = %s AND b.status = 'Confirmed' /* Added status filter */
-            GROUP BY b.airline ORDER BY total DESC
-        """, (company_id_int,))
-        bookings_per_airline = cur.fetchall()
-
-        # 2. Bookings over time
-        cur.execute("""
-            SELECT DATE(b.booking_time) AS date, COUNT(*) AS total
-            FROM bookings b JOIN employees e ON b.employee_id = e.id
-            WHERE e.company_id = %s AND b.status = 'Confirmed' /* Added status filter */
-                  AND b.booking_time >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            GROUP BY DATE(b.booking_time) ORDER BY date ASC
-        """, (company_id_int,))
-        bookings_over_time = cur.fetchall()
-        # Convert date objects to strings for JSON
-        for item in bookings_over_time:
-            if isinstance(item.get('date'), (datetime.date, datetime.datetime)):
-                item['date'] = item['date'].isoformat()
-
-        # 3. Top 5 destinations
-        cur.execute("""
-            SELECT b.destination, COUNT(*) AS total
-            FROM bookings b JOIN employees e ON b.employee_id = e.id
-            WHERE e.company_id = %s AND b.status = 'Confirmed' /* Added status filter */
-            GROUP BY b.destination ORDER BY total DESC LIMIT 5
-        """, (company_id_int,))
-        top_destinations = cur.fetchall()
+        # The 30-day window moves daily, so today's date is part of the content version
+        etag = None
+        events_applied = get_events_applied(cur) if ANALYTICS_USE_EVENT_AGGREGATES else None
+        if events_applied is not None:
+            version = ('events', events_applied)
+        else:
+            bookings_version = get_bookings_version(cur, company_id_int)
+            version = ('bookings', bookings_version) if bookings_version is not None else None
+        if version is not None:
+            etag = make_etag('booking-analytics', company_id_int, *version, datetime.date.today().isoformat())
+            if is_not_modified(request, etag):
+                app.logger.info(f"Analytics: Not modified for company_id {company_id_int}.")
+                return not_modified_response(etag)
+
+        app.logger.debug(f"Analytics: Querying data for company_id {company_id_int}.")
+        if events_applied is not None:
+            bookings_per_airline, bookings_over_time, top_destinations = query_event_aggregates(cur, company_id_int)
+        else:
+            bookings_per_airline, bookings_over_time, top_destinations = query_bookings_scan(cur, company_id_int)
 
         app.logger.info(f"Analytics: Data fetched successfully for company_id {company_id_int}.")
-        return jsonify({
+        body = dumps({
             'bookings_per_airline': bookings_per_airline,
             'bookings_over_time': bookings_over_time,
             'top_destinations': top_destinations
-        }), 200
+        })
+        if etag is None:
+            etag = body_etag(body)
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+        return json_response(body, 200, conditional_headers(etag))
 
     except Exception as e:
         app.logger.error(f"Analytics Service error for company_id {company_id_int}: {str(e)}", exc_info=True)
@@ -99,6 +204,15 @@ def booking_analytics():
         if cur:
             cur.close()
 
+# === Internal: Consumer Metrics ===
+@app.route('/api/internal/analytics/metrics', methods=['GET'])
+def analytics_metrics():
+    return jsonify({
+        'event_aggregates': ANALYTICS_USE_EVENT_AGGREGATES,
+        'booking_events': booking_events_consumer.stats() if booking_events_consumer else None,
+        'auth_tokens': token_verifier.stats(),
+    }), 200
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
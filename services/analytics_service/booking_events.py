@@ -0,0 +1,151 @@
+# services/analytics_service/booking_events.py
+# Applies booking events from the booking-service event log to the analytics_* count tables.
+import collections
+import json
+import threading
+import time
+
+BOOKING_CONFIRMED = 'booking.confirmed'
+
+UPSERT_AIRLINE_COUNTS = """
+    INSERT INTO analytics_airline_counts (company_id, airline, total) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+"""
+UPSERT_DESTINATION_COUNTS = """
+    INSERT INTO analytics_destination_counts (company_id, destination, total) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+"""
+UPSERT_DAILY_COUNTS = """
+    INSERT INTO analytics_daily_counts (company_id, day, total) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+"""
+
+
+class BookingEventConsumer:
+    """
+    Background thread that reads the event log from the position stored in
+    analytics_consumer_offsets and applies new events in one MySQL transaction
+    per batch: aggregate upserts, processed event ids and the new position
+    commit together, so a crash never applies an event twice or skips one.
+    """
+
+    def __init__(self, app, mysql, event_log, consumer, interval, batch_size=500, processed_retention_days=14):
+        self.app = app
+        self.mysql = mysql
+        self.event_log = event_log
+        self.consumer = consumer
+        self.interval = interval
+        self.batch_size = batch_size
+        self.processed_retention_days = processed_retention_days
+        self._thread = None
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self.applied = 0
+        self.duplicates = 0
+        self.failures = 0
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='analytics-booking-events', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    while self.consume_once() == self.batch_size:
+                        pass # Catch up without sleeping between full batches
+                    if time.monotonic() - self._last_prune >= 3600:
+                        self._last_prune = time.monotonic()
+                        self._prune()
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                self.app.logger.warning(f"Analytics event consumer: batch failed, will retry: {e}")
+            time.sleep(self.interval)
+
+    def consume_once(self):
+        """Applies the next batch; returns the number of log entries read."""
+        cur = self.mysql.connection.cursor()
+        try:
+            cur.execute(
+                "SELECT segment, byte_offset FROM analytics_consumer_offsets WHERE consumer = %s FOR UPDATE",
+                (self.consumer,)
+            )
+            row = cur.fetchone()
+            position = [row['segment'], row['byte_offset']] if row else self.event_log.start_position()
+            events, next_position = self.event_log.read(position, self.batch_size)
+            if not events:
+                self.mysql.connection.rollback()
+                return 0
+
+            by_id = {event['id']: event for event in events} # Re-published batches may repeat ids
+            placeholders = ', '.join(['%s'] * len(by_id))
+            cur.execute(
+                f"SELECT event_id FROM analytics_processed_events WHERE event_id IN ({placeholders})",
+                tuple(by_id)
+            )
+            seen = {row['event_id'] for row in cur.fetchall()}
+            new_events = [event for event_id, event in by_id.items() if event_id not in seen]
+
+            airlines = collections.Counter()
+            destinations = collections.Counter()
+            days = collections.Counter()
+            for event in new_events:
+                if event['type'] != BOOKING_CONFIRMED or event.get('company_id') is None:
+                    continue
+                booking = json.loads(event['payload'])
+                company_id = event['company_id']
+                airlines[(company_id, booking['airline'])] += 1
+                destinations[(company_id, booking['destination'])] += 1
+                days[(company_id, str(booking['booking_time'])[:10])] += 1 # ISO timestamp -> YYYY-MM-DD
+
+            if airlines:
+                cur.executemany(UPSERT_AIRLINE_COUNTS, [key + (total,) for key, total in airlines.items()])
+                cur.executemany(UPSERT_DESTINATION_COUNTS, [key + (total,) for key, total in destinations.items()])
+                cur.executemany(UPSERT_DAILY_COUNTS, [key + (total,) for key, total in days.items()])
+            if new_events:
+                cur.executemany(
+                    "INSERT INTO analytics_processed_events (event_id) VALUES (%s)",
+                    [(event['id'],) for event in new_events]
+                )
+            cur.execute("""
+                INSERT INTO analytics_consumer_offsets (consumer, segment, byte_offset, events_applied)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE segment = VALUES(segment), byte_offset = VALUES(byte_offset),
+                    events_applied = events_applied + VALUES(events_applied)
+            """, (self.consumer, next_position[0], next_position[1], len(new_events)))
+            self.mysql.connection.commit()
+        except Exception:
+            self.mysql.connection.rollback()
+            raise
+        finally:
+            cur.close()
+        with self._lock:
+            self.applied += len(new_events)
+            self.duplicates += len(events) - len(new_events)
+        return len(events)
+
+    def _prune(self):
+        cur = self.mysql.connection.cursor()
+        try:
+            cur.execute(
+                "DELETE FROM analytics_processed_events WHERE processed_at < DATE_SUB(NOW(6), INTERVAL %s DAY) LIMIT 10000",
+                (self.processed_retention_days,)
+            )
+            self.mysql.connection.commit()
+        finally:
+            cur.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'consumer': self.consumer,
+                'interval_seconds': self.interval,
+                'applied': self.applied,
+                'duplicates_skipped': self.duplicates,
+                'failures': self.failures,
+                'last_error': self.last_error,
+            }
@@ -4,6 +4,10 @@ from flask_mysqldb import MySQL
 from flask_cors import CORS
 import os
 import logging
+from common.serialization import json_response
+from common.auth_tokens import TokenSigner
+from common.ttl_cache import TTLCache
+from common.version_tracker import VersionTracker
 
 app = Flask(__name__)
 # Allow requests from anywhere for now (adjust in production if needed)
@@ -28,6 +32,94 @@ except Exception as e:
     app.logger.error(f"Auth Service: Failed to initialize MySQL: {e}")
     exit(1)
 
+# --- Session Tokens ---
+# Signed with the active key from AUTH_TOKEN_KEYS; other services verify them locally (common/auth_tokens.py)
+try:
+    token_signer = TokenSigner.from_env()
+    app.logger.info(f"Auth Service: Signing session tokens with key id '{token_signer.active_kid}'.")
+except ValueError as e:
+    app.logger.error(f"Auth Service: Failed to configure token signing: {e} (set AUTH_TOKEN_KEYS, see .env.example)")
+    exit(1)
+
+# --- Login Cache Config ---
+# Login lookups (employees JOIN companies) are cached per (email, company name). Unknown pairs are
+# cached too, in a separate, smaller cache, so retry storms for bad credentials don't reach MySQL
+# and can't evict real users. Both are checked against login_cache_versions, bumped by triggers on
+# every employees/companies write (db/migrations/009_login_cache.sql).
+LOGIN_CACHE_ENABLED = os.environ.get('LOGIN_CACHE_ENABLED', '1') == '1'
+LOGIN_CACHE_MAX_ENTRIES = int(os.environ.get('LOGIN_CACHE_MAX_ENTRIES', '10000'))
+LOGIN_CACHE_TTL_SECONDS = float(os.environ.get('LOGIN_CACHE_TTL_SECONDS', '300'))
+LOGIN_NEGATIVE_CACHE_MAX_ENTRIES = int(os.environ.get('LOGIN_NEGATIVE_CACHE_MAX_ENTRIES', '5000'))
+LOGIN_NEGATIVE_CACHE_TTL_SECONDS = float(os.environ.get('LOGIN_NEGATIVE_CACHE_TTL_SECONDS', '30'))
+LOGIN_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get('LOGIN_CACHE_VERSION_CHECK_SECONDS', '2'))
+LOGIN_VERSION_SCOPE = 0
+
+LOGIN_QUERY = """
+    SELECT
+        e.id AS employee_id,
+        e.name AS employee_name,
+        e.email,
+        e.department,
+        e.role_id,
+        e.phone_number,       -- <<< GET THE PHONE NUMBER FROM DB
+        c.id AS company_id,
+        c.name AS company_name,
+        c.location,
+        c.status
+    FROM employees e
+    JOIN companies c ON e.company_id = c.id
+    WHERE e.email = %s AND c.name = %s
+"""
+
+
+def load_login_cache_versions():
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute("SELECT scope_id, version FROM login_cache_versions")
+        return {row['scope_id']: row['version'] for row in cur.fetchall()}
+    except Exception as e:
+        app.logger.warning(f"Login cache: could not load version counter, falling back to TTL only: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+
+
+login_cache = TTLCache(LOGIN_CACHE_MAX_ENTRIES, LOGIN_CACHE_TTL_SECONDS)
+login_negative_cache = TTLCache(LOGIN_NEGATIVE_CACHE_MAX_ENTRIES, LOGIN_NEGATIVE_CACHE_TTL_SECONDS)
+login_cache_versions = VersionTracker(load_login_cache_versions, LOGIN_CACHE_VERSION_CHECK_SECONDS)
+
+
+def find_login_user(email, company_name):
+    """Returns the employee/company row for a login, or None if the pair is unknown."""
+    if not LOGIN_CACHE_ENABLED:
+        return query_login_user(email, company_name)
+    # MySQL compares these columns case-insensitively, so the cache key does too
+    key = (email.lower(), company_name.lower())
+    version = login_cache_versions.get(LOGIN_VERSION_SCOPE)
+    user = login_cache.get(key, version)
+    if user is not None:
+        return user
+    if login_negative_cache.get(key, version) is not None:
+        return None
+    user = query_login_user(email, company_name)
+    if user is None:
+        login_negative_cache.set(key, True, version)
+    else:
+        login_cache.set(key, user, version)
+    return user
+
+
+def query_login_user(email, company_name):
+    cur = mysql.connection.cursor()
+    try:
+        # Lookup uses only email and company name (idx_employees_email_company, idx_companies_name_id)
+        cur.execute(LOGIN_QUERY, (email, company_name))
+        return cur.fetchone() # Get the first matching user
+    finally:
+        cur.close()
+
 
 # === Login Endpoint ===
 @app.route('/api/login', methods=['POST'])
@@ -49,31 +141,8 @@ def login():
         app.logger.warning(f"Auth Service login failed: Missing company name, email, or name.")
         return jsonify({'status': 'error', 'message': 'Missing required login data'}), 400
 
-    cur = None
     try:
-        cur = mysql.connection.cursor()
-
-        # --- MODIFIED QUERY: Added e.phone_number ---
-        # IMPORTANT: Replace 'e.phone_number' if your column name is different!
-        query = """
-            SELECT
-                e.id AS employee_id,
-                e.name AS employee_name,
-                e.email,
-                e.department,
-                e.role_id,
-                e.phone_number,       -- <<< GET THE PHONE NUMBER FROM DB
-                c.id AS company_id,
-                c.name AS company_name,
-                c.location,
-                c.status
-            FROM employees e
-            JOIN companies c ON e.company_id = c.id
-            WHERE e.email = %s AND c.name = %s
-        """
-        # Execute query using only email and company name for lookup
-        cur.execute(query, (email, company_name))
-        user = cur.fetchone() # Get the first matching user
+        user = find_login_user(email, company_name)
 
         if user:
             # --- Login Successful ---
@@ -97,9 +166,16 @@ def login():
                                    # Differentiate from user['employee_name'] which is from DB
             }
 
-            # In a real app, you'd typically issue a JWT here.
-            # For now, return success and the constructed employee data.
-            return jsonify({'status': 'success', 'employee': employee_data}), 200
+            # Signed token carrying the identity other services authorize against, so they
+            # do not need to look the employee up again
+            token, expires_at = token_signer.sign(user['employee_id'], user['company_id'], user['role_id'])
+            return json_response({
+                'status': 'success',
+                'employee': employee_data,
+                'token': token,
+                'token_type': 'Bearer',
+                'expires_at': expires_at,
+            }, 200)
         else:
             # --- Login Failed ---
             app.logger.warning(f"Auth Service login FAILED: Invalid credentials for Email='{email}', Company='{company_name}'")
@@ -110,10 +186,16 @@ def login():
         app.logger.error(f"Auth Service DB error during login: {str(e)}", exc_info=True)
         # Avoid leaking detailed errors to the client in production
         return jsonify({'status': 'error', 'message': 'Internal server error during login'}), 500
-    finally:
-        # --- Ensure cursor is closed ---
-        if cur:
-            cur.close()
+
+# === Internal: Login Cache Metrics ===
+@app.route('/api/internal/auth/metrics', methods=['GET'])
+def auth_metrics():
+    return jsonify({
+        'login_cache_enabled': LOGIN_CACHE_ENABLED,
+        'login_cache': login_cache.stats(),
+        'login_negative_cache': login_negative_cache.stats(),
+        'login_cache_versioned': login_cache_versions.has_versions(),
+    }), 200
 
 # Health check endpoint
 @app.route('/health', methods=['GET'])
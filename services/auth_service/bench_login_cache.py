@@ -0,0 +1,82 @@
+# services/auth_service/bench_login_cache.py
+# Benchmark: logins/sec through POST /api/login with and without the login cache.
+#
+# Runs the auth app in-process (Flask test client) against the MySQL database
+# configured by the usual MYSQL_* variables; AUTH_TOKEN_KEYS must be set. From
+# the services/auth_service directory:
+#     PYTHONPATH=.. python bench_login_cache.py --logins 5000 --threads 8 --unknown-ratio 0.3
+#
+# The traffic mix replays real (email, company) pairs from the employees table
+# and a share of unknown pairs, as in a credential-stuffing retry storm.
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app as auth_app
+
+
+def load_known_pairs(limit):
+    with auth_app.app.app_context():
+        cur = auth_app.mysql.connection.cursor()
+        try:
+            cur.execute("""
+                SELECT e.email, c.name AS company_name, e.name
+                FROM employees e JOIN companies c ON e.company_id = c.id
+                LIMIT %s
+            """, (limit,))
+            return [(row['email'], row['company_name'], row['name']) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+def run(label, requests_to_send, threads):
+    client = auth_app.app.test_client()
+    statuses = {}
+    lock = threading.Lock()
+
+    def login(payload):
+        status = client.post('/api/login', json=payload).status_code
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(login, requests_to_send))
+    elapsed = time.perf_counter() - started
+    print(f"{label:>14}: {len(requests_to_send) / elapsed:9.1f} logins/s  statuses={dict(sorted(statuses.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--users', type=int, default=500, help='Distinct known (email, company) pairs to replay')
+    parser.add_argument('--unknown-ratio', type=float, default=0.3)
+    args = parser.parse_args()
+
+    known = load_known_pairs(args.users)
+    if not known:
+        raise SystemExit('No employees found; seed the database first')
+    rng = random.Random(7)
+    unknown = [(f"nobody{n}@example.com", rng.choice(known)[1], 'Nobody') for n in range(args.users)]
+    requests_to_send = []
+    for _ in range(args.logins):
+        email, company_name, name = rng.choice(unknown if rng.random() < args.unknown_ratio else known)
+        requests_to_send.append({'companyName': company_name, 'email': email, 'name': name, 'phoneNumber': ''})
+
+    auth_app.LOGIN_CACHE_ENABLED = False
+    run('no cache', requests_to_send, args.threads)
+
+    auth_app.LOGIN_CACHE_ENABLED = True
+    auth_app.login_cache.clear()
+    auth_app.login_negative_cache.clear()
+    run('cache (cold)', requests_to_send, args.threads)
+    run('cache (warm)', requests_to_send, args.threads)
+    print('positive cache:', auth_app.login_cache.stats())
+    print('negative cache:', auth_app.login_negative_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
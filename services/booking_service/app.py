@@ -1,14 +1,25 @@
 # services/booking_service/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_mysqldb import MySQL
 from flask_cors import CORS
 import os
 import logging
 import requests # <-- Import requests library
 import decimal # Import decimal
+import MySQLdb
+from common.serialization import json_response
+from common.http_client import ServiceClient, CircuitOpenError
+from common.idempotency import IdempotencyStore, idempotent, REPLAYED_HEADER
+from seat_map import SeatLayout, SeatMapStore
+from price_cache import FlightPriceCache
+from booking_journal import BookingJournal, JournalWorkerPool, CONFIRMED, FAILED
+from booking_outbox import OutboxRelay, record_booking_confirmed
+from common.event_log import EventLog
+from common.auth_tokens import TokenVerifier, require_token, claims_allow
+from seat_holds import SeatUnavailable, HoldSweeper, acquire_hold, claim_seat, claim_seats, release_hold, is_duplicate_entry
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=[REPLAYED_HEADER])
 
 # --- Logging ---
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +35,18 @@ app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 # --- Service URLs (from environment) ---
 FLIGHT_SERVICE_URL = os.environ.get('FLIGHT_SERVICE_URL', 'http://flight-service:5002') # Default internal URL
 
+# --- Flight Service Client (pooled keep-alive connections, retries, circuit breaker) ---
+flight_service = ServiceClient(
+    'flight-service',
+    FLIGHT_SERVICE_URL,
+    connect_timeout=float(os.environ.get('FLIGHT_SERVICE_CONNECT_TIMEOUT', '1')),
+    read_timeout=float(os.environ.get('FLIGHT_SERVICE_READ_TIMEOUT', '3')),
+    max_retries=int(os.environ.get('FLIGHT_SERVICE_MAX_RETRIES', '2')),
+    failure_threshold=int(os.environ.get('FLIGHT_SERVICE_BREAKER_THRESHOLD', '5')),
+    reset_timeout=float(os.environ.get('FLIGHT_SERVICE_BREAKER_RESET_SECONDS', '10')),
+    pool_size=int(os.environ.get('FLIGHT_SERVICE_POOL_SIZE', '10')),
+)
+
 try:
     mysql = MySQL(app)
     app.logger.info("Booking Service: MySQL connection configured.")
@@ -31,8 +54,148 @@ except Exception as e:
     app.logger.error(f"Booking Service: Failed to initialize MySQL: {e}")
     exit(1)
 
+# --- Session Tokens ---
+# Issued by auth-service on login and verified locally; see common/auth_tokens.py for key rotation
+token_verifier = TokenVerifier.from_env()
+
+# --- Seat Map Config ---
+# Must match the seat grid rendered by frontend/src/components/Seats.js
+SEAT_MAP_ROWS = int(os.environ.get('SEAT_MAP_ROWS', '6'))
+SEAT_MAP_COLUMNS = os.environ.get('SEAT_MAP_COLUMNS', 'ABCD')
+# How long a worker trusts its bitmap before re-reading bookings confirmed by other workers
+SEAT_MAP_REFRESH_SECONDS = float(os.environ.get('SEAT_MAP_REFRESH_SECONDS', '5'))
+
+
+def load_occupied_seats(flight_id):
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute(
+            "SELECT seat_number FROM bookings WHERE flight_id = %s AND status = 'Confirmed'",
+            (flight_id,)
+        )
+        return [row['seat_number'] for row in cur.fetchall()]
+    finally:
+        if cur:
+            cur.close()
+
+
+seat_maps = SeatMapStore(SeatLayout(SEAT_MAP_ROWS, SEAT_MAP_COLUMNS), load_occupied_seats, SEAT_MAP_REFRESH_SECONDS)
+
+# --- Seat Hold Config ---
+# Long enough to cover the visa upload step between choosing a seat and finalizing
+SEAT_HOLD_TTL_SECONDS = int(os.environ.get('SEAT_HOLD_TTL_SECONDS', '600'))
+SEAT_HOLD_SWEEP_SECONDS = float(os.environ.get('SEAT_HOLD_SWEEP_SECONDS', '30'))
+
+hold_sweeper = HoldSweeper(SEAT_HOLD_SWEEP_SECONDS)
+
+# --- Flight Price Cache Config ---
+# flight-service pushes fare changes to /api/internal/bookings/price-cache/invalidate; the TTL caps
+# how long a price can be used if a push is missed.
+BOOKING_PRICE_CACHE_MAX_ENTRIES = int(os.environ.get('BOOKING_PRICE_CACHE_MAX_ENTRIES', '10000'))
+BOOKING_PRICE_MAX_STALENESS_SECONDS = float(os.environ.get('BOOKING_PRICE_MAX_STALENESS_SECONDS', '60'))
+
+
+def fetch_flight_price(flight_id):
+    """Asks Flight Service for a flight's price; returns None if the flight does not exist."""
+    app.logger.info(f"Booking Service: Calling Flight Service for details of flight ID {flight_id}")
+    try:
+        path = f"/api/internal/flights/{flight_id}/details"
+        response = flight_service.get(path)
+
+        if response.status_code == 200:
+            flight_data = response.json()
+            price = flight_data.get('price')
+            app.logger.info(f"Booking Service: Received price {price} from Flight Service.")
+            if price is None:
+                 raise ValueError("Price not found in Flight Service response")
+            return decimal.Decimal(str(price))
+        elif response.status_code == 404:
+            return None
+        else:
+            app.logger.error(f"Booking Service: Error calling Flight Service. Status: {response.status_code}, Body: {response.text}")
+            raise requests.exceptions.RequestException(f"Flight Service error: {response.status_code}")
+
+    except CircuitOpenError:
+         app.logger.error("Booking Service: Flight Service circuit is open; failing fast")
+         raise
+    except requests.exceptions.Timeout:
+         app.logger.error(f"Booking Service: Timeout calling Flight Service at {flight_service.base_url}{path}")
+         raise requests.exceptions.RequestException("Timeout contacting Flight Service")
+    except requests.exceptions.ConnectionError:
+         app.logger.error(f"Booking Service: Connection error calling Flight Service at {flight_service.base_url}{path}")
+         raise requests.exceptions.RequestException("Could not connect to Flight Service")
+    except requests.exceptions.RequestException:
+        raise
+    except Exception as service_call_e: # Catch other potential errors like JSON parsing
+        app.logger.error(f"Booking Service: Unexpected error during Flight Service call: {service_call_e}", exc_info=True)
+        raise requests.exceptions.RequestException(f"Unexpected error fetching flight details: {service_call_e}")
+
+
+def fetch_flight_prices(flight_ids):
+    """Resolves many prices through Flight Service's batch details endpoint; unknown flights map to None."""
+    prices = {}
+    for start in range(0, len(flight_ids), FLIGHT_DETAILS_BATCH_SIZE):
+        chunk = flight_ids[start:start + FLIGHT_DETAILS_BATCH_SIZE]
+        app.logger.info(f"Booking Service: Calling Flight Service for details of {len(chunk)} flights")
+        response = flight_service.post('/api/internal/flights/details', json={'flight_ids': chunk}, retry=True) # Read-only
+        if response.status_code != 200:
+            app.logger.error(f"Booking Service: Error calling Flight Service batch details. Status: {response.status_code}, Body: {response.text}")
+            raise requests.exceptions.RequestException(f"Flight Service error: {response.status_code}")
+        try:
+            flights = response.json()['flights']
+            for flight_id, details in flights.items():
+                price = details.get('price') if details else None
+                prices[int(flight_id)] = decimal.Decimal(str(price)) if price is not None else None
+            # Unknown flights come back as null; a requested ID with no entry at all means a partial body
+            unanswered = [flight_id for flight_id in chunk if int(flight_id) not in prices]
+            if unanswered:
+                raise KeyError(f"no entry for flights {unanswered}")
+        except (ValueError, KeyError, TypeError, AttributeError, decimal.InvalidOperation) as e: # Malformed or partial body
+            app.logger.error(f"Booking Service: Malformed Flight Service batch details response: {e!r}")
+            raise requests.exceptions.RequestException(f"Malformed Flight Service response: {e!r}")
+    return prices
+
+
+flight_prices = FlightPriceCache(
+    fetch_flight_price, BOOKING_PRICE_CACHE_MAX_ENTRIES, BOOKING_PRICE_MAX_STALENESS_SECONDS,
+    fetch_many=fetch_flight_prices,
+)
+
+# --- Bulk Booking Config ---
+MAX_BULK_BOOKING_TRAVELLERS = int(os.environ.get('MAX_BULK_BOOKING_TRAVELLERS', '500'))
+FLIGHT_DETAILS_BATCH_SIZE = 500 # Flight Service's MAX_FLIGHT_DETAILS_BATCH_SIZE default
+BULK_BOOKING_ATTEMPTS = 3 # Re-checks after a seat was booked between our conflict check and insert
+
+BOOKING_INSERT_QUERY = """
+    INSERT INTO bookings
+    (employee_id, flight_id, booking_time, status, seat_number, origin, destination, airline, price, booking_ticket)
+    VALUES (%s, %s, NOW(), %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# --- Idempotency Config ---
+# Finalize requests carrying an Idempotency-Key are run once; retries get the stored response.
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get('IDEMPOTENCY_MAX_KEYS', '20000'))
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '20'))
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_WAIT_SECONDS)
+
+# --- Booking Events (transactional outbox) ---
+# Every booking insert writes a booking.confirmed row to booking_outbox in the same transaction;
+# the relay publishes committed rows to a file-backed event log that analytics-service consumes.
+BOOKING_EVENTS_DIR = os.environ.get('BOOKING_EVENTS_DIR', '/app/events/bookings')
+OUTBOX_RELAY_INTERVAL_SECONDS = float(os.environ.get('OUTBOX_RELAY_INTERVAL_SECONDS', '1'))
+
+booking_events = EventLog(BOOKING_EVENTS_DIR)
+outbox_relay = OutboxRelay(app, mysql, booking_events, OUTBOX_RELAY_INTERVAL_SECONDS)
+if OUTBOX_RELAY_INTERVAL_SECONDS > 0:
+    outbox_relay.start()
+
 # === Finalize Booking Endpoint ===
 @app.route('/api/finalize-booking', methods=['POST'])
+@require_token(token_verifier)
+@idempotent(idempotency_store)
 def finalize_booking():
     data = request.get_json()
     app.logger.info(f"Booking Service received request for {request.endpoint}")
@@ -44,79 +207,62 @@ def finalize_booking():
     if missing_fields:
         app.logger.warning(f"Booking Service failed: Missing fields - {missing_fields}")
         return jsonify({'status': 'error', 'message': f'Missing booking data: {", ".join(missing_fields)}'}), 400
+    try:
+        flight_id = int(data['flight_id']) # Price cache keys are ints, as in invalidation pushes
+    except (TypeError, ValueError):
+        app.logger.warning(f"Booking Service failed: Invalid flight_id {data['flight_id']!r}")
+        return jsonify({'status': 'error', 'message': 'flight_id must be an integer'}), 400
+    if not claims_allow(employee_id=data['employee_id']):
+        app.logger.warning(f"Booking Service: employee_id {data['employee_id']} does not match the session token")
+        return jsonify({'status': 'error', 'message': 'employee_id does not match the signed-in account'}), 403
 
     cur = None
     try:
-        flight_id = data['flight_id']
-        seat_number = data['seat_number']
+        seat_number = str(data['seat_number']).strip().upper() # Same form as the seat hold
         employee_id = data['employee_id']
         origin = data['origin']
         destination = data['destination']
         airline = data['airline']
+        hold_token = data.get('hold_token') # Issued by POST /api/seat-holds; optional for older clients
 
-        # --- Step 1: Call Flight Service to get Price ---
-        app.logger.info(f"Booking Service: Calling Flight Service for details of flight ID {flight_id}")
-        price = None
-        try:
-            flight_details_url = f"{FLIGHT_SERVICE_URL}/api/internal/flights/{flight_id}/details"
-            response = requests.get(flight_details_url, timeout=5) # Add a timeout
-
-            if response.status_code == 200:
-                flight_data = response.json()
-                price = flight_data.get('price')
-                # You could also verify origin/destination/airline match if needed
-                app.logger.info(f"Booking Service: Received price {price} from Flight Service.")
-                if price is None:
-                     raise ValueError("Price not found in Flight Service response")
-                # Convert price back to Decimal if needed for DB, or ensure DB accepts float/string
-                price = decimal.Decimal(price)
-            elif response.status_code == 404:
-                app.logger.error(f"Booking Service: Flight Service reported flight ID {flight_id} not found.")
-                return jsonify({'status': 'error', 'message': 'Flight details not found'}), 404
-            else:
-                app.logger.error(f"Booking Service: Error calling Flight Service. Status: {response.status_code}, Body: {response.text}")
-                raise requests.exceptions.RequestException(f"Flight Service error: {response.status_code}")
-
-        except requests.exceptions.Timeout:
-             app.logger.error(f"Booking Service: Timeout calling Flight Service at {flight_details_url}")
-             raise requests.exceptions.RequestException("Timeout contacting Flight Service")
-        except requests.exceptions.ConnectionError:
-             app.logger.error(f"Booking Service: Connection error calling Flight Service at {flight_details_url}")
-             raise requests.exceptions.RequestException("Could not connect to Flight Service")
-        except Exception as service_call_e: # Catch other potential errors like JSON parsing
-            app.logger.error(f"Booking Service: Unexpected error during Flight Service call: {service_call_e}", exc_info=True)
-            raise requests.exceptions.RequestException(f"Unexpected error fetching flight details: {service_call_e}")
-
-        # --- Step 2: Check seat availability (within Booking Service's data) ---
+        # --- Step 1: Get price (local price cache; Flight Service is only called on a miss) ---
+        price = flight_prices.get(flight_id)
+        if price is None:
+            app.logger.error(f"Booking Service: Flight Service reported flight ID {flight_id} not found.")
+            return jsonify({'status': 'error', 'message': 'Flight details not found'}), 404
+
+        # --- Step 2: Convert the seat hold (same transaction as the insert) ---
         cur = mysql.connection.cursor()
-        app.logger.debug(f"Booking Service: Checking seat availability for Flight {flight_id}, Seat {seat_number}")
-        cur.execute("""
-            SELECT id FROM bookings
-            WHERE flight_id = %s AND seat_number = %s AND status = 'Confirmed'
-        """, (flight_id, seat_number))
-        existing_booking = cur.fetchone()
-        if existing_booking:
-            app.logger.warning(f"Booking Service: Seat {seat_number} on flight {flight_id} already booked.")
-            return jsonify({'status': 'error', 'message': f'Seat {seat_number} is no longer available.'}), 409 # 409 Conflict
-
-        # --- Step 3: Insert booking (into Booking Service's data) ---
+        app.logger.debug(f"Booking Service: Claiming seat {seat_number} on flight {flight_id} (hold token given: {hold_token is not None})")
+        claim_seat(cur, flight_id, seat_number, employee_id, hold_token, SEAT_HOLD_TTL_SECONDS)
+
+        # --- Step 3: Insert booking (uq_bookings_confirmed_seat rejects a second confirmed booking) ---
         app.logger.debug(f"Booking Service: Inserting booking...")
-        insert_query = """
-            INSERT INTO bookings
-            (employee_id, flight_id, booking_time, status, seat_number, origin, destination, airline, price)
-            VALUES (%s, %s, NOW(), %s, %s, %s, %s, %s, %s)
-        """
         booking_status = "Confirmed"
         values = (
             employee_id, flight_id, booking_status, seat_number,
-            origin, destination, airline, price # Use price obtained from Flight Service
+            origin, destination, airline, price, # Use price obtained from Flight Service
+            None # booking_ticket is only set by the write-behind queue
         )
-        cur.execute(insert_query, values)
+        cur.execute(BOOKING_INSERT_QUERY, values)
+        record_booking_confirmed(cur, [(flight_id, seat_number)]) # Outbox row commits with the booking
         mysql.connection.commit()
+        seat_maps.mark_taken(flight_id, seat_number)
 
         app.logger.info("Booking Service: Booking successfully finalized.")
         return jsonify({'status': 'success', 'message': 'Booking confirmed successfully'}), 200
 
+    except SeatUnavailable as unavailable:
+        mysql.connection.rollback()
+        app.logger.warning(f"Booking Service: Seat {data['seat_number']} on flight {data['flight_id']} unavailable ({unavailable.reason}).")
+        return jsonify({'status': 'error', 'message': str(unavailable), 'reason': unavailable.reason}), 409 # 409 Conflict
+    except MySQLdb.IntegrityError as integrity_err:
+        mysql.connection.rollback()
+        if not is_duplicate_entry(integrity_err):
+            app.logger.error(f"Booking Service: Final booking integrity error: {integrity_err}", exc_info=True)
+            return jsonify({'status': 'error', 'message': 'Failed to finalize booking due to an internal error.', 'details': str(integrity_err)}), 500
+        app.logger.warning(f"Booking Service: Seat {data['seat_number']} on flight {data['flight_id']} already booked.")
+        return jsonify({'status': 'error', 'message': f'Seat {data["seat_number"]} is no longer available.', 'reason': 'booked'}), 409
     except requests.exceptions.RequestException as req_err:
          # Error communicating with Flight Service
          if cur: cur.close() # Close cursor if open
@@ -131,6 +277,402 @@ def finalize_booking():
         if cur:
             cur.close()
 
+BOOKING_REQUIRED_FIELDS = ['employee_id', 'flight_id', 'seat_number', 'origin', 'destination', 'airline']
+
+
+def normalize_traveller(traveller):
+    """Validates one booking request; returns (normalized copy, None) or (None, error message)."""
+    if not isinstance(traveller, dict):
+        return None, 'Traveller entry must be an object'
+    missing_fields = [field for field in BOOKING_REQUIRED_FIELDS if traveller.get(field) is None]
+    if missing_fields:
+        return None, f'Missing booking data: {", ".join(missing_fields)}'
+    try:
+        flight_id = int(traveller['flight_id'])
+        employee_id = int(traveller['employee_id'])
+    except (TypeError, ValueError):
+        return None, 'flight_id and employee_id must be integers'
+    seat_number = str(traveller['seat_number']).strip().upper()
+    return dict(traveller, flight_id=flight_id, employee_id=employee_id, seat_number=seat_number), None
+
+
+def insert_bookings(cur, pending, prices, all_or_nothing=False):
+    """
+    Books `pending` [(index, traveller)] in one transaction: set-based seat claim, then one
+    executemany INSERT and one commit. Returns (inserted, conflicts) where conflicts maps
+    (flight_id, seat_number) -> SeatUnavailable. Travellers may carry a 'booking_ticket'.
+    """
+    inserted = []
+    for attempt in range(BULK_BOOKING_ATTEMPTS):
+        conflicts = claim_seats(cur, [
+            (traveller['flight_id'], traveller['seat_number'], traveller['employee_id'], traveller.get('hold_token'))
+            for _, traveller in pending
+        ])
+        to_insert = [(index, traveller) for index, traveller in pending
+                     if (traveller['flight_id'], traveller['seat_number']) not in conflicts]
+        if all_or_nothing and conflicts:
+            mysql.connection.rollback()
+            break
+        try:
+            if to_insert:
+                cur.executemany(BOOKING_INSERT_QUERY, [
+                    (traveller['employee_id'], traveller['flight_id'], 'Confirmed', traveller['seat_number'],
+                     traveller['origin'], traveller['destination'], traveller['airline'],
+                     prices[traveller['flight_id']], traveller.get('booking_ticket'))
+                    for _, traveller in to_insert
+                ])
+                record_booking_confirmed(cur, [(traveller['flight_id'], traveller['seat_number']) for _, traveller in to_insert])
+            mysql.connection.commit()
+            inserted = to_insert
+            break
+        except MySQLdb.IntegrityError as integrity_err:
+            mysql.connection.rollback()
+            if not is_duplicate_entry(integrity_err) or attempt + 1 == BULK_BOOKING_ATTEMPTS:
+                raise
+            app.logger.warning("Booking Service: Batch booking raced a concurrent booking; re-checking seats")
+    return inserted, conflicts
+
+# === Bulk Booking Endpoint ===
+# Books a group (e.g. event travel) in one request: one validation pass, one price lookup
+# for all flights, one set-based seat conflict check and one executemany INSERT, all in a
+# single transaction. Each traveller gets their own result entry.
+@app.route('/api/finalize-booking/bulk', methods=['POST'])
+@require_token(token_verifier)
+@idempotent(idempotency_store)
+def finalize_bulk_booking():
+    data = request.get_json(silent=True) or {}
+    travellers = data.get('travellers')
+    all_or_nothing = bool(data.get('all_or_nothing', False))
+    app.logger.info(f"Booking Service received request for {request.endpoint}: {len(travellers) if isinstance(travellers, list) else 0} travellers")
+
+    if not isinstance(travellers, list) or not travellers:
+        return jsonify({'status': 'error', 'message': 'travellers must be a non-empty list'}), 400
+    if len(travellers) > MAX_BULK_BOOKING_TRAVELLERS:
+        return jsonify({'status': 'error', 'message': f'At most {MAX_BULK_BOOKING_TRAVELLERS} travellers per request'}), 400
+
+    results = [None] * len(travellers)
+
+    def fail(index, message, reason):
+        results[index] = {'index': index, 'status': 'error', 'message': message, 'reason': reason}
+
+    # --- Step 1: Validate every traveller ---
+    pending = [] # (index, normalized traveller)
+    requested_seats = {}
+    for index, traveller in enumerate(travellers):
+        traveller, error = normalize_traveller(traveller)
+        if error:
+            fail(index, error, 'invalid')
+            continue
+        seat = (traveller['flight_id'], traveller['seat_number'])
+        if seat in requested_seats:
+            fail(index, f'Seat {seat[1]} is also requested by traveller {requested_seats[seat]}.', 'duplicate')
+            continue
+        requested_seats[seat] = index
+        pending.append((index, traveller))
+
+    # --- Step 1b: Colleagues booked by the signed-in employee must be in the same company ---
+    claims = g.get('token_claims')
+    if claims is not None:
+        others = {traveller['employee_id'] for _, traveller in pending} - {claims['employee_id']}
+        if others:
+            cur = mysql.connection.cursor()
+            try:
+                placeholders = ', '.join(['%s'] * len(others))
+                cur.execute(f"SELECT id FROM employees WHERE company_id = %s AND id IN ({placeholders})",
+                            (claims['company_id'], *others))
+                colleagues = {row['id'] for row in cur.fetchall()}
+            finally:
+                cur.close()
+            allowed = []
+            for index, traveller in pending:
+                if traveller['employee_id'] in others and traveller['employee_id'] not in colleagues:
+                    fail(index, 'Traveller is not an employee of your company', 'forbidden')
+                else:
+                    allowed.append((index, traveller))
+            pending = allowed
+
+    # --- Step 2: Prices for all flights (cache, then one batch call for the misses) ---
+    if pending:
+        try:
+            prices = flight_prices.get_many([traveller['flight_id'] for _, traveller in pending])
+        except requests.exceptions.RequestException as req_err:
+            app.logger.error(f"Booking Service: Bulk booking could not fetch prices: {req_err}")
+            return jsonify({'status': 'error', 'message': 'Failed to finalize bookings due to internal communication error.', 'details': str(req_err)}), 503
+        priced = []
+        for index, traveller in pending:
+            if prices.get(traveller['flight_id']) is None:
+                fail(index, 'Flight details not found', 'flight_not_found')
+            else:
+                priced.append((index, traveller))
+        pending = priced
+
+    # --- Step 3: Seat conflicts + batched insert, one transaction ---
+    cur = None
+    inserted = []
+    try:
+        if pending and not (all_or_nothing and any(results)):
+            cur = mysql.connection.cursor()
+            inserted, conflicts = insert_bookings(cur, pending, prices, all_or_nothing)
+            for index, traveller in pending:
+                unavailable = conflicts.get((traveller['flight_id'], traveller['seat_number']))
+                if unavailable is not None:
+                    fail(index, str(unavailable), unavailable.reason)
+    except MySQLdb.IntegrityError as integrity_err:
+        app.logger.error(f"Booking Service: Bulk booking integrity error: {integrity_err}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Failed to finalize bookings due to a seat conflict. Please retry.', 'details': str(integrity_err)}), 409
+    except Exception as e:
+        mysql.connection.rollback()
+        app.logger.error(f"Booking Service: Bulk booking error: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Failed to finalize bookings due to an internal error.', 'details': str(e)}), 500
+    finally:
+        if cur:
+            cur.close()
+
+    for index, traveller in inserted:
+        seat_maps.mark_taken(traveller['flight_id'], traveller['seat_number'])
+        results[index] = {'index': index, 'status': 'booked', 'employee_id': traveller['employee_id'],
+                          'flight_id': traveller['flight_id'], 'seat_number': traveller['seat_number'],
+                          'price': prices[traveller['flight_id']]}
+    for index, traveller in pending:
+        if results[index] is None: # all_or_nothing: valid, but not booked because another traveller failed
+            fail(index, 'Not booked because another traveller in the group failed.', 'aborted')
+
+    booked_count = len(inserted)
+    failed_count = len(travellers) - booked_count
+    app.logger.info(f"Booking Service: Bulk booking finished: {booked_count} booked, {failed_count} failed.")
+    body = {
+        'status': 'success' if failed_count == 0 else ('partial' if booked_count else 'error'),
+        'booked': booked_count,
+        'failed': failed_count,
+        'results': results,
+    }
+    if booked_count:
+        return json_response(body, 200)
+    all_invalid = all(result['reason'] in ('invalid', 'duplicate', 'flight_not_found') for result in results)
+    if all(result['reason'] == 'forbidden' for result in results):
+        return json_response(body, 403)
+    return json_response(body, 400 if all_invalid else 409)
+
+# === Write-Behind Booking Queue ===
+# Accept-then-process mode for booking peaks: the request is validated, committed to a local
+# SQLite (WAL) journal and acknowledged with a ticket. Worker threads drain the journal into
+# MySQL in batches through insert_bookings(). bookings.booking_ticket is unique
+# (db/migrations/007_bookings_ticket.sql), so entries replayed after a crash are not booked twice.
+BOOKING_JOURNAL_PATH = os.environ.get('BOOKING_JOURNAL_PATH', '/app/data/booking_journal.db')
+BOOKING_QUEUE_WORKERS = int(os.environ.get('BOOKING_QUEUE_WORKERS', '2'))
+BOOKING_QUEUE_BATCH_SIZE = int(os.environ.get('BOOKING_QUEUE_BATCH_SIZE', '50'))
+BOOKING_QUEUE_MAX_ATTEMPTS = int(os.environ.get('BOOKING_QUEUE_MAX_ATTEMPTS', '5'))
+BOOKING_JOURNAL_RETENTION_HOURS = float(os.environ.get('BOOKING_JOURNAL_RETENTION_HOURS', '24'))
+
+
+def process_journal_batch(entries):
+    """Books a batch of journal entries [(ticket, payload, attempt)]; returns [(ticket, status, result)]."""
+    travellers = [(ticket, dict(payload, booking_ticket=ticket)) for ticket, payload, _ in entries]
+    prices = flight_prices.get_many([traveller['flight_id'] for _, traveller in travellers]) # Errors -> retried later
+    outcomes = []
+    pending = []
+    for ticket, traveller in travellers:
+        if prices.get(traveller['flight_id']) is None:
+            outcomes.append((ticket, FAILED, {'message': 'Flight details not found', 'reason': 'flight_not_found'}))
+        else:
+            pending.append((ticket, traveller))
+
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        try:
+            if pending:
+                # Replayed after a crash between the MySQL commit and the journal update
+                placeholders = ', '.join(['%s'] * len(pending))
+                cur.execute(
+                    f"SELECT booking_ticket FROM bookings WHERE booking_ticket IN ({placeholders})",
+                    tuple(ticket for ticket, _ in pending)
+                )
+                already_booked = {row['booking_ticket'] for row in cur.fetchall()}
+                for ticket, traveller in pending:
+                    if ticket in already_booked:
+                        outcomes.append((ticket, CONFIRMED, {'message': 'Booking confirmed successfully', 'replayed': True}))
+                pending = [(ticket, traveller) for ticket, traveller in pending if ticket not in already_booked]
+
+            while pending:
+                # Same seat requested twice in one batch: first ticket (oldest) goes in this round,
+                # the rest in the next one, where they see it as booked
+                this_round, next_round, seats = [], [], set()
+                for ticket, traveller in pending:
+                    seat = (traveller['flight_id'], traveller['seat_number'])
+                    (next_round if seat in seats else this_round).append((ticket, traveller))
+                    seats.add(seat)
+                inserted, conflicts = insert_bookings(cur, this_round, prices)
+                for ticket, traveller in inserted:
+                    seat_maps.mark_taken(traveller['flight_id'], traveller['seat_number'])
+                    outcomes.append((ticket, CONFIRMED, {
+                        'message': 'Booking confirmed successfully',
+                        'flight_id': traveller['flight_id'],
+                        'seat_number': traveller['seat_number'],
+                        'price': str(prices[traveller['flight_id']]),
+                    }))
+                for ticket, traveller in this_round:
+                    unavailable = conflicts.get((traveller['flight_id'], traveller['seat_number']))
+                    if unavailable is not None:
+                        outcomes.append((ticket, FAILED, {'message': str(unavailable), 'reason': unavailable.reason}))
+                pending = next_round
+        except Exception:
+            mysql.connection.rollback()
+            raise
+        finally:
+            cur.close()
+    app.logger.info(f"Booking Service: Journal batch processed: {len(entries)} entries")
+    return outcomes
+
+
+os.makedirs(os.path.dirname(BOOKING_JOURNAL_PATH) or '.', exist_ok=True)
+booking_journal = BookingJournal(BOOKING_JOURNAL_PATH, BOOKING_QUEUE_MAX_ATTEMPTS)
+if booking_journal.recovered:
+    app.logger.warning(f"Booking Service: Replaying {booking_journal.recovered} journal entries left in progress by a restart")
+booking_queue = JournalWorkerPool(
+    booking_journal, process_journal_batch, BOOKING_QUEUE_WORKERS, BOOKING_QUEUE_BATCH_SIZE,
+    app.logger, retention_seconds=BOOKING_JOURNAL_RETENTION_HOURS * 3600,
+)
+booking_queue.start()
+
+
+@app.route('/api/finalize-booking/async', methods=['POST'])
+@require_token(token_verifier)
+@idempotent(idempotency_store)
+def enqueue_booking():
+    traveller, error = normalize_traveller(request.get_json(silent=True))
+    if error:
+        app.logger.warning(f"Booking Service: Queued booking rejected: {error}")
+        return jsonify({'status': 'error', 'message': error}), 400
+    if not claims_allow(employee_id=traveller['employee_id']):
+        return jsonify({'status': 'error', 'message': 'employee_id does not match the signed-in account'}), 403
+    try:
+        ticket = booking_journal.append(traveller)
+    except Exception as e:
+        app.logger.error(f"Booking Service: Could not journal booking: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Failed to accept booking due to an internal error.'}), 500
+    app.logger.info(f"Booking Service: Booking accepted with ticket {ticket}")
+    return jsonify({
+        'status': 'accepted',
+        'ticket': ticket,
+        'status_url': f'/api/finalize-booking/tickets/{ticket}',
+    }), 202
+
+
+@app.route('/api/finalize-booking/tickets/<ticket>', methods=['GET'])
+@require_token(token_verifier)
+def get_booking_ticket(ticket):
+    entry = booking_journal.get(ticket)
+    if entry is None:
+        return jsonify({'status': 'error', 'message': 'Unknown booking ticket'}), 404
+    return jsonify(entry), 200
+
+# === Seat Hold Endpoints ===
+@app.route('/api/seat-holds', methods=['POST'])
+@require_token(token_verifier)
+def create_seat_hold():
+    data = request.get_json(silent=True) or {}
+    app.logger.info(f"Booking Service received request for {request.endpoint}")
+
+    required_fields = ['employee_id', 'flight_id', 'seat_number']
+    missing_fields = [field for field in required_fields if data.get(field) is None]
+    if missing_fields:
+        return jsonify({'status': 'error', 'message': f'Missing hold data: {", ".join(missing_fields)}'}), 400
+    if not claims_allow(employee_id=data['employee_id']):
+        return jsonify({'status': 'error', 'message': 'employee_id does not match the signed-in account'}), 403
+
+    flight_id = data['flight_id']
+    seat_number = str(data['seat_number']).strip().upper()
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        if hold_sweeper.due():
+            swept = hold_sweeper.sweep(cur)
+            if swept:
+                app.logger.info(f"Booking Service: Swept {swept} expired seat holds.")
+        hold_token = acquire_hold(cur, flight_id, seat_number, data['employee_id'], SEAT_HOLD_TTL_SECONDS)
+        mysql.connection.commit()
+        app.logger.info(f"Booking Service: Seat {seat_number} on flight {flight_id} held for employee {data['employee_id']}.")
+        return jsonify({
+            'status': 'success',
+            'hold_token': hold_token,
+            'flight_id': flight_id,
+            'seat_number': seat_number,
+            'expires_in_seconds': SEAT_HOLD_TTL_SECONDS,
+        }), 201
+    except SeatUnavailable as unavailable:
+        mysql.connection.commit() # Keeps the sweep; a failed acquire leaves nothing behind
+        if unavailable.reason == 'booked':
+            seat_maps.mark_taken(flight_id, seat_number) # This worker's map was stale
+        return jsonify({'status': 'error', 'message': str(unavailable), 'reason': unavailable.reason}), 409
+    except Exception as e:
+        mysql.connection.rollback()
+        app.logger.error(f"Booking Service: Error holding seat {seat_number} on flight {flight_id}: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Failed to hold seat'}), 500
+    finally:
+        if cur:
+            cur.close()
+
+
+@app.route('/api/seat-holds/<hold_token>', methods=['DELETE'])
+@require_token(token_verifier)
+def delete_seat_hold(hold_token):
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        released = release_hold(cur, hold_token)
+        mysql.connection.commit()
+        if released is None:
+            return jsonify({'status': 'error', 'message': 'Hold not found'}), 404
+        return jsonify({'status': 'success', 'flight_id': released[0], 'seat_number': released[1]}), 200
+    except Exception as e:
+        mysql.connection.rollback()
+        app.logger.error(f"Booking Service: Error releasing seat hold: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Failed to release seat hold'}), 500
+    finally:
+        if cur:
+            cur.close()
+
+# === Seat Map Endpoint ===
+@app.route('/api/seats/<int:flight_id>', methods=['GET'])
+@require_token(token_verifier)
+def get_seat_map(flight_id):
+    app.logger.debug(f"Booking Service received seat map request for flight ID {flight_id}")
+    try:
+        return json_response(seat_maps.body(flight_id), 200)
+    except Exception as e:
+        app.logger.error(f"Booking Service: Error loading seat map for flight {flight_id}: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Failed to load seat map'}), 500
+
+# === Price Cache Invalidation Endpoint (INTERNAL, pushed by Flight Service) ===
+@app.route('/api/internal/bookings/price-cache/invalidate', methods=['POST'])
+def invalidate_price_cache():
+    data = request.get_json(silent=True) or {}
+    flight_ids = data.get('flight_ids')
+    if flight_ids is not None:
+        if not isinstance(flight_ids, list):
+            return jsonify({'status': 'error', 'message': 'flight_ids must be a list'}), 400
+        try:
+            flight_ids = [int(flight_id) for flight_id in flight_ids]
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'flight_ids must be integers'}), 400
+    flight_prices.invalidate(flight_ids)
+    app.logger.info(f"Booking Service: Price cache invalidated for {len(flight_ids) if flight_ids is not None else 'ALL'} flights")
+    return jsonify({'status': 'success'}), 200
+
+# === Internal Metrics Endpoint ===
+@app.route('/api/internal/bookings/metrics', methods=['GET'])
+def get_booking_metrics():
+    return jsonify({
+        'dependencies': {flight_service.name: flight_service.stats()},
+        'price_cache': flight_prices.stats(),
+        'idempotency': idempotency_store.stats(),
+        'booking_queue': booking_queue.stats(),
+        'outbox_relay': outbox_relay.stats(),
+        'seat_maps': seat_maps.stats(),
+        'seat_holds': {'ttl_seconds': SEAT_HOLD_TTL_SECONDS, 'expired_swept': hold_sweeper.swept},
+        'auth_tokens': token_verifier.stats(),
+    }), 200
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -0,0 +1,207 @@
+# services/booking_service/booking_journal.py
+# Durable local journal (SQLite, WAL mode) for write-behind booking ingestion.
+import json
+import secrets
+import sqlite3
+import threading
+import time
+
+QUEUED = 'queued'
+PROCESSING = 'processing'
+CONFIRMED = 'confirmed'
+FAILED = 'failed'
+
+
+class BookingJournal:
+    """
+    Append-only queue of accepted booking requests, keyed by ticket.
+
+    append() returns only after the entry is committed with synchronous=FULL,
+    so an acknowledged ticket survives a process or machine crash. On open,
+    entries left in 'processing' by a crash are put back to 'queued' and
+    replayed; the worker makes replays safe (bookings.booking_ticket is unique).
+    """
+
+    def __init__(self, path, max_attempts=5):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=FULL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS booking_journal (
+                    ticket TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_booking_journal_status ON booking_journal (status, created_at)")
+            self.recovered = self._db.execute(
+                "UPDATE booking_journal SET status = ?, updated_at = ? WHERE status = ?",
+                (QUEUED, time.time(), PROCESSING)
+            ).rowcount
+
+    def append(self, payload):
+        ticket = secrets.token_hex(16)
+        now = time.time()
+        with self._work:
+            self._db.execute(
+                "INSERT INTO booking_journal (ticket, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (ticket, json.dumps(payload), QUEUED, now, now)
+            )
+            self._work.notify()
+        return ticket
+
+    def claim(self, limit, wait=1.0):
+        """Moves up to `limit` queued entries to 'processing' (oldest first), waiting up to `wait` seconds for work."""
+        with self._work:
+            rows = self._queued(limit)
+            if not rows:
+                self._work.wait(wait)
+                rows = self._queued(limit)
+            if not rows:
+                return []
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "UPDATE booking_journal SET status = ?, attempts = attempts + 1, updated_at = ? WHERE ticket = ?",
+                [(PROCESSING, now, row['ticket']) for row in rows]
+            )
+            self._db.execute("COMMIT")
+        return [(row['ticket'], json.loads(row['payload']), row['attempts'] + 1) for row in rows]
+
+    def _queued(self, limit):
+        return self._db.execute(
+            "SELECT ticket, payload, attempts FROM booking_journal WHERE status = ? ORDER BY created_at LIMIT ?",
+            (QUEUED, limit)
+        ).fetchall()
+
+    def complete(self, outcomes):
+        """outcomes: [(ticket, status, result dict)], written in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "UPDATE booking_journal SET status = ?, result = ?, updated_at = ? WHERE ticket = ?",
+                [(status, json.dumps(result, default=str), now, ticket) for ticket, status, result in outcomes]
+            )
+            self._db.execute("COMMIT")
+
+    def retry_later(self, tickets, error):
+        """Returns entries to the queue after a transient failure, failing those out of attempts."""
+        now = time.time()
+        with self._work:
+            self._db.execute("BEGIN IMMEDIATE")
+            for ticket in tickets:
+                self._db.execute("""
+                    UPDATE booking_journal
+                    SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, result = ?, updated_at = ?
+                    WHERE ticket = ?
+                """, (self.max_attempts, FAILED, QUEUED, json.dumps({'message': error, 'reason': 'unavailable'}), now, ticket))
+            self._db.execute("COMMIT")
+
+    def get(self, ticket):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT ticket, status, result, attempts, created_at, updated_at FROM booking_journal WHERE ticket = ?",
+                (ticket,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry['result'] = json.loads(entry['result']) if entry['result'] else None
+        return entry
+
+    def purge(self, older_than_seconds):
+        """Deletes finished entries older than the retention window; returns how many."""
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM booking_journal WHERE status IN (?, ?) AND updated_at < ?",
+                (CONFIRMED, FAILED, time.time() - older_than_seconds)
+            ).rowcount
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM booking_journal GROUP BY status").fetchall())
+            oldest = self._db.execute(
+                "SELECT MIN(created_at) FROM booking_journal WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+        return {
+            'path': self.path,
+            'queued': counts.get(QUEUED, 0),
+            'processing': counts.get(PROCESSING, 0),
+            'confirmed': counts.get(CONFIRMED, 0),
+            'failed': counts.get(FAILED, 0),
+            'oldest_queued_age_seconds': round(time.time() - oldest, 3) if oldest else None,
+            'recovered_on_start': self.recovered,
+        }
+
+
+class JournalWorkerPool:
+    """
+    `workers` daemon threads that claim batches from the journal and hand them to
+    `process(entries)`, which returns [(ticket, status, result)]. Any exception
+    from `process` is treated as transient: the batch goes back to the queue.
+    """
+
+    def __init__(self, journal, process, workers, batch_size, logger, retention_seconds=86400):
+        self.journal = journal
+        self._process = process
+        self.workers = workers
+        self.batch_size = batch_size
+        self.logger = logger
+        self.retention_seconds = retention_seconds
+        self._threads = []
+        self._last_purge = time.monotonic()
+        self._purge_lock = threading.Lock()
+        self.batches = 0
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'booking-journal-worker-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            try:
+                entries = self.journal.claim(self.batch_size)
+                if entries:
+                    self._drain(entries)
+                self._purge_if_due()
+            except Exception as e:
+                self.logger.error(f"Booking journal worker error: {e}", exc_info=True)
+                time.sleep(1)
+
+    def _drain(self, entries):
+        try:
+            outcomes = self._process(entries)
+        except Exception as e:
+            self.logger.warning(f"Booking journal: batch of {len(entries)} will be retried: {e}")
+            self.journal.retry_later([ticket for ticket, _, _ in entries], str(e))
+            time.sleep(1) # Back off while the dependency recovers
+            return
+        self.journal.complete(outcomes)
+        self.batches += 1
+
+    def _purge_if_due(self):
+        with self._purge_lock:
+            if time.monotonic() - self._last_purge < 600:
+                return
+            self._last_purge = time.monotonic()
+        purged = self.journal.purge(self.retention_seconds)
+        if purged:
+            self.logger.info(f"Booking journal: purged {purged} finished entries")
+
+    def stats(self):
+        stats = self.journal.stats()
+        stats.update({'workers': self.workers, 'batch_size': self.batch_size, 'batches_processed': self.batches})
+        return stats
@@ -0,0 +1,128 @@
+# services/booking_service/booking_outbox.py
+# Transactional outbox for booking events (db/migrations/008_booking_outbox.sql).
+import threading
+import time
+
+from common.serialization import dumps
+
+BOOKING_CONFIRMED = 'booking.confirmed'
+
+
+def record_booking_confirmed(cur, seats):
+    """
+    Writes one booking.confirmed outbox row per (flight_id, seat_number) just
+    booked. Must run on the booking's own cursor before its commit, so the event
+    exists if and only if the booking does.
+    """
+    if not seats:
+        return 0
+    placeholders = ', '.join(['(%s, %s)'] * len(seats))
+    cur.execute(f"""
+        SELECT b.id, b.employee_id, e.company_id, b.flight_id, b.seat_number, b.origin, b.destination,
+               b.airline, b.price, b.booking_time
+        FROM bookings b LEFT JOIN employees e ON e.id = b.employee_id
+        WHERE b.status = 'Confirmed' AND (b.flight_id, b.seat_number) IN ({placeholders})
+    """, tuple(value for seat in seats for value in seat))
+    rows = cur.fetchall()
+    cur.executemany(
+        "INSERT INTO booking_outbox (event_type, aggregate_id, company_id, payload) VALUES (%s, %s, %s, %s)",
+        [(BOOKING_CONFIRMED, row['id'], row['company_id'], dumps(row).decode('utf-8')) for row in rows]
+    )
+    return len(rows)
+
+
+class OutboxRelay:
+    """
+    Background thread that publishes committed outbox rows to an EventLog and
+    marks them published. A crash between the two re-publishes the batch, so
+    consumers see every event at least once and de-duplicate on its id.
+    Runs its queries inside `app.app_context()` (request-scoped MySQL connection).
+    """
+
+    def __init__(self, app, mysql, event_log, interval, batch_size=500, retention_days=7, keep_segments=8):
+        self.app = app
+        self.mysql = mysql
+        self.event_log = event_log
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self.keep_segments = keep_segments # Event log retention; consumers further behind lose events
+        self._thread = None
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self.published = 0
+        self.failures = 0
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='booking-outbox-relay', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    while self.relay_once() == self.batch_size:
+                        pass # Catch up on a backlog without sleeping between batches
+                    if time.monotonic() - self._last_prune >= 3600:
+                        self._last_prune = time.monotonic()
+                        self._prune()
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                self.app.logger.warning(f"Booking outbox relay: publish failed, will retry: {e}")
+            time.sleep(self.interval)
+
+    def relay_once(self):
+        cur = self.mysql.connection.cursor()
+        try:
+            cur.execute("""
+                SELECT id, event_type, aggregate_id, company_id, payload, created_at
+                FROM booking_outbox WHERE published_at IS NULL ORDER BY id LIMIT %s
+            """, (self.batch_size,))
+            rows = cur.fetchall()
+            if not rows:
+                return 0
+            self.event_log.publish([{
+                'id': row['id'],
+                'type': row['event_type'],
+                'aggregate_id': row['aggregate_id'],
+                'company_id': row['company_id'],
+                'created_at': row['created_at'],
+                'payload': row['payload'], # JSON text, decoded by consumers
+            } for row in rows])
+            placeholders = ', '.join(['%s'] * len(rows))
+            cur.execute(
+                f"UPDATE booking_outbox SET published_at = NOW(6) WHERE id IN ({placeholders})",
+                tuple(row['id'] for row in rows)
+            )
+            self.mysql.connection.commit()
+        finally:
+            cur.close()
+        with self._lock:
+            self.published += len(rows)
+        return len(rows)
+
+    def _prune(self):
+        cur = self.mysql.connection.cursor()
+        try:
+            cur.execute(
+                "DELETE FROM booking_outbox WHERE published_at < DATE_SUB(NOW(6), INTERVAL %s DAY) LIMIT 10000",
+                (self.retention_days,)
+            )
+            self.mysql.connection.commit()
+        finally:
+            cur.close()
+        self.event_log.prune(self.keep_segments)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interval_seconds': self.interval,
+                'published': self.published,
+                'failures': self.failures,
+                'last_error': self.last_error,
+                'event_log_segments': len(self.event_log.segments()),
+            }
@@ -0,0 +1,79 @@
+# services/booking_service/price_cache.py
+# Local copy of flight prices so finalize-booking can usually skip the flight-service hop.
+import threading
+
+from common.ttl_cache import TTLCache
+
+
+class FlightPriceCache:
+    """
+    flight_id -> price, fetched from flight-service on a miss.
+
+    Entries live at most `max_staleness` seconds, which bounds how stale a
+    price can be even if an invalidation push from flight-service is lost.
+    A push received while a fetch is in flight wins: the fetched price is
+    returned to that caller but not stored, so it cannot outlive the push.
+    """
+
+    def __init__(self, fetch, max_entries, max_staleness, fetch_many=None):
+        self._fetch = fetch # flight_id -> price (Decimal), or None if the flight does not exist
+        self._fetch_many = fetch_many # [flight_id] -> {flight_id: price or None}, one round trip
+        self._cache = TTLCache(max_entries, max_staleness)
+        self._generation = 0 # Bumped by every invalidation
+        self._lock = threading.Lock()
+        self.pushes = 0
+
+    def get(self, flight_id):
+        price = self._cache.get(flight_id)
+        if price is not None:
+            return price
+        with self._lock:
+            generation = self._generation
+        price = self._fetch(flight_id)
+        if price is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._cache.set(flight_id, price)
+        return price
+
+    def get_many(self, flight_ids):
+        """Returns {flight_id: price or None}; all misses are fetched together."""
+        prices = {}
+        misses = []
+        for flight_id in dict.fromkeys(flight_ids):
+            price = self._cache.get(flight_id)
+            if price is None:
+                misses.append(flight_id)
+            else:
+                prices[flight_id] = price
+        if not misses:
+            return prices
+        with self._lock:
+            generation = self._generation
+        if self._fetch_many is not None:
+            fetched = self._fetch_many(misses)
+        else:
+            fetched = {flight_id: self._fetch(flight_id) for flight_id in misses}
+        with self._lock:
+            for flight_id in misses:
+                price = fetched.get(flight_id)
+                prices[flight_id] = price
+                if price is not None and generation == self._generation:
+                    self._cache.set(flight_id, price)
+        return prices
+
+    def invalidate(self, flight_ids=None):
+        """Drops the given flights, or every cached price when flight_ids is None."""
+        with self._lock:
+            self._generation += 1
+            self.pushes += 1
+            if flight_ids is None:
+                self._cache.clear()
+            else:
+                for flight_id in flight_ids:
+                    self._cache.invalidate(flight_id)
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats['invalidation_pushes'] = self.pushes
+        return stats
@@ -0,0 +1,186 @@
+# services/booking_service/seat_holds.py
+# Short-lived seat holds (seat_holds table) and their conversion into bookings.
+#
+# Correctness rests on two keys in the database, not on application checks:
+#   seat_holds PRIMARY KEY (flight_id, seat_number)      -> at most one live hold per seat
+#   bookings UNIQUE (flight_id, confirmed_seat)           -> at most one confirmed booking per seat
+# (see db/migrations/005_seat_holds.sql). Every function takes an open cursor and
+# leaves commit/rollback to the caller.
+import secrets
+import threading
+import time
+
+MYSQL_DUPLICATE_ENTRY = 1062 # ER_DUP_ENTRY
+
+# Takes the seat if it is free, expired, or already held by the same employee; otherwise
+# leaves the existing hold untouched. The row lock on the primary key makes this atomic.
+# hold_token is assigned first so the following assignments can tell whether we won.
+ACQUIRE_HOLD_SQL = """
+    INSERT INTO seat_holds (flight_id, seat_number, employee_id, hold_token, expires_at)
+    VALUES (%s, %s, %s, %s, DATE_ADD(NOW(6), INTERVAL %s SECOND))
+    ON DUPLICATE KEY UPDATE
+        hold_token = IF(expires_at <= NOW(6) OR employee_id = VALUES(employee_id), VALUES(hold_token), hold_token),
+        employee_id = IF(hold_token = VALUES(hold_token), VALUES(employee_id), employee_id),
+        expires_at = IF(hold_token = VALUES(hold_token), VALUES(expires_at), expires_at)
+"""
+
+
+class SeatUnavailable(Exception):
+    """The seat cannot be held or booked; `reason` is 'booked', 'held' or 'hold_expired'."""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+
+def is_duplicate_entry(error):
+    return bool(error.args) and error.args[0] == MYSQL_DUPLICATE_ENTRY
+
+
+def acquire_hold(cur, flight_id, seat_number, employee_id, ttl_seconds):
+    """
+    Places (or refreshes) a hold for `employee_id` and returns its token.
+
+    An employee holds at most one seat per flight: choosing another seat
+    releases the previous one. Raises SeatUnavailable if the seat is booked or
+    held by someone else.
+    """
+    hold_token = secrets.token_urlsafe(16)
+    cur.execute(ACQUIRE_HOLD_SQL, (flight_id, seat_number, employee_id, hold_token, int(ttl_seconds)))
+    cur.execute(
+        "SELECT hold_token FROM seat_holds WHERE flight_id = %s AND seat_number = %s",
+        (flight_id, seat_number)
+    )
+    row = cur.fetchone()
+    if not row or row['hold_token'] != hold_token:
+        raise SeatUnavailable(f'Seat {seat_number} is being booked by someone else.', 'held')
+
+    # Checked after taking the hold: a booking committed before our upsert is visible here,
+    # and one committed after it had to consume our hold first (it can't).
+    cur.execute(
+        "SELECT id FROM bookings WHERE flight_id = %s AND seat_number = %s AND status = 'Confirmed' LIMIT 1",
+        (flight_id, seat_number)
+    )
+    if cur.fetchone():
+        cur.execute("DELETE FROM seat_holds WHERE hold_token = %s", (hold_token,))
+        raise SeatUnavailable(f'Seat {seat_number} is no longer available.', 'booked')
+
+    cur.execute(
+        "DELETE FROM seat_holds WHERE flight_id = %s AND employee_id = %s AND seat_number <> %s",
+        (flight_id, employee_id, seat_number)
+    )
+    return hold_token
+
+
+def consume_hold(cur, flight_id, seat_number, employee_id, hold_token):
+    """Deletes a live hold owned by `employee_id`; the caller inserts the booking in the same transaction."""
+    cur.execute("""
+        DELETE FROM seat_holds
+        WHERE flight_id = %s AND seat_number = %s AND employee_id = %s AND hold_token = %s AND expires_at > NOW(6)
+    """, (flight_id, seat_number, employee_id, hold_token))
+    if cur.rowcount != 1:
+        raise SeatUnavailable(f'Your hold on seat {seat_number} has expired. Please choose a seat again.', 'hold_expired')
+
+
+def claim_seat(cur, flight_id, seat_number, employee_id, hold_token=None, ttl_seconds=60):
+    """
+    Turns a hold into the right to insert the booking. Requests without a token
+    (older clients) take and consume a hold on the spot, so they still respect
+    other employees' live holds.
+    """
+    if hold_token is None:
+        hold_token = acquire_hold(cur, flight_id, seat_number, employee_id, ttl_seconds)
+    consume_hold(cur, flight_id, seat_number, employee_id, hold_token)
+
+
+def claim_seats(cur, claims):
+    """
+    Set-based claim_seat for bulk bookings.
+
+    `claims` is a list of (flight_id, seat_number, employee_id, hold_token or
+    None). Locks the matching hold rows, reads the confirmed bookings of all
+    seats in one query, then deletes the holds of the claims that may proceed.
+    Returns {(flight_id, seat_number): SeatUnavailable} for the others.
+    """
+    if not claims:
+        return {}
+    keys = list(dict.fromkeys((flight_id, seat_number) for flight_id, seat_number, _, _ in claims))
+    placeholders = ', '.join(['(%s, %s)'] * len(keys))
+    params = tuple(value for key in keys for value in key)
+
+    # Locking reads see the latest committed rows, not this transaction's snapshot
+    cur.execute(f"""
+        SELECT flight_id, seat_number, employee_id, hold_token FROM seat_holds
+        WHERE (flight_id, seat_number) IN ({placeholders}) AND expires_at > NOW(6)
+        FOR UPDATE
+    """, params)
+    holds = {(row['flight_id'], row['seat_number'].upper()): row for row in cur.fetchall()}
+    cur.execute(f"""
+        SELECT flight_id, seat_number FROM bookings
+        WHERE status = 'Confirmed' AND (flight_id, seat_number) IN ({placeholders})
+        LOCK IN SHARE MODE
+    """, params)
+    booked = {(row['flight_id'], row['seat_number'].upper()) for row in cur.fetchall()}
+
+    failures = {}
+    consumed = [] # Claims covered by a live hold of their own employee
+    for flight_id, seat_number, employee_id, hold_token in claims:
+        key = (flight_id, seat_number)
+        hold = holds.get(key)
+        if key in booked:
+            failures[key] = SeatUnavailable(f'Seat {seat_number} is no longer available.', 'booked')
+        elif hold is not None and hold['employee_id'] != employee_id:
+            failures[key] = SeatUnavailable(f'Seat {seat_number} is being booked by someone else.', 'held')
+        elif hold_token is not None and (hold is None or hold['hold_token'] != hold_token):
+            failures[key] = SeatUnavailable(f'The hold on seat {seat_number} has expired.', 'hold_expired')
+        elif hold is not None:
+            consumed.append(key)
+
+    if consumed:
+        placeholders = ', '.join(['(%s, %s)'] * len(consumed))
+        cur.execute(
+            f"DELETE FROM seat_holds WHERE (flight_id, seat_number) IN ({placeholders})",
+            tuple(value for key in consumed for value in key)
+        )
+    return failures
+
+
+def release_hold(cur, hold_token):
+    """Returns (flight_id, seat_number) of the released hold, or None if there was none."""
+    cur.execute("SELECT flight_id, seat_number FROM seat_holds WHERE hold_token = %s", (hold_token,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    cur.execute("DELETE FROM seat_holds WHERE hold_token = %s", (hold_token,))
+    return row['flight_id'], row['seat_number']
+
+
+class HoldSweeper:
+    """
+    Deletes expired holds at most once every `interval` seconds per worker.
+
+    Expired holds never block anyone (acquire_hold takes them over); sweeping
+    only keeps the table small.
+    """
+
+    def __init__(self, interval, batch_size=500):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._last_run = 0.0
+        self._lock = threading.Lock()
+        self.swept = 0
+
+    def due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_run < self.interval:
+                return False
+            self._last_run = now
+            return True
+
+    def sweep(self, cur):
+        cur.execute("DELETE FROM seat_holds WHERE expires_at <= NOW(6) LIMIT %s", (self.batch_size,))
+        deleted = cur.rowcount
+        with self._lock:
+            self.swept += deleted
+        return deleted
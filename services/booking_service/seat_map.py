@@ -0,0 +1,184 @@
+# services/booking_service/seat_map.py
+# Per-flight seat occupancy kept as a compact bitmap (one bit per seat).
+import base64
+import re
+import threading
+import time
+
+from common.serialization import dumps
+
+SEAT_NUMBER_PATTERN = re.compile(r'^\s*(\d+)\s*([A-Za-z])\s*$')
+
+
+class SeatLayout:
+    """Row-major seat numbering: seat '1A' is bit 0, '1B' bit 1, ... '2A' bit len(columns)."""
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns.upper()
+        self.size = rows * len(self.columns)
+
+    def index(self, seat_number):
+        """Returns the bit index of a seat like '3C', or None if it is outside the layout."""
+        match = SEAT_NUMBER_PATTERN.match(str(seat_number))
+        if not match:
+            return None
+        row = int(match.group(1))
+        column = self.columns.find(match.group(2).upper())
+        if row < 1 or row > self.rows or column < 0:
+            return None
+        return (row - 1) * len(self.columns) + column
+
+    def seat_number(self, index):
+        row, column = divmod(index, len(self.columns))
+        return f"{row + 1}{self.columns[column]}"
+
+
+class SeatBitmap:
+    """
+    Occupancy of one flight. Seats outside the layout (legacy or free-form seat
+    numbers) are tracked in a small side set so they still count as taken.
+    """
+
+    __slots__ = ('layout', 'bits', 'extra', 'loaded_at', '_body')
+
+    def __init__(self, layout, loaded_at):
+        self.layout = layout
+        self.bits = bytearray((layout.size + 7) // 8)
+        self.extra = set()
+        self.loaded_at = loaded_at
+        self._body = None
+
+    def set(self, seat_number, taken=True):
+        index = self.layout.index(seat_number)
+        if index is None:
+            key = str(seat_number).strip().upper()
+            if taken:
+                self.extra.add(key)
+            else:
+                self.extra.discard(key)
+        elif taken:
+            self.bits[index >> 3] |= 1 << (index & 7)
+        else:
+            self.bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+        self._body = None
+
+    def is_taken(self, seat_number):
+        index = self.layout.index(seat_number)
+        if index is None:
+            return str(seat_number).strip().upper() in self.extra
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def occupied(self):
+        layout = self.layout
+        seats = [layout.seat_number(index) for index in range(layout.size)
+                 if self.bits[index >> 3] & (1 << (index & 7))]
+        return seats + sorted(self.extra)
+
+    def body(self, flight_id):
+        """JSON response bytes, built once per change and then shared by every reader."""
+        body = self._body
+        if body is None:
+            occupied = self.occupied()
+            body = dumps({
+                'flight_id': flight_id,
+                'rows': self.layout.rows,
+                'columns': self.layout.columns,
+                'bitmap': base64.b64encode(bytes(self.bits)).decode('ascii'), # LSB-first, row-major
+                'occupied': occupied,
+                'available_count': self.layout.size - (len(occupied) - len(self.extra)),
+            })
+            self._body = body
+        return body
+
+
+class _PendingLoad:
+    """A bitmap load in progress: marks to replay onto it, and the result for threads waiting on it."""
+
+    __slots__ = ('marks', 'done', 'seat_map')
+
+    def __init__(self):
+        self.marks = [] # (seat_number, taken) applied while the load runs
+        self.done = threading.Event()
+        self.seat_map = None # Set once loaded; stays None if the load failed
+
+
+class SeatMapStore:
+    """
+    Process-wide cache of SeatBitmaps keyed by flight_id.
+
+    Bitmaps are loaded from the bookings table on first use and reloaded after
+    `refresh_seconds`, which picks up bookings confirmed by other workers.
+    Bookings confirmed by this worker are applied immediately via mark_taken().
+    Only one thread loads a given flight at a time; others serve the old bitmap
+    or, when there is none yet, wait for that load.
+    """
+
+    def __init__(self, layout, loader, refresh_seconds, max_flights=10000):
+        self.layout = layout
+        self._loader = loader # flight_id -> iterable of occupied seat numbers
+        self.refresh_seconds = refresh_seconds
+        self.max_flights = max_flights
+        self._maps = {}
+        self._pending = {} # flight_id -> _PendingLoad while that flight's bitmap is being (re)loaded
+        self._lock = threading.Lock()
+
+    def get(self, flight_id):
+        now = time.monotonic()
+        with self._lock:
+            seat_map = self._maps.get(flight_id)
+            load = self._pending.get(flight_id)
+            if seat_map is not None:
+                if now - seat_map.loaded_at < self.refresh_seconds or load is not None:
+                    # Fresh, or another thread is already reloading it: serve what we have
+                    return seat_map
+            loading = load is None
+            if loading:
+                load = self._pending[flight_id] = _PendingLoad() # Marks made while we load are replayed onto it
+        if not loading:
+            # Nothing to serve yet and another thread is loading it: share that load
+            load.done.wait()
+            return load.seat_map if load.seat_map is not None else self.get(flight_id)
+        try:
+            fresh = SeatBitmap(self.layout, now)
+            for seat_number in self._loader(flight_id):
+                fresh.set(seat_number)
+        except BaseException: # Waiters must never be left blocked
+            with self._lock:
+                self._pending.pop(flight_id, None)
+            load.done.set()
+            raise
+        with self._lock:
+            del self._pending[flight_id]
+            for seat_number, taken in load.marks:
+                fresh.set(seat_number, taken)
+            if len(self._maps) >= self.max_flights and flight_id not in self._maps:
+                self._maps.pop(next(iter(self._maps))) # Drop the oldest-loaded flight
+            self._maps[flight_id] = fresh
+        load.seat_map = fresh
+        load.done.set()
+        return fresh
+
+    def body(self, flight_id):
+        """Encoded seat map for a flight (built under the lock so it never mixes two updates)."""
+        seat_map = self.get(flight_id)
+        with self._lock:
+            return seat_map.body(flight_id)
+
+    def mark_taken(self, flight_id, seat_number, taken=True):
+        """Applies a confirmed (or released) booking to an already-loaded bitmap."""
+        with self._lock:
+            seat_map = self._maps.get(flight_id)
+            if seat_map is not None:
+                seat_map.set(seat_number, taken)
+            load = self._pending.get(flight_id)
+            if load is not None:
+                load.marks.append((seat_number, taken))
+
+    def invalidate(self, flight_id):
+        with self._lock:
+            self._maps.pop(flight_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {'flights_loaded': len(self._maps), 'refresh_seconds': self.refresh_seconds}
@@ -0,0 +1,181 @@
+# services/booking_service/stress_seat_holds.py
+# Concurrency stress test for seat holds: many employees race for a handful of
+# seats on one flight, then we check that no seat was confirmed twice.
+#
+# Runs against a live stack (through the API gateway) and writes real bookings,
+# so point it at a development database and a flight with free seats. Session tokens
+# are signed locally for each employee, so AUTH_TOKEN_KEYS must hold the stack's key(s).
+# After the run the bookings table is checked directly, through the usual MYSQL_*
+# variables (compose publishes MySQL on localhost:3306). From the services/booking_service directory:
+#     AUTH_TOKEN_KEYS=... MYSQL_PASSWORD=... PYTHONPATH=.. python stress_seat_holds.py --flight-id 7 --employees 1-40 --seats 1A,1B,1C,1D
+#
+# Exits with status 1 if any seat of the flight has more than one confirmed booking in the
+# database (or more than one successful finalize response), or if no booking was
+# confirmed at all (nothing was tested, e.g. every call got 401).
+import argparse
+import collections
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import MySQLdb
+import MySQLdb.cursors
+import requests
+
+from common.auth_tokens import TokenSigner
+
+
+def parse_range(value):
+    """'1-40' or '3,5,8' -> list of ints."""
+    if '-' in value:
+        start, end = value.split('-', 1)
+        return list(range(int(start), int(end) + 1))
+    return [int(part) for part in value.split(',') if part]
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statuses = collections.Counter()
+        self.confirmed = collections.Counter() # seat -> successful finalize responses
+        self.latencies = []
+
+    def record(self, label, status, latency):
+        with self.lock:
+            self.statuses[f"{label} {status}"] += 1
+            self.latencies.append(latency)
+
+
+def attempt(session, args, results, rng_seed):
+    rng = random.Random(rng_seed)
+    employee_id = rng.choice(args.employee_ids)
+    seat_number = rng.choice(args.seat_list)
+    hold_token = None
+    headers = {'Authorization': f"Bearer {args.tokens[employee_id]}"}
+
+    if rng.random() >= args.tokenless_ratio:
+        started = time.perf_counter()
+        response = session.post(f"{args.base_url}/api/seat-holds", json={
+            'employee_id': employee_id, 'flight_id': args.flight_id, 'seat_number': seat_number,
+        }, headers=headers, timeout=10)
+        results.record('hold', response.status_code, time.perf_counter() - started)
+        if response.status_code != 201:
+            return
+        hold_token = response.json()['hold_token']
+
+    started = time.perf_counter()
+    response = session.post(f"{args.base_url}/api/finalize-booking", json={
+        'employee_id': employee_id,
+        'flight_id': args.flight_id,
+        'seat_number': seat_number,
+        'origin': args.origin,
+        'destination': args.destination,
+        'airline': args.airline,
+        'hold_token': hold_token,
+    }, headers=headers, timeout=30)
+    results.record('finalize', response.status_code, time.perf_counter() - started)
+    if response.status_code == 200:
+        with results.lock:
+            results.confirmed[seat_number] += 1
+
+
+def confirmed_bookings_in_db(flight_id):
+    """Returns {seat_number: confirmed rows} for the flight, read from the bookings table."""
+    connection = MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', '127.0.0.1'),
+        port=int(os.environ.get('MYSQL_PORT', '3306')),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', 'password'),
+        db=os.environ.get('MYSQL_DB', 'cc'),
+        cursorclass=MySQLdb.cursors.DictCursor,
+    )
+    try:
+        cur = connection.cursor()
+        cur.execute(
+            "SELECT seat_number, COUNT(*) AS bookings FROM bookings"
+            " WHERE flight_id = %s AND status = 'Confirmed' GROUP BY seat_number",
+            (flight_id,)
+        )
+        return {row['seat_number']: row['bookings'] for row in cur.fetchall()}
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--base-url', default='http://localhost:8080')
+    parser.add_argument('--flight-id', type=int, required=True)
+    parser.add_argument('--employees', default='1-20', help="employee ids, e.g. '1-40' or '3,5,8'")
+    parser.add_argument('--seats', default='1A,1B,1C,1D', help='comma-separated seats to fight over')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--tokenless-ratio', type=float, default=0.25,
+                        help='share of attempts that finalize without a hold (older clients)')
+    parser.add_argument('--origin', default='Stress Test')
+    parser.add_argument('--destination', default='Stress Test')
+    parser.add_argument('--airline', default='Stress Test')
+    parser.add_argument('--company-id', type=int, default=1, help="company id put in the employees' tokens")
+    parser.add_argument('--role-id', type=int, default=1, help="role id put in the employees' tokens")
+    args = parser.parse_args()
+    args.employee_ids = parse_range(args.employees)
+    try:
+        signer = TokenSigner.from_env()
+    except ValueError as e:
+        sys.exit(f"Cannot sign session tokens: {e}")
+    args.tokens = {
+        employee_id: signer.sign(employee_id, args.company_id, args.role_id)[0] for employee_id in args.employee_ids
+    }
+    args.seat_list = [seat.strip().upper() for seat in args.seats.split(',') if seat.strip()]
+
+    results = Results()
+    local = threading.local()
+
+    def run(seed):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        try:
+            attempt(local.session, args, results, seed)
+        except requests.RequestException as e:
+            results.record('error', type(e).__name__, 0.0)
+
+    print(f"{args.requests} attempts, {args.workers} workers, {len(args.employee_ids)} employees, seats {args.seat_list}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(run, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(results.latencies)
+    print(f"Finished in {elapsed:.1f}s ({len(latencies) / elapsed:,.0f} requests/sec)")
+    if latencies:
+        print(f"Latency p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms")
+    for label, count in sorted(results.statuses.items()):
+        print(f"  {label:<28} {count}")
+    if not results.confirmed:
+        print("FAIL: no finalize call succeeded, so nothing was tested (check the statuses above)")
+        sys.exit(1)
+
+    seat_map = requests.get(f"{args.base_url}/api/seats/{args.flight_id}", timeout=10, headers={
+        'Authorization': f"Bearer {args.tokens[args.employee_ids[0]]}",
+    })
+    seat_map.raise_for_status()
+    occupied = set(seat_map.json().get('occupied', []))
+    # Responses alone miss rows written after a client timeout or by a retried request
+    in_db = confirmed_bookings_in_db(args.flight_id)
+    print("Confirmed bookings per seat (successful finalize responses / rows in the database):")
+    for seat in args.seat_list:
+        print(f"  {seat:<6} {results.confirmed.get(seat, 0)} / {in_db.get(seat, 0)}")
+    print(f"Seat map reports occupied: {sorted(occupied & set(args.seat_list))}")
+    double_booked_in_db = {seat: count for seat, count in in_db.items() if count > 1}
+    double_booked = {seat: count for seat, count in results.confirmed.items() if count > 1}
+    if double_booked_in_db or double_booked:
+        print(f"FAIL: double bookings in the database {double_booked_in_db}, in responses {double_booked}")
+        sys.exit(1)
+    print("OK: zero double bookings (database and responses)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+# services/common/__init__.py
+# Code shared by the backend microservices. Copied into each image as /app/common
+# (see the service Dockerfiles; docker-compose builds them with ./services as context).
@@ -0,0 +1,205 @@
+# services/common/auth_tokens.py
+# Signed session tokens: issued by auth-service on login, verified locally by every other service.
+#
+# Tokens are compact JWTs (HS256): base64url(header).base64url(claims).base64url(HMAC-SHA256).
+# The header carries a key id ('kid'), so several keys can be valid at once:
+#
+#   AUTH_TOKEN_KEYS           "kid:secret,kid:secret"  all keys accepted by verifiers
+#   AUTH_TOKEN_ACTIVE_KEY_ID  kid auth-service signs with (default: the first key listed)
+#
+# Key rotation: add the new key to AUTH_TOKEN_KEYS everywhere, then switch
+# AUTH_TOKEN_ACTIVE_KEY_ID on auth-service, then drop the old key once every
+# token signed with it has expired (AUTH_TOKEN_TTL_SECONDS).
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from flask import request, jsonify, g
+
+TOKEN_TYPE = 'JWT'
+ALGORITHM = 'HS256'
+
+
+class InvalidToken(Exception):
+    """Malformed, badly signed, signed with an unknown key, or expired."""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+
+def parse_keys(spec):
+    """Parses "kid:secret,kid:secret" into an ordered {kid: secret bytes} dict."""
+    keys = {}
+    for entry in (spec or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        kid, sep, secret = entry.partition(':')
+        if not sep or not kid or not secret:
+            raise ValueError(f"Invalid AUTH_TOKEN_KEYS entry for key id '{kid}' (expected kid:secret)")
+        keys[kid] = secret.encode('utf-8')
+    return keys
+
+
+class TokenSigner:
+
+    def __init__(self, keys, active_kid=None, ttl=8 * 3600):
+        if not keys:
+            raise ValueError('No token signing keys configured (AUTH_TOKEN_KEYS)')
+        self.active_kid = active_kid or next(iter(keys))
+        if self.active_kid not in keys:
+            raise ValueError(f"Active token key id '{self.active_kid}' is not in AUTH_TOKEN_KEYS")
+        self._secret = keys[self.active_kid]
+        self.ttl = ttl
+        self._header = _b64encode(json.dumps(
+            {'alg': ALGORITHM, 'typ': TOKEN_TYPE, 'kid': self.active_kid}, separators=(',', ':')
+        ).encode('utf-8'))
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            parse_keys(os.environ.get('AUTH_TOKEN_KEYS')),
+            os.environ.get('AUTH_TOKEN_ACTIVE_KEY_ID') or None,
+            int(os.environ.get('AUTH_TOKEN_TTL_SECONDS', str(8 * 3600))),
+        )
+
+    def sign(self, employee_id, company_id, role_id):
+        """Returns (token, expires_at epoch seconds)."""
+        issued_at = int(time.time())
+        claims = {
+            'sub': str(employee_id),
+            'employee_id': employee_id,
+            'company_id': company_id,
+            'role_id': role_id,
+            'iat': issued_at,
+            'exp': issued_at + self.ttl,
+        }
+        signing_input = self._header + b'.' + _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        signature = hmac.new(self._secret, signing_input, hashlib.sha256).digest()
+        return (signing_input + b'.' + _b64encode(signature)).decode('ascii'), claims['exp']
+
+
+class TokenVerifier:
+    """
+    Checks signature and expiry without any I/O. Unless `required` is False
+    (rollout mode), protected endpoints reject requests without a token.
+    """
+
+    def __init__(self, keys, required=True, leeway=30):
+        self._keys = dict(keys)
+        self._secrets_by_header = {} # Encoded header -> secret, skips decoding the header per request
+        self.required = required
+        self.leeway = leeway
+        self.verified = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            parse_keys(os.environ.get('AUTH_TOKEN_KEYS')),
+            required=os.environ.get('AUTH_TOKENS_REQUIRED', '1') == '1',
+        )
+
+    def verify(self, token):
+        """Returns the token's claims dict, or raises InvalidToken."""
+        try:
+            header_segment, claims_segment, signature_segment = token.encode('ascii').split(b'.')
+            signature = _b64decode(signature_segment)
+        except (ValueError, UnicodeError):
+            raise InvalidToken('Malformed token')
+        secret = self._secrets_by_header.get(header_segment)
+        if secret is None:
+            secret = self._secret_for_header(header_segment)
+        expected = hmac.new(secret, header_segment + b'.' + claims_segment, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, signature):
+            raise InvalidToken('Bad token signature')
+        try:
+            claims = json.loads(_b64decode(claims_segment))
+        except ValueError:
+            raise InvalidToken('Malformed token')
+        if not isinstance(claims, dict) or claims.get('exp', 0) + self.leeway < time.time():
+            raise InvalidToken('Token expired')
+        return claims
+
+    def _secret_for_header(self, header_segment):
+        try:
+            header = json.loads(_b64decode(header_segment))
+        except ValueError:
+            raise InvalidToken('Malformed token')
+        if not isinstance(header, dict) or header.get('alg') != ALGORITHM:
+            raise InvalidToken('Unsupported token algorithm')
+        secret = self._keys.get(header.get('kid'))
+        if secret is None:
+            raise InvalidToken('Token signed with an unknown key')
+        if len(self._secrets_by_header) < 64: # One header per signing key, so this stays tiny
+            self._secrets_by_header[header_segment] = secret
+        return secret
+
+    def stats(self):
+        return {
+            'key_ids': list(self._keys),
+            'required': self.required,
+            'verified': self.verified,
+            'rejected': self.rejected,
+        }
+
+
+def _unauthorized(message):
+    response = jsonify({'status': 'error', 'message': message})
+    response.headers['WWW-Authenticate'] = 'Bearer'
+    return response, 401
+
+
+def require_token(verifier):
+    """
+    View decorator: verifies the `Authorization: Bearer <token>` header and puts
+    the claims in `g.token_claims` (None when no token is sent and the verifier
+    is not in required mode). A token that is sent must always be valid.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            header = request.headers.get('Authorization')
+            if not header:
+                if verifier.required:
+                    verifier.rejected += 1
+                    return _unauthorized('Authentication required')
+                g.token_claims = None
+                return view(*args, **kwargs)
+            scheme, _, token = header.partition(' ')
+            if scheme.lower() != 'bearer' or not token:
+                verifier.rejected += 1
+                return _unauthorized('Expected a Bearer token')
+            try:
+                g.token_claims = verifier.verify(token.strip())
+            except InvalidToken as e:
+                verifier.rejected += 1
+                return _unauthorized(str(e))
+            verifier.verified += 1
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def claims_allow(**expected):
+    """
+    True if the current request's token claims match every expected value
+    (e.g. company_id=request.args.get('company_id')). Values are compared as
+    ints; requests let through without a token (rollout mode) are allowed.
+    """
+    claims = g.get('token_claims')
+    if claims is None:
+        return True
+    try:
+        return all(int(value) == claims.get(name) for name, value in expected.items())
+    except (TypeError, ValueError):
+        return False
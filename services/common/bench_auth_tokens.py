@@ -0,0 +1,35 @@
+# services/common/bench_auth_tokens.py
+# Micro-benchmark: local session token verification (what every protected request pays).
+#
+# Run from the services/ directory:
+#     python -m common.bench_auth_tokens [iterations]
+import sys
+import time
+
+from common.auth_tokens import TokenSigner, TokenVerifier
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    keys = {'2024-01': b'old-secret', '2024-07': b'current-secret'}
+    signer = TokenSigner(keys, active_kid='2024-07')
+    verifier = TokenVerifier(keys)
+    token, _ = signer.sign(employee_id=42, company_id=7, role_id=2)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        signer.sign(42, 7, 2)
+    sign_us = (time.perf_counter() - started) / iterations * 1e6
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        verifier.verify(token)
+    verify_us = (time.perf_counter() - started) / iterations * 1e6
+
+    print(f"token: {len(token)} bytes")
+    print(f"sign:   {sign_us:6.2f} us/token")
+    print(f"verify: {verify_us:6.2f} us/token ({iterations} iterations)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# services/common/bench_serialization.py
+# Micro-benchmark: legacy per-row processing + jsonify vs. common.serialization.dumps.
+#
+# Run from the services/ directory:
+#     python -m common.bench_serialization [rows] [repeats]
+import datetime
+import decimal
+import json
+import random
+import sys
+import time
+
+from common import serialization
+
+
+def make_catalog(row_count):
+    """Builds DictCursor-style flight rows (MySQLdb returns TIME columns as timedelta)."""
+    rng = random.Random(42)
+    airlines = ['Air India', 'IndiGo', 'Vistara', 'Emirates', 'Lufthansa', 'Qatar Airways']
+    cities = ['Bengaluru', 'Delhi', 'Mumbai', 'Dubai', 'Frankfurt', 'Doha', 'London', 'Singapore']
+    rows = []
+    for flight_id in range(1, row_count + 1):
+        departure_minutes = rng.randrange(0, 24 * 60)
+        rows.append({
+            'id': flight_id,
+            'company_id': rng.randrange(1, 20),
+            'airline': rng.choice(airlines),
+            'origin': rng.choice(cities),
+            'destination': rng.choice(cities),
+            'departure_time': datetime.timedelta(minutes=departure_minutes),
+            'arrival_time': datetime.timedelta(minutes=(departure_minutes + rng.randrange(60, 600)) % (24 * 60)),
+            'price': decimal.Decimal(rng.randrange(2000, 90000)) / 100,
+        })
+    return tuple(rows)
+
+
+def legacy_encode(flights):
+    """The pre-serializer path from flight_service.get_flights, followed by Flask's jsonify encoding."""
+    processed_flights = []
+    for flight_row in flights:
+        processed_flight = dict(flight_row)
+        if isinstance(processed_flight.get('price'), decimal.Decimal):
+            processed_flight['price'] = float(processed_flight['price'])
+        if isinstance(processed_flight.get('departure_time'), datetime.time):
+            processed_flight['departure_time'] = processed_flight['departure_time'].strftime('%H:%M:%S')
+        elif processed_flight.get('departure_time') is not None:
+            processed_flight['departure_time'] = str(processed_flight['departure_time'])
+        if isinstance(processed_flight.get('arrival_time'), datetime.time):
+            processed_flight['arrival_time'] = processed_flight['arrival_time'].strftime('%H:%M:%S')
+        elif processed_flight.get('arrival_time') is not None:
+            processed_flight['arrival_time'] = str(processed_flight['arrival_time'])
+        processed_flights.append(processed_flight)
+    # Flask's default JSON provider: sorted keys, compact separators, ensure_ascii
+    return json.dumps(processed_flights, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def stdlib_encode(flights, _encoder=json.JSONEncoder(default=serialization._default, separators=(',', ':'), ensure_ascii=False)):
+    return _encoder.encode(flights).encode('utf-8')
+
+
+def bench(label, encode, flights, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        body = encode(flights)
+        best = min(best, time.perf_counter() - started)
+    rows_per_sec = len(flights) / best
+    print(f"{label:<34} {best * 1000:9.1f} ms  {rows_per_sec:12,.0f} rows/sec  {len(body) / 1024:8.0f} KiB")
+    return rows_per_sec
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    flights = make_catalog(row_count)
+    print(f"Encoding {row_count:,} flight rows, best of {repeats} runs")
+    before = bench('before: dict copy + jsonify', legacy_encode, flights, repeats)
+    bench('after: shared serializer (stdlib)', stdlib_encode, flights, repeats)
+    if serialization.orjson is not None:
+        after = bench('after: shared serializer (orjson)', serialization.dumps, flights, repeats)
+        print(f"Speed-up with orjson: {after / before:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
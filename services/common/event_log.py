@@ -0,0 +1,93 @@
+# services/common/event_log.py
+# File-backed, append-only event topic: the local stand-in for a message broker.
+#
+# A topic is a directory of numbered segment files holding one JSON event per
+# line. Producers append (with fsync) under an exclusive file lock; consumers
+# keep their own position (segment number, byte offset) and read forward.
+# Delivery is at-least-once: a producer may re-publish after a crash, so
+# consumers de-duplicate on the event 'id'.
+import fcntl
+import json
+import os
+import threading
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+
+
+class EventLog:
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:08d}{SEGMENT_SUFFIX}")
+
+    def segments(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def publish(self, events):
+        """Appends events (JSON-serializable dicts) durably; returns once they are on disk."""
+        if not events:
+            return
+        data = ''.join(json.dumps(event, separators=(',', ':'), default=str) + '\n' for event in events).encode('utf-8')
+        with self._lock, open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX) # Other processes publishing to the same topic
+            segments = self.segments()
+            segment = segments[-1] if segments else 1
+            path = self._path(segment)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                segment += 1
+                path = self._path(segment)
+            with open(path, 'ab') as segment_file:
+                segment_file.write(data)
+                segment_file.flush()
+                os.fsync(segment_file.fileno())
+
+    def start_position(self):
+        segments = self.segments()
+        return [segments[0] if segments else 1, 0]
+
+    def read(self, position, max_events=500):
+        """
+        Returns (events, next_position) starting at `position` ([segment, byte offset]).
+        A trailing line without a newline (a write in progress) is left for the next read.
+        """
+        segment, offset = position
+        segments = self.segments()
+        if segments and segment < segments[0]:
+            segment, offset = segments[0], 0 # Our segment was pruned; continue with the oldest one left
+        events = []
+        while len(events) < max_events:
+            path = self._path(segment)
+            if os.path.exists(path):
+                with open(path, 'rb') as segment_file:
+                    segment_file.seek(offset)
+                    for line in segment_file:
+                        if not line.endswith(b'\n'):
+                            break
+                        offset += len(line)
+                        events.append(json.loads(line))
+                        if len(events) >= max_events:
+                            return events, [segment, offset]
+            later = [number for number in segments if number > segment]
+            if not later:
+                break
+            segment, offset = later[0], 0
+        return events, [segment, offset]
+
+    def prune(self, keep_segments):
+        """Deletes all but the newest `keep_segments` segments; returns how many were removed."""
+        segments = self.segments()
+        removed = 0
+        for segment in segments[:-keep_segments] if keep_segments > 0 else []:
+            os.remove(self._path(segment))
+            removed += 1
+        return removed
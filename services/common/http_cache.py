@@ -0,0 +1,36 @@
+# services/common/http_cache.py
+# Helpers for ETag / If-None-Match conditional GETs.
+import hashlib
+
+from flask import Response
+
+# Browsers may keep the body but must revalidate it with If-None-Match on every use
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """Builds a strong ETag from a content version (counters, dates, query args...)."""
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def body_etag(body):
+    """Builds an ETag from already-encoded response bytes (when no cheaper version exists)."""
+    return f'"{hashlib.sha1(body).hexdigest()[:32]}"'
+
+
+def is_not_modified(request, etag):
+    """True when the request's If-None-Match lists `etag` (weak comparison, as for GET)."""
+    return etag is not None and request.if_none_match.contains_weak(etag.strip('"'))
+
+
+def not_modified_response(etag):
+    return Response(status=304, headers={'ETag': etag, 'Cache-Control': REVALIDATE_CACHE_CONTROL})
+
+
+def conditional_headers(etag, headers=None):
+    """Adds ETag + Cache-Control to a response's extra headers."""
+    merged = dict(headers or {})
+    merged['ETag'] = etag
+    merged['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+    return merged
@@ -0,0 +1,213 @@
+# services/common/http_client.py
+# Pooled HTTP client for service-to-service calls: keep-alive connections,
+# bounded retries with jittered backoff, a circuit breaker and latency metrics.
+import collections
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses that mean "the dependency is unhealthy" (they count against the breaker
+# and are retried). Anything else, including 404, is a valid answer.
+RETRYABLE_STATUSES = frozenset([502, 503, 504])
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without touching the network while the dependency's breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+
+    closed    -> calls go through; `failure_threshold` consecutive failures open it.
+    open      -> calls fail fast with CircuitOpenError for `reset_timeout` seconds.
+    half_open -> one trial call is let through; success closes, failure re-opens.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self._trial_in_flight:
+                return False # Only one probe at a time while half-open
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._trial_in_flight = False
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 2)
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                'times_opened': self.times_opened,
+                'retry_in_seconds': retry_in,
+            }
+
+
+class DependencyMetrics:
+    """Call counters plus a window of recent latencies for percentile reporting."""
+
+    def __init__(self, window=1024):
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.statuses = collections.Counter()
+
+    def record(self, latency, outcome):
+        with self._lock:
+            self.calls += 1
+            self._latencies.append(latency)
+            self.statuses[str(outcome)] += 1
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            statuses = dict(self.statuses)
+            counters = {
+                'calls': self.calls,
+                'failures': self.failures,
+                'retries': self.retries,
+                'short_circuited': self.short_circuited,
+            }
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 1)
+
+        counters.update({
+            'statuses': statuses,
+            'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99),
+                           'samples': len(latencies)},
+        })
+        return counters
+
+
+class ServiceClient:
+    """
+    One instance per downstream service, shared by all request threads.
+
+    Requests reuse pooled keep-alive connections. Connection errors and
+    502/503/504 answers are retried up to `max_retries` times with full-jitter
+    exponential backoff; read timeouts are not retried, since a slow dependency
+    only gets slower under repeated calls. Every failed attempt counts against the
+    circuit breaker, and while it is open calls raise CircuitOpenError at once
+    instead of waiting for a timeout.
+    """
+
+    def __init__(self, name, base_url, connect_timeout=1.0, read_timeout=3.0, max_retries=2,
+                 backoff_base=0.05, backoff_max=0.5, failure_threshold=5, reset_timeout=10.0, pool_size=10):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = DependencyMetrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0) # Retries are ours
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, retry=None, **kwargs):
+        """
+        Sends one logical request and returns the final requests.Response.
+
+        `retry` defaults to True for GET only; pass retry=True for POSTs that
+        are safe to repeat. Raises CircuitOpenError, or the last network error.
+        """
+        retry = (method.upper() == 'GET') if retry is None else retry
+        kwargs.setdefault('timeout', self.timeout)
+        url = f"{self.base_url}{path}"
+        attempts = 1 + (self.max_retries if retry else 0)
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self.metrics.increment('short_circuited')
+                raise CircuitOpenError(f"{self.name} circuit is open; failing fast")
+            if attempt:
+                self.metrics.increment('retries')
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as error:
+                self.metrics.record(time.perf_counter() - started, type(error).__name__)
+                self.metrics.increment('failures')
+                self.breaker.record_failure()
+                if attempt + 1 < attempts and not isinstance(error, requests.exceptions.ReadTimeout):
+                    continue
+                raise
+            self.metrics.record(time.perf_counter() - started, response.status_code)
+
+            if response.status_code in RETRYABLE_STATUSES:
+                self.metrics.increment('failures')
+                self.breaker.record_failure()
+                if attempt + 1 < attempts:
+                    response.close() # Hand the connection back to the pool before retrying
+                    continue
+            else:
+                self.breaker.record_success()
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def stats(self):
+        stats = self.metrics.snapshot()
+        stats['base_url'] = self.base_url
+        stats['circuit'] = self.breaker.snapshot()
+        return stats
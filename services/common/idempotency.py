@@ -0,0 +1,145 @@
+# services/common/idempotency.py
+# Idempotency-Key support for POST endpoints: first result is stored and replayed,
+# concurrent duplicates wait for the request already in flight.
+import functools
+import hashlib
+import threading
+
+from flask import request, jsonify, current_app, Response, g
+
+from common.ttl_cache import TTLCache
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+# Describe one transfer rather than the stored response; the server sets them again on replay
+UNSTORED_HEADERS = frozenset(['content-length', 'transfer-encoding', 'connection', 'date', 'server'])
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used with a different request body."""
+
+
+class IdempotencyInProgress(Exception):
+    """The original request is still running after the wait timeout."""
+
+
+class _InFlight:
+    __slots__ = ('fingerprint', 'done')
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+
+
+class IdempotencyStore:
+    """
+    Bounded, TTL'd store of (fingerprint, stored response) per key.
+
+    Only one request per key runs the handler; duplicates arriving meanwhile
+    block for up to `wait_timeout` seconds and then get the stored result. 5xx
+    results are not stored, so the request is run again on the next retry
+    (the failure may have been transient).
+    """
+
+    def __init__(self, max_entries, ttl, wait_timeout):
+        self._results = TTLCache(max_entries, ttl)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.wait_timeout = wait_timeout
+        self.replays = 0
+        self.coalesced = 0
+        self.conflicts = 0
+
+    def run(self, key, fingerprint, handler):
+        """Returns (result, replayed). `handler` returns (status, body bytes, [(header, value)])."""
+        while True:
+            with self._lock:
+                stored = self._results.get(key)
+                if stored is not None:
+                    if stored[0] != fingerprint:
+                        self.conflicts += 1
+                        raise IdempotencyConflict(key)
+                    self.replays += 1
+                    return stored[1], True
+                flight = self._in_flight.get(key)
+                owner = flight is None
+                if owner:
+                    flight = self._in_flight[key] = _InFlight(fingerprint)
+                elif flight.fingerprint != fingerprint:
+                    self.conflicts += 1
+                    raise IdempotencyConflict(key)
+                else:
+                    self.coalesced += 1
+            if not owner:
+                if not flight.done.wait(self.wait_timeout):
+                    raise IdempotencyInProgress(key)
+                continue # Stored now, or the owner failed and this request takes over
+
+            try:
+                result = handler()
+            except BaseException:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                flight.done.set()
+                raise
+            with self._lock:
+                if result[0] < 500:
+                    self._results.set(key, (fingerprint, result))
+                self._in_flight.pop(key, None)
+            flight.done.set()
+            return result, False
+
+    def stats(self):
+        stats = self._results.stats()
+        with self._lock:
+            stats.update({
+                'in_flight': len(self._in_flight),
+                'replays': self.replays,
+                'coalesced': self.coalesced,
+                'conflicts': self.conflicts,
+            })
+        return stats
+
+
+def idempotent(store):
+    """
+    View decorator. Requests without an Idempotency-Key header run normally.
+    Keys are scoped to the request path and to the signed-in account (the
+    session token's employee_id, set by require_token, which must run first),
+    so one account can never replay another's response. The stored response
+    (status, body and headers, including Content-Type) is replayed as-is with
+    an `Idempotent-Replayed: true` header.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({'status': 'error', 'message': f'{IDEMPOTENCY_HEADER} is too long'}), 400
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+            def handler():
+                response = current_app.make_response(view(*args, **kwargs))
+                headers = [(name, value) for name, value in response.headers.items()
+                           if name.lower() not in UNSTORED_HEADERS]
+                return response.status_code, response.get_data(), headers
+
+            try:
+                claims = g.get('token_claims')
+                subject = claims.get('employee_id') if claims else None # None only without a token (rollout mode)
+                (status, body, headers), replayed = store.run((request.path, subject, key), fingerprint, handler)
+            except IdempotencyConflict:
+                return jsonify({'status': 'error', 'message': f'{IDEMPOTENCY_HEADER} was already used with a different request'}), 422
+            except IdempotencyInProgress:
+                response = jsonify({'status': 'error', 'message': 'A request with this key is still being processed'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            response = Response(body, status=status, headers=headers)
+            if replayed:
+                response.headers[REPLAYED_HEADER] = 'true'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,67 @@
+# services/common/serialization.py
+# Shared JSON encoding for MySQL DictCursor result sets.
+#
+# Rows are encoded as-is: Decimal, TIME (timedelta / datetime.time), DATE and
+# DATETIME values are converted by the encoder's `default` hook, so no per-row
+# dict copies or isinstance chains are needed in the endpoints.
+import datetime
+import decimal
+import functools
+import json
+
+from flask import Response
+
+try:
+    import orjson # Optional: several times faster than the stdlib encoder
+except ImportError:
+    orjson = None
+
+JSON_MIMETYPE = 'application/json'
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_timedelta(value):
+    """MySQL TIME columns arrive as timedelta; render them like datetime.time ('HH:MM:SS')."""
+    if value.days == 0:
+        hours, remainder = divmod(value.seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return str(value)
+
+
+# Exact-type dispatch: one dict lookup per value instead of an isinstance chain
+_CONVERTERS = {
+    decimal.Decimal: float,
+    datetime.timedelta: _format_timedelta,
+    datetime.time: lambda value: value.strftime('%H:%M:%S'),
+    datetime.date: datetime.date.isoformat,
+    datetime.datetime: datetime.datetime.isoformat,
+    bytes: lambda value: value.decode('utf-8'),
+}
+
+
+def _default(value):
+    converter = _CONVERTERS.get(type(value))
+    if converter is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return converter(value)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_OMIT_MICROSECONDS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(payload):
+        """Encodes a payload (rows, lists of rows, dicts of rows) straight to JSON bytes."""
+        return orjson.dumps(payload, default=_default, option=_ORJSON_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+
+    def dumps(payload):
+        """Encodes a payload (rows, lists of rows, dicts of rows) straight to JSON bytes."""
+        return _encoder.encode(payload).encode('utf-8')
+
+
+def json_response(payload, status=200, headers=None):
+    """Drop-in for `jsonify(payload), status` that also accepts pre-encoded JSON bytes."""
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    return Response(body, status=status, headers=headers, mimetype=JSON_MIMETYPE)
@@ -0,0 +1,54 @@
+# services/common/version_tracker.py
+# Database version counters that invalidate in-process caches (common.ttl_cache.TTLCache).
+import threading
+import time
+
+
+class VersionTracker:
+    """
+    Caches version counters kept in the database (e.g. one per company).
+
+    `loader` returns a dict of {scope: version}; it is called at most once every
+    `refresh_interval` seconds, so a write becomes visible to every worker
+    within that interval while normal reads cost no extra query. If the loader
+    fails (e.g. the versions table is missing) the tracker reports None and the
+    cache falls back to TTL-only expiry.
+    """
+
+    def __init__(self, loader, refresh_interval):
+        self._loader = loader
+        self.refresh_interval = refresh_interval
+        self._versions = None
+        self._loaded_at = None
+        self._local_bumps = {} # Bumps made in this process; only ever grow so versions never repeat
+        self._lock = threading.Lock()
+
+    def _refresh_if_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+                return
+            self._loaded_at = now # Claim the refresh so concurrent readers don't all query
+        try:
+            versions = self._loader()
+        except Exception:
+            versions = None
+        with self._lock:
+            self._versions = versions
+
+    def get(self, scope):
+        self._refresh_if_due()
+        with self._lock:
+            if self._versions is None:
+                return self._local_bumps.get(scope)
+            return (self._versions.get(scope, 0), self._local_bumps.get(scope, 0))
+
+    def has_versions(self):
+        """False while the version table could not be read (TTL-only mode)."""
+        with self._lock:
+            return self._versions is not None
+
+    def bump(self, scope):
+        """Invalidates `scope` in this process immediately (e.g. after a local write)."""
+        with self._lock:
+            self._local_bumps[scope] = self._local_bumps.get(scope, 0) + 1
@@ -1,14 +1,27 @@
 # services/flight_service/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_mysqldb import MySQL
+import MySQLdb.cursors
 from flask_cors import CORS
 import os
 import logging
 import decimal # Import decimal for handling price correctly
 import datetime # <<<--- IMPORT datetime
+import json
+import base64
+import binascii
+import time
+from route_search import FlightGraphIndex
+from fare_notifier import FareChangeNotifier
+from common.serialization import dumps, json_response
+from common.ttl_cache import TTLCache
+from common.version_tracker import VersionTracker
+from common.http_client import ServiceClient
+from common.http_cache import make_etag, body_etag, is_not_modified, not_modified_response, conditional_headers
+from common.auth_tokens import TokenVerifier, require_token, claims_allow
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'ETag'])
 
 # --- Logging ---
 logging.basicConfig(level=logging.INFO)
@@ -28,8 +41,310 @@ except Exception as e:
     app.logger.error(f"Flight Service: Failed to initialize MySQL: {e}")
     exit(1)
 
+# --- Session Tokens ---
+# Issued by auth-service on login and verified locally; see common/auth_tokens.py for key rotation
+token_verifier = TokenVerifier.from_env()
+
+# --- Flight Search Config ---
+# Columns the client may sort on, mapped to the SQL column used for keyset pagination.
+FLIGHT_SORT_COLUMNS = {
+    'id': 'id',
+    'price': 'price',
+    'departure_time': 'departure_time',
+    'arrival_time': 'arrival_time',
+    'airline': 'airline',
+}
+MAX_FLIGHTS_PAGE_SIZE = int(os.environ.get('MAX_FLIGHTS_PAGE_SIZE', '500'))
+MAX_FLIGHT_DETAILS_BATCH_SIZE = int(os.environ.get('MAX_FLIGHT_DETAILS_BATCH_SIZE', '500'))
+# Streaming mode (?stream=ndjson or ?stream=array): rows are read from a server-side cursor in batches
+FLIGHT_STREAM_BATCH_SIZE = int(os.environ.get('FLIGHT_STREAM_BATCH_SIZE', '1000'))
+FLIGHT_STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'array': 'application/json',
+}
+
+# --- Flight Cache Config ---
+# Per-process cache of processed flight lists (keyed by company + query) and flight details (keyed by id).
+# Entries are checked against the version counters in flight_cache_versions, which triggers on `flights`
+# bump on every write (see db/migrations/002_flight_cache_versions.sql).
+FLIGHT_CACHE_MAX_ENTRIES = int(os.environ.get('FLIGHT_CACHE_MAX_ENTRIES', '2048'))
+FLIGHT_CACHE_TTL_SECONDS = float(os.environ.get('FLIGHT_CACHE_TTL_SECONDS', '300'))
+FLIGHT_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get('FLIGHT_CACHE_VERSION_CHECK_SECONDS', '2'))
+TABLE_VERSION_SCOPE = 0 # Version row bumped by every write to `flights`, whatever the company
+
+
+def load_flight_cache_versions():
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute("SELECT scope_id, version FROM flight_cache_versions")
+        return {row['scope_id']: row['version'] for row in cur.fetchall()}
+    except Exception as e:
+        app.logger.warning(f"Flight cache: could not load version counters, falling back to TTL only: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+
+
+flights_cache = TTLCache(FLIGHT_CACHE_MAX_ENTRIES, FLIGHT_CACHE_TTL_SECONDS)
+flight_details_cache = TTLCache(FLIGHT_CACHE_MAX_ENTRIES, FLIGHT_CACHE_TTL_SECONDS)
+flight_cache_versions = VersionTracker(load_flight_cache_versions, FLIGHT_CACHE_VERSION_CHECK_SECONDS)
+
+# --- Route Search Config ---
+# Connection search runs on an in-memory graph of each company's flights, rebuilt for a company
+# only when its version counter moves (or the TTL passes), never per search or per hop.
+FLIGHT_ROUTE_INDEX_TTL_SECONDS = float(os.environ.get('FLIGHT_ROUTE_INDEX_TTL_SECONDS', '300'))
+MAX_ROUTE_RESULTS = 20
+MAX_ROUTE_HOPS = 4
+
+
+def load_company_flight_rows(company_id):
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute(
+            "SELECT id, airline, origin, destination, departure_time, arrival_time, price FROM flights WHERE company_id = %s",
+            (company_id,)
+        )
+        return cur.fetchall()
+    finally:
+        if cur:
+            cur.close()
+
+
+flight_graph_index = FlightGraphIndex(load_company_flight_rows, FLIGHT_ROUTE_INDEX_TTL_SECONDS)
+
+
+# --- Fare Change Push Config ---
+# Booking-service caches prices locally; fare changes recorded by the triggers in
+# db/migrations/006_flight_fare_changes.sql are pushed to it by a background poller.
+BOOKING_SERVICE_URL = os.environ.get('BOOKING_SERVICE_URL', 'http://booking-service:5003')
+FARE_PUSH_INTERVAL_SECONDS = float(os.environ.get('FARE_PUSH_INTERVAL_SECONDS', '2'))
+FARE_CHANGE_RETENTION_HOURS = int(os.environ.get('FARE_CHANGE_RETENTION_HOURS', '24'))
+PRICE_CACHE_INVALIDATE_PATH = '/api/internal/bookings/price-cache/invalidate'
+
+
+def load_latest_fare_change_id():
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute("SELECT COALESCE(MAX(id), 0) AS latest_id FROM flight_fare_changes")
+        return cur.fetchone()['latest_id']
+    finally:
+        if cur:
+            cur.close()
+
+
+def load_fare_changes(after_id, limit):
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute(
+            "SELECT id, flight_id FROM flight_fare_changes WHERE id > %s ORDER BY id LIMIT %s",
+            (after_id, limit)
+        )
+        return cur.fetchall()
+    finally:
+        if cur:
+            cur.close()
+
+
+def prune_fare_changes():
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute(
+            "DELETE FROM flight_fare_changes WHERE changed_at < DATE_SUB(NOW(6), INTERVAL %s HOUR) LIMIT 10000",
+            (FARE_CHANGE_RETENTION_HOURS,)
+        )
+        mysql.connection.commit()
+        return cur.rowcount
+    finally:
+        if cur:
+            cur.close()
+
+
+booking_service = ServiceClient('booking-service', BOOKING_SERVICE_URL, max_retries=1)
+fare_change_notifier = FareChangeNotifier(
+    app, load_latest_fare_change_id, load_fare_changes, prune_fare_changes,
+    booking_service, PRICE_CACHE_INVALIDATE_PATH, FARE_PUSH_INTERVAL_SECONDS,
+)
+if FARE_PUSH_INTERVAL_SECONDS > 0:
+    fare_change_notifier.start()
+
+
+class FlightQueryError(ValueError):
+    """Raised when /api/flights query parameters are invalid (mapped to a 400)."""
+
+
+# === Helper: Keyset Cursor Encoding ===
+def encode_flight_cursor(sort_value, flight_id):
+    """Encodes the last row's (sort value, id) pair into an opaque, URL-safe cursor."""
+    if isinstance(sort_value, datetime.time):
+        sort_value = sort_value.strftime('%H:%M:%S')
+    elif isinstance(sort_value, (decimal.Decimal, datetime.timedelta)):
+        sort_value = str(sort_value)
+    raw = json.dumps([sort_value, flight_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_flight_cursor(cursor):
+    """Decodes a cursor produced by encode_flight_cursor into (sort_value, id)."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, flight_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return sort_value, int(flight_id)
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        raise FlightQueryError('Invalid cursor')
+
+
+# === Helper: Parse Time Filter ===
+def parse_time_param(name, value):
+    """Validates an HH:MM or HH:MM:SS query parameter and returns it as 'HH:MM:SS'."""
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            return datetime.datetime.strptime(value, fmt).strftime('%H:%M:%S')
+        except ValueError:
+            continue
+    raise FlightQueryError(f'{name} must be in HH:MM or HH:MM:SS format')
+
+
+def parse_price_param(name, value):
+    try:
+        return decimal.Decimal(value)
+    except decimal.InvalidOperation:
+        raise FlightQueryError(f'{name} must be a number')
+
+
+# === Helper: Build Flight Search Query ===
+def build_flight_search_query(company_id, args):
+    """
+    Translates /api/flights query parameters into a parameterized SQL query.
+
+    Supported filters: origin, destination, airline, min_price, max_price,
+    depart_after, depart_before. Sorting via sort=<column> or sort=-<column>.
+    Pagination is keyset-based: pass limit, then the X-Next-Cursor value of the
+    previous page as cursor. Returns (sql, params, sort_column, limit).
+    """
+    conditions = ['company_id = %s']
+    params = [company_id]
+
+    for field in ('origin', 'destination', 'airline'):
+        value = args.get(field)
+        if value:
+            conditions.append(f'{field} = %s')
+            params.append(value)
+
+    if args.get('min_price'):
+        conditions.append('price >= %s')
+        params.append(parse_price_param('min_price', args['min_price']))
+    if args.get('max_price'):
+        conditions.append('price <= %s')
+        params.append(parse_price_param('max_price', args['max_price']))
+    if args.get('depart_after'):
+        conditions.append('departure_time >= %s')
+        params.append(parse_time_param('depart_after', args['depart_after']))
+    if args.get('depart_before'):
+        conditions.append('departure_time <= %s')
+        params.append(parse_time_param('depart_before', args['depart_before']))
+
+    sort = args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in FLIGHT_SORT_COLUMNS:
+        raise FlightQueryError(f"sort must be one of: {', '.join(FLIGHT_SORT_COLUMNS)}")
+    sort_column = FLIGHT_SORT_COLUMNS[sort_key]
+    direction = 'DESC' if descending else 'ASC'
+    comparator = '<' if descending else '>'
+
+    limit = None
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise FlightQueryError('limit must be an integer')
+        if limit < 1 or limit > MAX_FLIGHTS_PAGE_SIZE:
+            raise FlightQueryError(f'limit must be between 1 and {MAX_FLIGHTS_PAGE_SIZE}')
+
+    cursor = args.get('cursor')
+    if cursor:
+        if limit is None:
+            raise FlightQueryError('cursor requires limit')
+        last_value, last_id = decode_flight_cursor(cursor)
+        if sort_column == 'id':
+            conditions.append(f'id {comparator} %s')
+            params.append(last_id)
+        else:
+            # Expanded row comparison so MySQL can range-scan the (company_id, col, id) index
+            conditions.append(f'({sort_column} {comparator} %s OR ({sort_column} = %s AND id {comparator} %s))')
+            params.extend([last_value, last_value, last_id])
+
+    order_by = 'id' if sort_column == 'id' else f'{sort_column} {direction}, id'
+    sql = f"SELECT * FROM flights WHERE {' AND '.join(conditions)} ORDER BY {order_by} {direction}"
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit + 1) # One extra row tells us whether another page exists
+
+    return sql, tuple(params), sort_column, limit
+
+
+# === Helper: Flights Page Response ===
+def flights_page_response(body, next_cursor, etag):
+    """Sends an encoded flights page, or a 304 if the client already holds this version."""
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else None
+    return json_response(body, 200, conditional_headers(etag, headers))
+
+
+# === Helper: Stream Flights ===
+def stream_flights(company_id, sql, params, limit, stream_format):
+    """
+    Streams query results from a server-side (unbuffered) cursor, FLIGHT_STREAM_BATCH_SIZE rows
+    at a time, so worker memory stays flat and the first rows go out before the query finishes.
+    Paging hints (X-Next-Cursor) and caching do not apply in this mode.
+    """
+    def generate():
+        cur = None
+        streamed = 0
+        try:
+            cur = mysql.connection.cursor(MySQLdb.cursors.SSDictCursor)
+            cur.execute(sql, params)
+            if stream_format == 'array':
+                yield b'['
+            while True:
+                rows = cur.fetchmany(FLIGHT_STREAM_BATCH_SIZE)
+                if limit is not None:
+                    rows = rows[:limit - streamed] # The query fetches one look-ahead row past the limit
+                if not rows:
+                    break
+                if stream_format == 'ndjson':
+                    yield b''.join(dumps(row) + b'\n' for row in rows)
+                else:
+                    chunk = b','.join(dumps(row) for row in rows)
+                    yield (b',' + chunk) if streamed else chunk
+                streamed += len(rows)
+            if stream_format == 'array':
+                yield b']'
+            app.logger.info(f"Streamed {streamed} flights ({stream_format}) for company_id {company_id}")
+        except Exception as e:
+            # Headers are already sent; log and end the stream (clients see a truncated body)
+            app.logger.error(f"Flight Service error while streaming flights: {str(e)}", exc_info=True)
+        finally:
+            if cur:
+                cur.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=FLIGHT_STREAM_FORMATS[stream_format],
+        headers={'X-Accel-Buffering': 'no'} # Tell the nginx gateway not to buffer the stream
+    )
+
+
 # === Get Flights Endpoint (for Frontend) ===
 @app.route('/api/flights', methods=['GET'])
+@require_token(token_verifier)
 def get_flights():
     company_id = request.args.get('company_id')
     app.logger.info(f"Flight Service received request for {request.endpoint} with company_id: {company_id}")
@@ -37,42 +352,62 @@ def get_flights():
     if not company_id:
         app.logger.warning(f"{request.endpoint}: company_id is required")
         return jsonify({'error': 'company_id is required'}), 400
+    if not claims_allow(company_id=company_id):
+        app.logger.warning(f"{request.endpoint}: company_id {company_id} does not match the session token")
+        return jsonify({'error': 'company_id does not match the signed-in account'}), 403
 
-    cur = None
     try:
-        cur = mysql.connection.cursor()
-        # Query focuses on the 'flights' table
-        cur.execute("SELECT * FROM flights WHERE company_id = %s", (company_id,))
-        flights = cur.fetchall() # This fetches rows as dictionaries
+        sql, params, sort_column, limit = build_flight_search_query(company_id, request.args)
+    except FlightQueryError as e:
+        app.logger.warning(f"{request.endpoint}: invalid query parameters - {e}")
+        return jsonify({'error': str(e)}), 400
 
-        # --- Process the fetched data for JSON compatibility ---
-        processed_flights = []
-        for flight_row in flights:
-            processed_flight = dict(flight_row) # Create a mutable copy
+    stream_format = request.args.get('stream')
+    if stream_format is None and request.accept_mimetypes.best == FLIGHT_STREAM_FORMATS['ndjson']:
+        stream_format = 'ndjson'
+    if stream_format is not None:
+        if stream_format not in FLIGHT_STREAM_FORMATS:
+            return jsonify({'error': f"stream must be one of: {', '.join(FLIGHT_STREAM_FORMATS)}"}), 400
+        return stream_flights(company_id, sql, params, limit, stream_format)
 
-            # Convert Decimal to float/string
-            if isinstance(processed_flight.get('price'), decimal.Decimal):
-                processed_flight['price'] = float(processed_flight['price'])
+    cache_key = (str(company_id), tuple(sorted(request.args.items())))
+    cache_version = flight_cache_versions.get(int(company_id)) if company_id.isdigit() else None
 
-            # *** NEW: Convert datetime.time to string "HH:MM:SS" ***
-            if isinstance(processed_flight.get('departure_time'), datetime.time):
-                processed_flight['departure_time'] = processed_flight['departure_time'].strftime('%H:%M:%S')
-            elif processed_flight.get('departure_time') is not None: # Handle if it's already a string somehow
-                 processed_flight['departure_time'] = str(processed_flight['departure_time'])
+    # With DB version counters available the ETag is known before touching the flights table,
+    # so a matching If-None-Match skips the query and serialization entirely.
+    etag = None
+    if cache_version is not None and flight_cache_versions.has_versions():
+        etag = make_etag('flights', cache_key, cache_version)
+        if is_not_modified(request, etag):
+            app.logger.info(f"Not modified: flights for company_id {company_id}")
+            return not_modified_response(etag)
 
+    cached = flights_cache.get(cache_key, cache_version)
+    if cached is not None:
+        body, flight_count, next_cursor, body_tag = cached
+        app.logger.info(f"Cache hit: {flight_count} flights for company_id {company_id}")
+        return flights_page_response(body, next_cursor, etag or body_tag)
 
-            if isinstance(processed_flight.get('arrival_time'), datetime.time):
-                processed_flight['arrival_time'] = processed_flight['arrival_time'].strftime('%H:%M:%S')
-            elif processed_flight.get('arrival_time') is not None: # Handle if it's already a string
-                 processed_flight['arrival_time'] = str(processed_flight['arrival_time'])
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        # Query focuses on the 'flights' table; filters and paging run in the database
+        cur.execute(sql, params)
+        flights = cur.fetchall() # This fetches rows as dictionaries
 
-            # Convert any other necessary types here (e.g., dates if you had separate date columns)
+        next_cursor = None
+        if limit is not None and len(flights) > limit:
+            flights = flights[:limit]
+            last_row = flights[-1]
+            next_cursor = encode_flight_cursor(last_row[sort_column], last_row['id'])
 
-            processed_flights.append(processed_flight)
-        # --- End Processing ---
+        # Rows are encoded straight to JSON bytes (Decimal/TIME handled by the shared serializer)
+        body = dumps(flights)
 
-        app.logger.info(f"Found and processed {len(processed_flights)} flights for company_id {company_id}")
-        return jsonify(processed_flights), 200 # Return the processed list
+        app.logger.info(f"Found {len(flights)} flights for company_id {company_id}")
+        body_tag = etag or body_etag(body)
+        flights_cache.set(cache_key, (body, len(flights), next_cursor, body_tag), cache_version)
+        return flights_page_response(body, next_cursor, body_tag)
 
     except Exception as e:
         app.logger.error(f"Flight Service error processing/fetching flights: {str(e)}", exc_info=True)
@@ -82,11 +417,102 @@ def get_flights():
             cur.close()
 
 
+# === Get Airlines Endpoint (for Frontend airline picker) ===
+@app.route('/api/flights/airlines', methods=['GET'])
+@require_token(token_verifier)
+def get_flight_airlines():
+    company_id = request.args.get('company_id')
+    app.logger.info(f"Flight Service received request for {request.endpoint} with company_id: {company_id}")
+
+    if not company_id:
+        app.logger.warning(f"{request.endpoint}: company_id is required")
+        return jsonify({'error': 'company_id is required'}), 400
+    if not claims_allow(company_id=company_id):
+        app.logger.warning(f"{request.endpoint}: company_id {company_id} does not match the session token")
+        return jsonify({'error': 'company_id does not match the signed-in account'}), 403
+
+    cur = None
+    try:
+        cur = mysql.connection.cursor()
+        # Served from the (company_id, airline, ...) index without touching full rows
+        cur.execute("SELECT DISTINCT airline FROM flights WHERE company_id = %s ORDER BY airline", (company_id,))
+        airlines = [row['airline'] for row in cur.fetchall()]
+        app.logger.info(f"Found {len(airlines)} airlines for company_id {company_id}")
+        return jsonify(airlines), 200
+    except Exception as e:
+        app.logger.error(f"Flight Service error fetching airlines: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Internal server error fetching airlines'}), 500
+    finally:
+        if cur:
+            cur.close()
+
+
+# === Route Search Endpoint (multi-leg connections) ===
+@app.route('/api/flights/routes', methods=['GET'])
+@require_token(token_verifier)
+def search_flight_routes():
+    company_id = request.args.get('company_id')
+    origin = request.args.get('origin')
+    destination = request.args.get('destination')
+    app.logger.info(f"Flight Service received request for {request.endpoint}: company_id={company_id}, {origin} -> {destination}")
+
+    if not company_id or not origin or not destination:
+        app.logger.warning(f"{request.endpoint}: company_id, origin and destination are required")
+        return jsonify({'error': 'company_id, origin and destination are required'}), 400
+    if not claims_allow(company_id=company_id):
+        app.logger.warning(f"{request.endpoint}: company_id {company_id} does not match the session token")
+        return jsonify({'error': 'company_id does not match the signed-in account'}), 403
+
+    try:
+        company_id = int(company_id)
+        k = int(request.args.get('k', 5))
+        max_hops = int(request.args.get('max_hops', 3))
+        min_connection = int(request.args.get('min_connection_minutes', 45))
+        max_layover = int(request.args.get('max_layover_minutes', 24 * 60))
+    except ValueError:
+        return jsonify({'error': 'company_id, k, max_hops, min_connection_minutes and max_layover_minutes must be integers'}), 400
+    optimize = request.args.get('optimize', 'price')
+    if optimize not in ('price', 'duration'):
+        return jsonify({'error': 'optimize must be price or duration'}), 400
+    if not 1 <= k <= MAX_ROUTE_RESULTS:
+        return jsonify({'error': f'k must be between 1 and {MAX_ROUTE_RESULTS}'}), 400
+    if not 1 <= max_hops <= MAX_ROUTE_HOPS:
+        return jsonify({'error': f'max_hops must be between 1 and {MAX_ROUTE_HOPS}'}), 400
+    if min_connection < 0 or max_layover < min_connection:
+        return jsonify({'error': 'min_connection_minutes must be >= 0 and <= max_layover_minutes'}), 400
+    depart_after = None
+    if request.args.get('depart_after'):
+        try:
+            hours, minutes, _ = parse_time_param('depart_after', request.args['depart_after']).split(':')
+        except FlightQueryError as e:
+            return jsonify({'error': str(e)}), 400
+        depart_after = int(hours) * 60 + int(minutes)
+
+    try:
+        started = time.perf_counter()
+        graph = flight_graph_index.get(company_id, flight_cache_versions.get(company_id), time.monotonic())
+        itineraries = graph.search(
+            origin, destination, k=k, optimize=optimize, max_hops=max_hops,
+            min_connection=min_connection, max_layover=max_layover, depart_after=depart_after
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        app.logger.info(f"Route search {origin} -> {destination} for company_id {company_id}: {len(itineraries)} itineraries in {elapsed_ms:.1f} ms")
+        return json_response({'itineraries': itineraries, 'optimize': optimize}, 200)
+    except Exception as e:
+        app.logger.error(f"Flight Service error during route search: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Internal server error during route search'}), 500
+
+
 # === Get Flight Details Endpoint (for INTERNAL Service-to-Service communication) ===
-# IMPORTANT: Also apply the time conversion fix here if this endpoint is used
 @app.route('/api/internal/flights/<int:flight_id>/details', methods=['GET'])
 def get_flight_details_internal(flight_id):
     app.logger.info(f"Flight Service received internal request for flight details: ID={flight_id}")
+    cache_version = flight_cache_versions.get(TABLE_VERSION_SCOPE)
+    cached = flight_details_cache.get(flight_id, cache_version)
+    if cached is not None:
+        app.logger.info(f"Internal request: cache hit for flight ID={flight_id}")
+        return json_response(cached, 200)
+
     cur = None
     try:
         cur = mysql.connection.cursor()
@@ -97,32 +523,109 @@ def get_flight_details_internal(flight_id):
              app.logger.warning(f"Internal request: Flight not found with ID={flight_id}")
              return jsonify({'error': 'Flight not found'}), 404
 
-        processed_details = dict(flight_details_row) # Mutable copy
+        app.logger.info(f"Internal request: Found details for flight ID={flight_id}")
+        flight_details_cache.set(flight_id, flight_details_row, cache_version)
+        return json_response(flight_details_row, 200)
+    except Exception as e:
+        app.logger.error(f"Flight Service DB error fetching internal details for ID={flight_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Internal server error processing flight details'}), 500
+    finally:
+        if cur:
+            cur.close()
 
-        # Convert Decimal
-        if isinstance(processed_details.get('price'), decimal.Decimal):
-             processed_details['price'] = float(processed_details['price'])
+# === Batch Flight Details Endpoint (INTERNAL) ===
+# Resolves many flights in one round trip and one `WHERE id IN (...)` query.
+@app.route('/api/internal/flights/details', methods=['POST'])
+def get_flight_details_batch_internal():
+    data = request.get_json(silent=True) or {}
+    flight_ids = data.get('flight_ids')
+    app.logger.info(f"Flight Service received internal batch request for flight details: {len(flight_ids) if isinstance(flight_ids, list) else 0} IDs")
+
+    if not isinstance(flight_ids, list) or not flight_ids:
+        return jsonify({'error': 'flight_ids must be a non-empty list'}), 400
+    try:
+        # De-duplicate while keeping the caller's order
+        flight_ids = list(dict.fromkeys(int(flight_id) for flight_id in flight_ids))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'flight_ids must contain integers only'}), 400
+    if len(flight_ids) > MAX_FLIGHT_DETAILS_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_FLIGHT_DETAILS_BATCH_SIZE} flight_ids per request'}), 400
 
-        # *** NEW: Convert datetime.time to string "HH:MM:SS" ***
-        if isinstance(processed_details.get('departure_time'), datetime.time):
-            processed_details['departure_time'] = processed_details['departure_time'].strftime('%H:%M:%S')
-        elif processed_details.get('departure_time') is not None:
-             processed_details['departure_time'] = str(processed_details['departure_time'])
+    cache_version = flight_cache_versions.get(TABLE_VERSION_SCOPE)
+    found = {}
+    to_query = []
+    for flight_id in flight_ids:
+        cached = flight_details_cache.get(flight_id, cache_version)
+        if cached is not None:
+            found[flight_id] = cached
+        else:
+            to_query.append(flight_id)
 
-        if isinstance(processed_details.get('arrival_time'), datetime.time):
-            processed_details['arrival_time'] = processed_details['arrival_time'].strftime('%H:%M:%S')
-        elif processed_details.get('arrival_time') is not None:
-             processed_details['arrival_time'] = str(processed_details['arrival_time'])
+    cur = None
+    try:
+        if to_query:
+            cur = mysql.connection.cursor()
+            placeholders = ', '.join(['%s'] * len(to_query))
+            cur.execute(
+                f"SELECT id, price, origin, destination, airline, departure_time, arrival_time FROM flights WHERE id IN ({placeholders})",
+                tuple(to_query)
+            )
+            for row in cur.fetchall():
+                flight_id = row.pop('id')
+                flight_details_cache.set(flight_id, row, cache_version)
+                found[flight_id] = row
 
-        app.logger.info(f"Internal request: Found and processed details for flight ID={flight_id}")
-        return jsonify(processed_details), 200 # Return processed dict
+        missing = [flight_id for flight_id in flight_ids if flight_id not in found]
+        if missing:
+            app.logger.warning(f"Internal batch request: Flights not found: {missing}")
+        app.logger.info(f"Internal batch request: Resolved {len(found)} flights ({len(to_query)} from DB), {len(missing)} missing")
+        # JSON object keys are strings; missing IDs map to null and are also listed explicitly
+        return json_response({
+            'flights': {str(flight_id): found.get(flight_id) for flight_id in flight_ids},
+            'missing': missing
+        }, 200)
     except Exception as e:
-        app.logger.error(f"Flight Service DB error fetching internal details for ID={flight_id}: {str(e)}", exc_info=True)
+        app.logger.error(f"Flight Service DB error fetching internal batch details: {str(e)}", exc_info=True)
         return jsonify({'error': 'Internal server error processing flight details'}), 500
     finally:
         if cur:
             cur.close()
 
+# === Flight Cache Stats / Invalidation (INTERNAL) ===
+@app.route('/api/internal/flights/cache', methods=['GET'])
+def flight_cache_stats():
+    return jsonify({
+        'flights': flights_cache.stats(),
+        'flight_details': flight_details_cache.stats(),
+        'route_index': flight_graph_index.stats(),
+        'version_check_seconds': FLIGHT_CACHE_VERSION_CHECK_SECONDS,
+        'fare_push': fare_change_notifier.stats(),
+    }), 200
+
+
+@app.route('/api/internal/flights/cache/invalidate', methods=['POST'])
+def flight_cache_invalidate():
+    """Drops this worker's cached entries for a company (or everything) without waiting for the version check."""
+    data = request.get_json(silent=True) or {}
+    company_id = data.get('company_id')
+    if company_id is not None:
+        try:
+            company_id = int(company_id)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'company_id must be an integer'}), 400
+        flight_cache_versions.bump(company_id)
+    else:
+        flights_cache.clear()
+    flight_cache_versions.bump(TABLE_VERSION_SCOPE)
+    app.logger.info(f"Flight cache invalidated for company_id={company_id if company_id is not None else 'ALL'}")
+    try:
+        # Prices are cached by flight id on the booking side, so any explicit invalidation clears them all
+        if not fare_change_notifier.push_all():
+            app.logger.warning("Flight cache invalidate: booking-service rejected the price cache push")
+    except Exception as e:
+        app.logger.warning(f"Flight cache invalidate: could not push to booking-service (its TTL still applies): {e}")
+    return jsonify({'status': 'success'}), 200
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
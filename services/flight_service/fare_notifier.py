@@ -0,0 +1,92 @@
+# services/flight_service/fare_notifier.py
+# Pushes fare changes (flight_fare_changes log) to services that cache prices.
+import threading
+import time
+
+
+class FareChangeNotifier:
+    """
+    Background poller that tails the flight_fare_changes table and POSTs the
+    changed flight ids to `path` on `client` (a common.http_client.ServiceClient).
+
+    The read position only advances after the receiver accepted a batch, so a
+    push that fails is re-sent on the next poll. The receiver's own TTL covers
+    the time the push is delayed. Loaders run inside `app.app_context()`
+    because they use the request-scoped MySQL connection.
+    """
+
+    def __init__(self, app, load_latest_id, load_changes, prune, client, path, interval,
+                 batch_size=500, prune_every=3600):
+        self.app = app
+        self._load_latest_id = load_latest_id # () -> newest change id (0 when empty)
+        self._load_changes = load_changes # (after_id, limit) -> rows with 'id', 'flight_id' ordered by id
+        self._prune = prune # () -> number of old rows deleted
+        self.client = client
+        self.path = path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.prune_every = prune_every
+        self._last_id = None
+        self._last_prune = time.monotonic()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.pushed_batches = 0
+        self.pushed_flights = 0
+        self.failures = 0
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='fare-change-notifier', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    while self.poll_once() == self.batch_size:
+                        pass # Drain a backlog without waiting a full interval per batch
+                    if time.monotonic() - self._last_prune >= self.prune_every:
+                        self._last_prune = time.monotonic()
+                        self._prune()
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                self.app.logger.warning(f"Fare change notifier: push failed, will retry: {e}")
+
+    def poll_once(self):
+        """Pushes the next batch of changes; returns how many change rows it covered."""
+        if self._last_id is None:
+            self._last_id = self._load_latest_id() # Start from now; older changes predate any cache
+            return 0
+        rows = self._load_changes(self._last_id, self.batch_size)
+        if not rows:
+            return 0
+        flight_ids = sorted({row['flight_id'] for row in rows})
+        response = self.client.post(self.path, json={'flight_ids': flight_ids}, retry=True) # Idempotent
+        if response.status_code != 200:
+            raise RuntimeError(f"{self.client.name} answered {response.status_code}")
+        self._last_id = rows[-1]['id']
+        with self._lock:
+            self.pushed_batches += 1
+            self.pushed_flights += len(flight_ids)
+        return len(rows)
+
+    def push_all(self):
+        """Asks the receiver to drop every cached price (used by explicit cache invalidation)."""
+        response = self.client.post(self.path, json={}, retry=True)
+        return response.status_code == 200
+
+    def stats(self):
+        with self._lock:
+            return {
+                'last_change_id': self._last_id,
+                'interval_seconds': self.interval,
+                'pushed_batches': self.pushed_batches,
+                'pushed_flights': self.pushed_flights,
+                'failures': self.failures,
+                'last_error': self.last_error,
+                'receiver': self.client.stats(),
+            }
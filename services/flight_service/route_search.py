@@ -0,0 +1,222 @@
+# services/flight_service/route_search.py
+# In-memory connection search over a company's flights (daily schedules, times of day only).
+import datetime
+import decimal
+import heapq
+import itertools
+import threading
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def time_to_minutes(value):
+    """Converts a TIME column value (timedelta, datetime.time or 'HH:MM[:SS]') to minutes after midnight."""
+    if isinstance(value, datetime.timedelta):
+        return int(value.total_seconds() // 60) % MINUTES_PER_DAY
+    if isinstance(value, datetime.time):
+        return value.hour * 60 + value.minute
+    if isinstance(value, str):
+        parts = value.split(':')
+        return (int(parts[0]) * 60 + int(parts[1])) % MINUTES_PER_DAY
+    raise ValueError(f"Unsupported time value: {value!r}")
+
+
+class FlightGraph:
+    """
+    Adjacency index of one company's flights: origin -> destination -> legs.
+
+    Each leg keeps the original row (for the response) plus precomputed departure
+    minute, duration and price (integer cents), so a search never touches the
+    database or does Decimal arithmetic. Legs of a route are kept sorted by price.
+    """
+
+    def __init__(self, rows):
+        self.flight_count = 0
+        self.routes = {}
+        for row in rows:
+            try:
+                departure = time_to_minutes(row['departure_time'])
+                arrival = time_to_minutes(row['arrival_time'])
+            except (KeyError, TypeError, ValueError):
+                continue # Unscheduled rows cannot be part of a connection
+            duration = (arrival - departure) % MINUTES_PER_DAY # Arrives the next day if arrival < departure
+            price = row.get('price')
+            leg = {
+                'row': row,
+                'destination': row['destination'],
+                'departure': departure,
+                'duration': duration,
+                'price_cents': int(decimal.Decimal(str(price)) * 100) if price is not None else 0,
+            }
+            self.routes.setdefault(row['origin'], {}).setdefault(row['destination'], []).append(leg)
+            self.flight_count += 1
+        for destinations in self.routes.values():
+            for legs in destinations.values():
+                legs.sort(key=lambda leg: (leg['price_cents'], leg['departure']))
+
+    def search(self, origin, destination, k=5, optimize='price', max_hops=3,
+               min_connection=45, max_layover=MINUTES_PER_DAY, depart_after=None, max_expansions=50000):
+        """
+        Returns up to `k` itineraries from origin to destination, best first.
+
+        optimize='price' ranks by total fare, optimize='duration' by elapsed time
+        from first departure to last arrival. Connections must leave at least
+        `min_connection` and at most `max_layover` minutes after the previous
+        arrival (overnight waits count). Best-first search over partial
+        itineraries; costs only grow along a path, so itineraries come out in order.
+
+        Schedules repeat daily, so two partial itineraries that reach a stop at the
+        same time of day having visited the same airports have exactly the same
+        continuations, and their order by cost never changes. Only the k best of
+        each such (time of day, visited airports) group are kept; a cheap leg that
+        arrives at a different time never hides a pricier one that connects.
+        """
+        if origin == destination or max_hops < 1:
+            return []
+        reach = self._reachability(destination, max_hops)
+        if origin not in reach[max_hops]:
+            return []
+        counter = itertools.count() # Tie-breaker so heapq never compares dicts
+        heap = []
+        complete_costs = [] # Max-heap (negated) of the k best complete itineraries pushed so far
+        start = (0, 0, None, (), (), frozenset([origin]))
+        search = (heap, counter, complete_costs, reach, destination, k, optimize, max_hops, min_connection, max_layover)
+        self._expand(search, start, origin, depart_after)
+
+        results = []
+        settled = {} # (arrival time of day, visited airports) -> partial itineraries expanded from it
+        expansions = 0
+        while heap and len(results) < k and expansions < max_expansions:
+            _, _, state = heapq.heappop(heap)
+            price, elapsed, arrival, legs, layovers, visited = state
+            airport = legs[-1]['destination']
+            if airport == destination:
+                results.append(self._itinerary(legs, layovers, price, elapsed))
+                continue
+            group = (arrival % MINUTES_PER_DAY, visited)
+            settled[group] = settled.get(group, 0) + 1
+            if settled[group] > k:
+                continue # k cheaper/faster itineraries with the same continuations were already expanded
+            expansions += 1
+            self._expand(search, state, airport, None)
+        return results
+
+    def _reachability(self, destination, max_hops):
+        """reach[h] = airports that can reach `destination` in at most h legs (reach[0] is the destination)."""
+        inbound = {}
+        for origin, destinations in self.routes.items():
+            for stop in destinations:
+                inbound.setdefault(stop, set()).add(origin)
+        reach = [{destination}]
+        for _ in range(max_hops):
+            previous = reach[-1]
+            reach.append(previous | {origin for stop in previous for origin in inbound.get(stop, ())})
+        return reach
+
+    def _expand(self, search, state, airport, depart_after):
+        heap, counter, complete_costs, reach, destination, k, optimize, max_hops, min_connection, max_layover = search
+        price, elapsed, arrival, legs, layovers, visited = state
+        destinations = self.routes.get(airport)
+        if not destinations:
+            return
+        # After this leg, max_hops - len(legs) - 1 legs remain; the next stop must still reach the destination
+        reachable = reach[max_hops - len(legs) - 1]
+        by_duration = optimize == 'duration'
+
+        for stop, stop_legs in destinations.items():
+            if stop not in reachable or stop in visited:
+                continue
+            candidates = {} # arrival time of day -> up to k best candidates arriving then
+            for leg in stop_legs:
+                if arrival is None:
+                    # First leg: the itinerary starts at its departure
+                    if depart_after is not None and leg['departure'] < depart_after:
+                        continue
+                    wait = 0
+                    next_arrival = leg['departure'] + leg['duration']
+                    next_elapsed = leg['duration']
+                else:
+                    # First departure of this daily flight at or after the minimum connection time
+                    earliest = arrival + min_connection
+                    departure = earliest + (leg['departure'] - earliest) % MINUTES_PER_DAY
+                    wait = departure - arrival
+                    if wait > max_layover:
+                        continue
+                    next_arrival = departure + leg['duration']
+                    next_elapsed = elapsed + wait + leg['duration']
+                same_arrival = candidates.setdefault(next_arrival % MINUTES_PER_DAY, [])
+                if by_duration or len(same_arrival) < k:
+                    same_arrival.append((leg, wait, next_arrival, next_elapsed))
+                # Legs are sorted by price, so past k a same-time leg can only be more expensive
+            if by_duration:
+                for arrival_time, same_arrival in candidates.items():
+                    if len(same_arrival) > k:
+                        candidates[arrival_time] = heapq.nsmallest(k, same_arrival, key=lambda candidate: candidate[3])
+
+            for leg, wait, next_arrival, next_elapsed in itertools.chain.from_iterable(candidates.values()):
+                next_price = price + leg['price_cents']
+                cost = (next_elapsed, next_price) if by_duration else (next_price, next_elapsed)
+                # Branch and bound: costs only grow, so anything worse than the k-th complete itinerary is dead
+                if len(complete_costs) == k and cost >= (-complete_costs[0][0], -complete_costs[0][1]):
+                    continue
+                if stop == destination:
+                    negated = (-cost[0], -cost[1])
+                    if len(complete_costs) == k:
+                        heapq.heapreplace(complete_costs, negated)
+                    else:
+                        heapq.heappush(complete_costs, negated)
+                next_state = (
+                    next_price,
+                    next_elapsed,
+                    next_arrival,
+                    legs + (leg,),
+                    layovers + (wait,) if legs else layovers,
+                    visited | {stop},
+                )
+                heapq.heappush(heap, (cost, next(counter), next_state))
+
+    @staticmethod
+    def _itinerary(legs, layovers, price, elapsed):
+        return {
+            'legs': [leg['row'] for leg in legs],
+            'connections': len(legs) - 1,
+            'layover_minutes': list(layovers),
+            'total_price': decimal.Decimal(price) / 100,
+            'total_duration_minutes': elapsed,
+        }
+
+
+class FlightGraphIndex:
+    """
+    Per-company FlightGraph cache. A company's graph is rebuilt (from that
+    company's rows only) when its flight_cache_versions counter changes or the
+    TTL passes; other companies' graphs are untouched.
+    """
+
+    def __init__(self, loader, ttl):
+        self._loader = loader # company_id -> iterable of flight rows
+        self.ttl = ttl
+        self._graphs = {} # company_id -> (built_at, version, FlightGraph)
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, company_id, version, now):
+        with self._lock:
+            entry = self._graphs.get(company_id)
+        if entry is not None:
+            built_at, built_version, graph = entry
+            if built_version == version and now - built_at < self.ttl:
+                return graph
+        graph = FlightGraph(self._loader(company_id))
+        with self._lock:
+            self._graphs[company_id] = (now, version, graph)
+            self.builds += 1
+        return graph
+
+    def stats(self):
+        with self._lock:
+            return {
+                'companies': len(self._graphs),
+                'flights_indexed': sum(graph.flight_count for _, _, graph in self._graphs.values()),
+                'builds': self.builds,
+            }
@@ -0,0 +1,58 @@
+# services/flight_service/test_route_search.py
+# From the services/flight_service directory: python -m unittest test_route_search
+import decimal
+import unittest
+
+from route_search import FlightGraph
+
+
+def flight(flight_id, origin, destination, departure, arrival, price):
+    return {
+        'flight_id': flight_id,
+        'origin': origin,
+        'destination': destination,
+        'departure_time': departure,
+        'arrival_time': arrival,
+        'price': price,
+    }
+
+
+class FlightGraphSearchTest(unittest.TestCase):
+
+    def test_cheaper_leg_that_cannot_connect_does_not_hide_one_that_can(self):
+        graph = FlightGraph([
+            flight(1, 'A', 'B', '08:00', '10:00', '100.00'),
+            flight(2, 'A', 'B', '18:00', '20:00', '200.00'),
+            flight(3, 'B', 'C', '21:00', '22:00', '50.00'),
+        ])
+        for k in (1, 2):
+            results = graph.search('A', 'C', k=k, max_layover=120)
+            self.assertEqual(len(results), 1, f"k={k}")
+            self.assertEqual([leg['flight_id'] for leg in results[0]['legs']], [2, 3])
+            self.assertEqual(results[0]['total_price'], decimal.Decimal('250'))
+            self.assertEqual(results[0]['layover_minutes'], [60])
+
+    def test_results_come_out_cheapest_first(self):
+        graph = FlightGraph([
+            flight(1, 'A', 'C', '09:00', '12:00', '400.00'),
+            flight(2, 'A', 'B', '08:00', '09:00', '100.00'),
+            flight(3, 'B', 'C', '10:00', '11:00', '100.00'),
+            flight(4, 'A', 'B', '08:00', '09:00', '150.00'),
+        ])
+        results = graph.search('A', 'C', k=3)
+        self.assertEqual([result['total_price'] for result in results],
+                         [decimal.Decimal('200'), decimal.Decimal('250'), decimal.Decimal('400')])
+
+    def test_duration_search_keeps_later_connecting_leg(self):
+        graph = FlightGraph([
+            flight(1, 'A', 'B', '08:00', '09:00', '100.00'),
+            flight(2, 'A', 'B', '19:00', '20:00', '100.00'),
+            flight(3, 'B', 'C', '21:00', '22:00', '50.00'),
+        ])
+        results = graph.search('A', 'C', k=1, optimize='duration', max_layover=120)
+        self.assertEqual([leg['flight_id'] for leg in results[0]['legs']], [2, 3])
+        self.assertEqual(results[0]['total_duration_minutes'], 180)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,21 @@
 # services/visa_service/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context, send_file
 from flask_cors import CORS
-import pytesseract
-from PIL import Image
 import os
 import logging
-import re # Import regex module
 import datetime
+import json
+import queue
+import tempfile
+from collections import deque
 from werkzeug.utils import secure_filename # Make sure secure_filename is imported
+from common.auth_tokens import TokenVerifier, require_token
+from ocr_jobs import OcrJobQueue, QueueFull
+from visa_ocr import verify_visa_file, check_visa_text, pipeline_key, PREPROCESS_CONFIG, VISA_OCR_WORKERS
+from ocr_cache import OcrTextCache
+from preprocess import STAGES
+from uploads import read_upload, should_retain, RETAIN_NONE, RETENTION_POLICIES
+from document_store import DocumentStore
 
 app = Flask(__name__)
 CORS(app)
@@ -26,187 +34,435 @@ except OSError as e:
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# --- Session Tokens ---
+# Issued by auth-service on login and verified locally; see common/auth_tokens.py for key rotation
+token_verifier = TokenVerifier.from_env()
 
-# === Helper: Extract Age Function ===
-def extract_age_from_text(text):
-    """Searches text for 'Age: XX' (case-insensitive) and returns integer age or None."""
-    match = re.search(r'\bAge:\s*(\d+)\b', text, re.IGNORECASE)
-    if match:
-        try:
-            age = int(match.group(1))
-            app.logger.debug(f"Found age pattern. Extracted age: {age}")
-            return age
-        except ValueError:
-            app.logger.warning(f"Found age pattern '{match.group(0)}' but digits '{match.group(1)}' invalid.")
-            return None
-    else:
-        app.logger.debug("Age pattern 'Age: XX' not found in OCR text.")
-        return None
 
-# === Helper: Normalize Phone Number ===
-def normalize_phone(phone_string):
-    """Removes all non-digit characters from a string."""
-    if not phone_string:
-        return ""
-    return re.sub(r'\D', '', phone_string)
+# --- OCR Job Config ---
+# OCR runs in a pool of worker processes (ocr_jobs.py). The synchronous endpoint waits for its
+# job; the job endpoints return at once and are polled. Both count against the same queue limit.
+# VISA_OCR_WORKERS (default: one per CPU) is read in visa_ocr.py, which sizes PDF page threads from it.
+VISA_OCR_MAX_PENDING = int(os.environ.get('VISA_OCR_MAX_PENDING', str(VISA_OCR_WORKERS * 8)))
+VISA_OCR_RESULT_TTL_SECONDS = float(os.environ.get('VISA_OCR_RESULT_TTL_SECONDS', '600'))
+VISA_SYNC_TIMEOUT_SECONDS = float(os.environ.get('VISA_SYNC_TIMEOUT_SECONDS', '120'))
+VISA_JOB_MAX_WAIT_SECONDS = float(os.environ.get('VISA_JOB_MAX_WAIT_SECONDS', '30')) # Long-poll cap
 
+ocr_jobs = OcrJobQueue(
+    verify_visa_file, VISA_OCR_WORKERS, VISA_OCR_MAX_PENDING, VISA_OCR_RESULT_TTL_SECONDS, app.logger
+)
 
-# === Verify Visa Endpoint ===
-@app.route('/api/verify-visa', methods=['POST'])
-def verify_visa():
-    app.logger.info(f"Visa Service received request for {request.endpoint}")
+# --- OCR Text Cache Config ---
+# Re-uploads of the same file (e.g. after a details mismatch) reuse its OCR text; only the field
+# checks run again. Keyed by SHA-256 of the bytes plus the OCR pipeline version and settings.
+VISA_OCR_CACHE_DIR = os.environ.get('VISA_OCR_CACHE_DIR', '/app/ocr_cache')
+VISA_OCR_CACHE_MEMORY_ENTRIES = int(os.environ.get('VISA_OCR_CACHE_MEMORY_ENTRIES', '1000'))
+VISA_OCR_CACHE_DISK_ENTRIES = int(os.environ.get('VISA_OCR_CACHE_DISK_ENTRIES', '20000'))
+VISA_OCR_CACHE_TTL_SECONDS = float(os.environ.get('VISA_OCR_CACHE_TTL_SECONDS', str(24 * 3600))) # OCR text is personal data
+
+ocr_text_cache = OcrTextCache(
+    VISA_OCR_CACHE_DIR, VISA_OCR_CACHE_MEMORY_ENTRIES, VISA_OCR_CACHE_DISK_ENTRIES,
+    VISA_OCR_CACHE_TTL_SECONDS, app.logger
+)
+
+# --- Upload Handling ---
+# 'memory': uploads up to VISA_UPLOAD_MEMORY_MAX_BYTES reach the OCR workers as bytes; larger ones are
+# spooled to VISA_UPLOAD_SPOOL_DIR (container-local, not the shared upload volume).
+# 'disk': every upload is written to UPLOAD_FOLDER first, as before.
+VISA_UPLOAD_MODE = os.environ.get('VISA_UPLOAD_MODE', 'memory')
+VISA_UPLOAD_MEMORY_MAX_BYTES = int(os.environ.get('VISA_UPLOAD_MEMORY_MAX_BYTES', str(8 * 1024 * 1024)))
+VISA_UPLOAD_SPOOL_DIR = os.environ.get('VISA_UPLOAD_SPOOL_DIR') or tempfile.gettempdir()
+if VISA_UPLOAD_MODE == 'disk':
+    VISA_UPLOAD_MEMORY_MAX_BYTES = 0
+    VISA_UPLOAD_SPOOL_DIR = UPLOAD_FOLDER
+elif VISA_UPLOAD_MODE != 'memory':
+    raise ValueError(f"VISA_UPLOAD_MODE must be 'memory' or 'disk', not '{VISA_UPLOAD_MODE}'")
+# Uploads kept once verified: none, failed (anything but a successful verification) or all
+VISA_UPLOAD_RETENTION = os.environ.get('VISA_UPLOAD_RETENTION', RETAIN_NONE)
+if VISA_UPLOAD_RETENTION not in RETENTION_POLICIES:
+    raise ValueError(f"VISA_UPLOAD_RETENTION must be one of {', '.join(RETENTION_POLICIES)}")
+
+# --- Retained Document Store ---
+# Kept uploads are stored by content hash (document_store.py); identical files are stored once and
+# expire VISA_DOCUMENT_RETENTION_DAYS after they were last retained
+VISA_DOCUMENT_STORE_DIR = os.environ.get('VISA_DOCUMENT_STORE_DIR', os.path.join(UPLOAD_FOLDER, 'store'))
+VISA_DOCUMENT_RETENTION_DAYS = float(os.environ.get('VISA_DOCUMENT_RETENTION_DAYS', '30'))
+VISA_DOCUMENT_SWEEP_SECONDS = float(os.environ.get('VISA_DOCUMENT_SWEEP_SECONDS', '3600'))
+
+document_store = DocumentStore(
+    VISA_DOCUMENT_STORE_DIR, VISA_DOCUMENT_RETENTION_DAYS * 86400, app.logger, VISA_DOCUMENT_SWEEP_SECONDS
+)
+document_store.start_sweeper()
+
+# --- Batch Verification Config ---
+VISA_BATCH_MAX_FILES = int(os.environ.get('VISA_BATCH_MAX_FILES', '50'))
+# Jobs one batch keeps queued or running at once: enough to keep every worker busy without
+# filling the shared queue and turning away everyone else's uploads
+VISA_BATCH_MAX_IN_FLIGHT = int(os.environ.get('VISA_BATCH_MAX_IN_FLIGHT', str(VISA_OCR_WORKERS * 2)))
+# A batch is read in full before it streams; past this many bytes its files are spooled instead
+VISA_BATCH_MEMORY_BYTES = int(os.environ.get('VISA_BATCH_MEMORY_BYTES', str(64 * 1024 * 1024)))
+
+
+# === Helper: Accept Upload ===
+def missing_visa_details(expected, file):
+    """Names of the required form fields (and the file) that are missing, for the error message."""
+    missing = [field for field in ('name', 'email', 'company', 'destination') if not expected[field]]
+    if not expected['phone']: missing.append("phone number")
+    if not file: missing.append("visa file")
+    return missing
+
+
+def upload_filename(file):
+    # --- Basic filename handling ---
+    if not file.filename:
+        app.logger.warning("Uploaded file has no filename. Generating a default.")
+        return f"uploaded_visa_{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}.bin"
+    return secure_filename(file.filename) or 'uploaded_visa.bin'
+
+
+def upload_cache_key(upload, filename):
+    """OCR cache key for an upload: the SHA-256 of its bytes."""
+    # PDFs take a different OCR path, so the same bytes under another extension are a different entry
+    kind = 'pdf' if filename.lower().endswith('.pdf') else 'img'
+    return f"{upload.sha256}-{kind}-{pipeline_key()}"
+
+
+def receive_upload(file, filename, max_memory_bytes=None):
+    """Reads (and hashes) the upload; returns (Upload, None) or (None, error response)."""
+    if max_memory_bytes is None:
+        max_memory_bytes = VISA_UPLOAD_MEMORY_MAX_BYTES
+    try:
+        upload = read_upload(file.stream, max_memory_bytes, VISA_UPLOAD_SPOOL_DIR)
+    except Exception as e:
+        app.logger.error(f"Error receiving uploaded visa file {filename}: {str(e)}", exc_info=True)
+        return None, (jsonify({'status': 'error', 'message': 'Failed to save uploaded file'}), 500)
+    app.logger.debug(f"Visa file {filename} received ({upload.size} bytes, {'in memory' if upload.in_memory else 'spooled'})")
+    return upload, None
+
+
+def finish_upload(upload, filename, status, owner=None):
+    """Keeps the upload in the document store if the retention policy says so, then lets it go."""
+    try:
+        if should_retain(VISA_UPLOAD_RETENTION, status):
+            digest = document_store.put(upload, filename, status, owner)
+            app.logger.info(f"Visa file {filename} retained ({VISA_UPLOAD_RETENTION}) as document {digest[:12]}")
+    except OSError as e:
+        app.logger.warning(f"Could not retain visa file {filename}: {e}")
+    finally:
+        upload.discard()
+
+
+def accept_visa_upload():
+    """
+    Validates the form and reads the file. Returns (expected details, Upload,
+    filename, cache key, None), or (None, None, None, None, error response).
+    """
     # --- Access form data (including phone number) ---
-    name = request.form.get('name')
-    email = request.form.get('email')
-    company = request.form.get('company')
-    destination = request.form.get('destination')
-    phone = request.form.get('phone') # Get the phone number
+    expected = {
+        'name': request.form.get('name'),
+        'email': request.form.get('email'),
+        'company': request.form.get('company'),
+        'destination': request.form.get('destination'),
+        'phone': request.form.get('phone'), # Get the phone number
+    }
     file = request.files.get('visa')
 
-    app.logger.debug(f"Visa verification attempt: Name='{name}', Email='{email}', Company='{company}', Destination='{destination}', Phone='{phone}', File={file.filename if file else 'None'}")
+    app.logger.debug(f"Visa verification attempt: Name='{expected['name']}', Email='{expected['email']}', Company='{expected['company']}', Destination='{expected['destination']}', Phone='{expected['phone']}', File={file.filename if file else 'None'}")
 
     # --- Updated validation for incoming data (including phone) ---
-    if not all([name, email, company, destination, phone, file]): # Add phone check
-        missing = []
-        if not name: missing.append("name")
-        if not email: missing.append("email")
-        if not company: missing.append("company")
-        if not destination: missing.append("destination")
-        if not phone: missing.append("phone number") # Add phone to missing check
-        if not file: missing.append("visa file")
+    missing = missing_visa_details(expected, file)
+    if missing:
         app.logger.warning(f"Visa verification failed: Missing required form data: {', '.join(missing)}")
-        return jsonify({'status': 'error', 'message': f'Missing visa upload data: {", ".join(missing)}'}), 400
+        return None, None, None, None, (jsonify({'status': 'error', 'message': f'Missing visa upload data: {", ".join(missing)}'}), 400)
 
-    # --- Basic filename handling ---
-    if not file.filename:
-         app.logger.warning("Uploaded file has no filename. Generating a default.")
-         # Simplified default name generation
-         filename = f"uploaded_visa_{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}.bin" # Add microseconds for more uniqueness
-         # Try to guess extension if needed, but secure_filename below is better
+    filename = upload_filename(file)
+    upload, error = receive_upload(file, filename)
+    if error:
+        return None, None, None, None, error
+    return expected, upload, filename, upload_cache_key(upload, filename), None
+
+
+def start_ocr_job(expected, upload, filename, cache_key, on_finished=None):
+    """
+    Returns a job for the upload, which it takes over (retention, then discard) unless
+    QueueFull is raised: the caller may then retry with it or must finish_upload() it.
+    A cache hit comes back as an already finished job, without OCR.
+    `on_finished(job)` is called once the job has a result, cache hits included.
+    """
+    claims = g.get('token_claims')
+    owner = claims['employee_id'] if claims else None
+    cached = ocr_text_cache.get(cache_key)
+    if cached is not None:
+        text, complete = cached
+        result = (*check_visa_text(text, expected), text, complete)
+        # Text of a PDF that stopped early only settles a passing check; a failure needs every page
+        if complete or result[0] == 200:
+            app.logger.info(f"Visa Service: OCR cache hit for upload {cache_key[:12]}")
+            job = ocr_jobs.add_finished(result, owner)
+            finish_upload(upload, filename, result[0], owner)
+            if on_finished:
+                on_finished(job)
+            return job
+        app.logger.info(f"Visa Service: cached OCR text for upload {cache_key[:12]} is partial; running OCR on every page")
+
+    def on_done(job):
+        if job.result is None: # Never reached the pool; submit() raises
+            upload.discard()
+            return
+        finish_upload(upload, filename, job.result[0], owner)
+        text, complete = job.result[3], job.result[4]
+        if text is not None:
+            ocr_text_cache.put(cache_key, text, job.seconds or 0.0, complete)
+        if on_finished:
+            on_finished(job)
+
+    return ocr_jobs.submit((upload, filename, expected), owner=owner, on_done=on_done)
+
+
+def submit_ocr_job(expected, upload, filename, cache_key):
+    """
+    Returns (job, None), or (None, error response) when the queue is full.
+    A cache hit comes back as an already finished job, without OCR.
+    """
+    try:
+        return start_ocr_job(expected, upload, filename, cache_key), None
+    except QueueFull as full:
+        upload.discard()
+        app.logger.warning(f"Visa Service: OCR queue full ({VISA_OCR_MAX_PENDING} pending), rejecting upload.")
+        response = jsonify({'status': 'error', 'message': 'Visa verification is busy. Please retry shortly.'})
+        response.headers['Retry-After'] = str(full.retry_after)
+        return None, (response, 503)
+
+
+def log_verification(job, expected):
+    status, _, checks, _, _ = job.result
+    if status == 200:
+        app.logger.info(f"Visa verification SUCCESS for Name='{expected['name']}', Dest='{expected['destination']}', Phone='{expected['phone']}'")
+    elif checks is not None:
+        app.logger.warning(f"Visa verification FAILED for Name='{expected['name']}', Dest='{expected['destination']}', Phone='{expected['phone']}': {checks}")
     else:
-        filename = secure_filename(file.filename)
+        app.logger.error(f"Visa verification error for job {job.id} (HTTP {status})")
+
+
+def job_response(job, http_status=200):
+    body = {
+        'job_id': job.id,
+        'status': job.state,
+        'status_url': f'/api/verify-visa/jobs/{job.id}',
+    }
+    if job.result is not None:
+        body['result_status'] = job.result[0]
+        body['result'] = job.result[1]
+    return jsonify(body), http_status
+
+
+# === Verify Visa Endpoint ===
+@app.route('/api/verify-visa', methods=['POST'])
+@require_token(token_verifier)
+def verify_visa():
+    app.logger.info(f"Visa Service received request for {request.endpoint}")
+    expected, upload, filename, cache_key, error = accept_visa_upload()
+    if error:
+        return error
+    job, error = submit_ocr_job(expected, upload, filename, cache_key)
+    if error:
+        return error
+    if not job.done.wait(VISA_SYNC_TIMEOUT_SECONDS):
+        # Still running: hand the client the job to poll instead of holding this thread longer
+        app.logger.warning(f"Visa Service: OCR job {job.id} exceeded {VISA_SYNC_TIMEOUT_SECONDS}s; returning it as a job")
+        return job_response(job, 202)
+    log_verification(job, expected)
+    status, body, _, _, _ = job.result
+    return jsonify(body), status
+
+
+# === Visa Verification Jobs ===
+# POST returns 202 with a job id as soon as the file is saved; GET returns the job, and with
+# ?wait=N (seconds, capped by VISA_JOB_MAX_WAIT_SECONDS) waits for it to finish first.
+@app.route('/api/verify-visa/jobs', methods=['POST'])
+@require_token(token_verifier)
+def create_visa_job():
+    app.logger.info(f"Visa Service received request for {request.endpoint}")
+    expected, upload, filename, cache_key, error = accept_visa_upload()
+    if error:
+        return error
+    job, error = submit_ocr_job(expected, upload, filename, cache_key)
+    if error:
+        return error
+    if job.done.is_set(): # Answered from the OCR cache
+        return job_response(job, 200)
+    app.logger.info(f"Visa Service: OCR job {job.id} queued ({ocr_jobs.pending} pending)")
+    return job_response(job, 202)
 
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    app.logger.info(f"Attempting to save visa file to: {filepath}")
 
+@app.route('/api/verify-visa/jobs/<job_id>', methods=['GET'])
+@require_token(token_verifier)
+def get_visa_job(job_id):
+    job = ocr_jobs.get(job_id)
+    claims = g.get('token_claims')
+    if job is None or (claims is not None and job.owner is not None and job.owner != claims['employee_id']):
+        return jsonify({'status': 'error', 'message': 'Unknown or expired verification job'}), 404
     try:
-        file.save(filepath)
-        app.logger.info(f"Visa file saved successfully to: {filepath}")
-    except Exception as e:
-        app.logger.error(f"Error saving uploaded visa file {filename}: {str(e)}", exc_info=True)
-        return jsonify({'status': 'error', 'message': 'Failed to save uploaded file'}), 500
+        wait = min(float(request.args.get('wait', 0)), VISA_JOB_MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'wait must be a number of seconds'}), 400
+    if wait > 0:
+        job.done.wait(wait)
+    return job_response(job)
+
 
-    # --- Process the saved file ---
-    extracted_age = None
+# === Batch Visa Verification ===
+# Multipart form: 'visas' (one part per file) and 'manifest', a JSON list with one entry per file:
+#   [{"file": "<uploaded file name>", "name": ..., "email": ..., "company": ..., "destination": ..., "phone": ...}]
+# The response is streamed as newline-delimited JSON, one line per file in the order they finish,
+# then a summary line. OCR is spread over the worker pool, VISA_BATCH_MAX_IN_FLIGHT files at a time.
+@app.route('/api/verify-visa/batch', methods=['POST'])
+@require_token(token_verifier)
+def verify_visa_batch():
+    app.logger.info(f"Visa Service received request for {request.endpoint}")
+    files = request.files.getlist('visas')
     try:
-        app.logger.debug(f"Starting OCR processing for file: {filepath}")
-        text = "" # Initialize text
-        if filename.lower().endswith('.pdf'):
-             app.logger.warning("PDF processing might be basic. Requires pdf2image for full support.")
-             # Attempting basic OCR on PDF (might fail or be partial)
-             try:
-                 # Requires poppler-utils (apt-get install poppler-utils)
-                 # Requires pdf2image (pip install pdf2image)
-                 # from pdf2image import convert_from_path
-                 # images = convert_from_path(filepath)
-                 # full_text = ""
-                 # for i, page_image in enumerate(images):
-                 #    page_text = pytesseract.image_to_string(page_image)
-                 #    full_text += page_text + "\n--- Page Break ---\n"
-                 #    app.logger.debug(f"OCR processed PDF page {i+1}")
-                 # text = full_text
-
-                 # --- SIMPLER (less reliable) fallback for demo ---
-                 text = pytesseract.image_to_string(filepath) # May get metadata or fail
-
-             except pytesseract.TesseractError as ocr_err:
-                  app.logger.error(f"Tesseract failed on PDF {filepath}: {ocr_err}")
-                  text = ""
-             except Exception as pdf_err: # Catch potential pdf2image errors if used
-                  app.logger.error(f"Error processing PDF {filepath}: {pdf_err}")
-                  text = ""
-        else:
-             # Process as image
-             img = Image.open(filepath)
-             text = pytesseract.image_to_string(img)
-             img.close()
-
-        app.logger.debug("OCR processing completed.")
-        log_sample = text[:500].replace('\n', '\\n')
-        app.logger.debug(f"OCR Output sample: {log_sample}{'...' if len(text) > 500 else ''}")
-
-        # --- Perform verification checks (case-insensitive where appropriate) ---
-        name_lower = name.lower()
-        email_lower = email.lower()
-        company_lower = company.lower()
-        destination_lower = destination.lower()
-        text_lower = text.lower()
-
-        # --- Normalize phone numbers for comparison ---
-        normalized_phone_expected = normalize_phone(phone)
-        normalized_text = normalize_phone(text)
-        app.logger.debug(f"Normalized Expected Phone: '{normalized_phone_expected}'")
-        # Only log a sample of normalized text for privacy/brevity if long
-        normalized_text_sample = normalized_text[:100]
-        app.logger.debug(f"Normalized OCR Text Sample (first 100 digits): '{normalized_text_sample}{'...' if len(normalized_text) > 100 else ''}'")
-
-
-        # --- Updated Matches ---
-        name_match = name_lower in text_lower
-        email_match = email_lower in text_lower
-        company_match = company_lower in text_lower
-        destination_match = destination_lower in text_lower
-        # Check if the *normalized* expected phone number exists in the *normalized* OCR text
-        phone_match = normalized_phone_expected in normalized_text if normalized_phone_expected else False # Avoid checking empty string
-
-        extracted_age = extract_age_from_text(text)
-        # -------------------------------
-
-        app.logger.debug(f"Verification Checks: Name: {name_match}, Email: {email_match}, Company: {company_match}, Destination: {destination_match}, Phone: {phone_match}, Age Found: {extracted_age is not None}")
-
-        # --- Updated Verification logic including Phone check ---
-        if name_match and email_match and company_match and destination_match and phone_match and extracted_age is not None:
-            app.logger.info(f"Visa verification SUCCESS for Name='{name}', Dest='{destination}', Phone='{phone}', Age='{extracted_age}'")
-            # os.remove(filepath) # Optional cleanup
-            return jsonify({
-                'status': 'success',
-                'message': f'✅ Visa verified successfully (including destination, phone, and age). Extracted Age: {extracted_age}',
-                'extracted_age': extracted_age
-                }), 200
+        manifest = json.loads(request.form.get('manifest') or '[]')
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'manifest must be a JSON list'}), 400
+    if not isinstance(manifest, list) or not all(isinstance(entry, dict) and entry.get('file') for entry in manifest):
+        return jsonify({'status': 'error', 'message': 'manifest must be a list of objects with a "file" name'}), 400
+    if not files:
+        return jsonify({'status': 'error', 'message': 'Missing visa upload data: visas'}), 400
+    if len(files) > VISA_BATCH_MAX_FILES:
+        return jsonify({'status': 'error', 'message': f'At most {VISA_BATCH_MAX_FILES} visas per batch'}), 400
+    names = [file.filename for file in files]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        return jsonify({'status': 'error', 'message': f'Duplicate file names in batch: {", ".join(duplicates)}'}), 400
+
+    details = {entry['file']: entry for entry in manifest}
+    items = []
+    memory_left = VISA_BATCH_MEMORY_BYTES
+    for index, file in enumerate(files):
+        entry = details.get(file.filename)
+        expected = {field: (entry or {}).get(field) for field in ('name', 'email', 'company', 'destination', 'phone')}
+        item = {'index': index, 'file': file.filename, 'expected': expected}
+        missing = missing_visa_details(expected, file) if entry else ['manifest entry']
+        if missing:
+            item['error'] = (400, {'status': 'error', 'message': f'Missing visa upload data: {", ".join(missing)}'})
         else:
-            app.logger.warning(f"Visa verification FAILED for Name='{name}', Dest='{destination}', Phone='{phone}'")
-            # os.remove(filepath) # Optional cleanup
-            missing_details = []
-            if not name_match: missing_details.append("name")
-            if not email_match: missing_details.append("email")
-            if not company_match: missing_details.append("company")
-            if not destination_match: missing_details.append(f"destination ({destination})")
-            if not phone_match: missing_details.append("phone number") # Add phone failure reason
-            if extracted_age is None: missing_details.append("age (expected format 'Age: XX')")
-
-            message = f'❌ Visa details mismatch or required info not found. Check failed for: {", ".join(missing_details)}.' if missing_details else '❌ Visa details do not match required criteria.'
-            return jsonify({'status': 'error', 'message': message}), 403
-
-    except pytesseract.TesseractNotFoundError:
-        app.logger.error("Tesseract executable not found.")
-        return jsonify({'status': 'error', 'message': 'Server configuration error: OCR engine not found.'}), 500
-    except FileNotFoundError:
-         app.logger.error(f"File not found for processing: {filepath}")
-         return jsonify({'status': 'error', 'message': 'Server error: Could not find saved file.'}), 500
-    except Image.UnidentifiedImageError:
-        app.logger.error(f"Cannot identify image file format or file is corrupted: {filepath}")
-        return jsonify({'status': 'error', 'message': 'Uploaded file is not a valid or supported image format.'}), 400
-    except Exception as e:
-        app.logger.error(f"Error during OCR or verification process for {filepath}: {str(e)}", exc_info=True)
-        return jsonify({'status': 'error', 'message': 'OCR processing failed or other internal error occurred.'}), 500
+            item['filename'] = upload_filename(file)
+            # Read now: the request's files are closed once this view returns and streaming starts
+            item['upload'], error = receive_upload(file, item['filename'], max(0, min(VISA_UPLOAD_MEMORY_MAX_BYTES, memory_left)))
+            if error:
+                item['error'] = (error[1], error[0].get_json())
+            else:
+                item['cache_key'] = upload_cache_key(item['upload'], item['filename'])
+                if item['upload'].in_memory:
+                    memory_left -= item['upload'].size
+        items.append(item)
+    app.logger.info(f"Visa Service: batch of {len(items)} visas")
+    return Response(stream_with_context(stream_batch_results(items)), mimetype='application/x-ndjson')
+
+
+def batch_line(item, status, body, job=None):
+    line = {'index': item['index'], 'file': item['file'], 'result_status': status, 'result': body}
+    if job is not None:
+        line['job_id'] = job.id
+    return json.dumps(line) + '\n'
+
+
+def stream_batch_results(items):
+    """Yields one NDJSON line per item as its OCR finishes, then a summary line."""
+    completions = queue.Queue() # Finished jobs, from the pool's callback threads
+    waiting = deque(item for item in items if 'error' not in item)
+    in_flight = {} # job id -> item
+    counts = {'verified': 0, 'rejected': 0, 'errors': 0, 'pending': 0}
+
+    def count(status):
+        counts['verified' if status == 200 else 'rejected' if status == 403 else 'errors'] += 1
+
+    try:
+        for item in items:
+            if 'error' in item:
+                count(item['error'][0])
+                yield batch_line(item, *item['error'])
+
+        while waiting or in_flight:
+            while waiting and len(in_flight) < VISA_BATCH_MAX_IN_FLIGHT:
+                item = waiting[0]
+                try:
+                    job = start_ocr_job(item['expected'], item['upload'], item['filename'], item['cache_key'], completions.put)
+                except QueueFull as full:
+                    if in_flight:
+                        break # Our own jobs will free room; submit more as they finish
+                    waiting.popleft()
+                    item['upload'].discard()
+                    count(503)
+                    yield batch_line(item, 503, {'status': 'error', 'message': 'Visa verification is busy. Please retry shortly.', 'retry_after': full.retry_after})
+                    continue
+                except Exception as e:
+                    app.logger.error(f"Visa Service: could not queue batch file {item['file']}: {e}")
+                    waiting.popleft()
+                    count(500)
+                    yield batch_line(item, 500, {'status': 'error', 'message': 'OCR processing failed or other internal error occurred.'})
+                    continue
+                waiting.popleft()
+                in_flight[job.id] = item
+            if not in_flight:
+                continue
+            try:
+                job = completions.get(timeout=VISA_SYNC_TIMEOUT_SECONDS)
+            except queue.Empty:
+                # Nothing finished for too long: hand back what is running as jobs to poll
+                app.logger.warning(f"Visa Service: batch waited {VISA_SYNC_TIMEOUT_SECONDS}s without a result; returning {len(in_flight)} jobs to poll")
+                for job_id, item in in_flight.items():
+                    counts['pending'] += 1
+                    yield json.dumps({
+                        'index': item['index'], 'file': item['file'], 'job_id': job_id,
+                        'status': 'running', 'status_url': f'/api/verify-visa/jobs/{job_id}',
+                    }) + '\n'
+                for item in waiting:
+                    count(503)
+                    yield batch_line(item, 503, {'status': 'error', 'message': 'Not processed: the batch timed out. Please retry this file.'})
+                break
+            item = in_flight.pop(job.id)
+            log_verification(job, item['expected'])
+            count(job.result[0])
+            yield batch_line(item, job.result[0], job.result[1], job)
+
     finally:
-        # Cleanup: Consider moving to a background task if files need temporary retention
-        if os.path.exists(filepath):
-           try:
-               os.remove(filepath)
-               app.logger.debug(f"Cleaned up file: {filepath}")
-           except OSError as e:
-               app.logger.warning(f"Could not remove file {filepath} after processing: {e}")
+        # Also when the client goes away mid-stream: spooled uploads never submitted would stay behind
+        for item in waiting:
+            item['upload'].discard()
+
+    yield json.dumps({'summary': {'files': len(items), **counts}}) + '\n'
+
+
+# === Internal: Retained Documents (audits) ===
+@app.route('/api/internal/visa/documents/<digest>', methods=['GET'])
+def get_retained_document(digest):
+    """Streams a retained document (Range requests supported) by its SHA-256."""
+    path = document_store.path(digest)
+    if path is None:
+        return jsonify({'status': 'error', 'message': 'Unknown or expired document'}), 404
+    return send_file(path, mimetype=document_store.content_type(digest), conditional=True, max_age=0)
+
+
+@app.route('/api/internal/visa/documents/<digest>/metadata', methods=['GET'])
+def get_retained_document_metadata(digest):
+    meta = document_store.metadata(digest)
+    if meta is None:
+        return jsonify({'status': 'error', 'message': 'Unknown or expired document'}), 404
+    return jsonify(meta), 200
+
+
+# === Internal: OCR Queue Metrics ===
+@app.route('/api/internal/visa/metrics', methods=['GET'])
+def visa_metrics():
+    return jsonify({
+        'ocr_jobs': ocr_jobs.stats(),
+        'ocr_text_cache': ocr_text_cache.stats(),
+        'document_store': document_store.stats(),
+        'preprocess_stages': [stage for stage in STAGES if stage in PREPROCESS_CONFIG.stages],
+        'auth_tokens': token_verifier.stats(),
+    }), 200
 
 
 # Health check endpoint
@@ -0,0 +1,98 @@
+# services/visa_service/bench_field_matcher.py
+# Benchmark: the single-pass fuzzy field matcher against the previous exact substring checks.
+#
+# No Tesseract or database needed. From the services/visa_service directory:
+#     PYTHONPATH=.. python bench_field_matcher.py --chars 2000 20000 100000 --runs 50
+#
+# Each synthetic OCR output is random words with the traveller's details in it, either at
+# the start (the matcher can stop early) or at the end, and either clean or with one OCR-style
+# character error in each text field and one wrong phone digit (a different number, which
+# must not be found: noisy documents top out at 5/6 fields).
+import argparse
+import random
+import time
+
+from field_matcher import FieldMatcher
+from visa_ocr import extract_age_from_text, normalize_phone
+
+EXPECTED = {
+    'name': 'Priya Raghunathan',
+    'email': 'priya.raghunathan@acmetravel.com',
+    'company': 'Acme Travel Solutions',
+    'destination': 'Frankfurt',
+    'phone': '+91 98450 12345',
+}
+OCR_CONFUSIONS = {'l': '1', 'o': '0', 'a': 'o', 'e': 'c', 'n': 'm', 'r': 'n', 'i': 'l', 's': '5', '@': '©', '.': ','}
+
+
+def legacy_checks(text, expected):
+    """The checks as they were: five substring scans, a digit pass and the age regex."""
+    text_lower = text.lower()
+    normalized_phone_expected = normalize_phone(expected['phone'])
+    checks = {
+        'name': expected['name'].lower() in text_lower,
+        'email': expected['email'].lower() in text_lower,
+        'company': expected['company'].lower() in text_lower,
+        'destination': expected['destination'].lower() in text_lower,
+        'phone': normalized_phone_expected in normalize_phone(text) if normalized_phone_expected else False,
+    }
+    checks['age'] = extract_age_from_text(text) is not None
+    return checks
+
+
+def garble(value, rng):
+    """One OCR-style substitution."""
+    positions = [i for i, char in enumerate(value) if char.lower() in OCR_CONFUSIONS]
+    i = rng.choice(positions)
+    return value[:i] + OCR_CONFUSIONS[value[i].lower()] + value[i + 1:]
+
+
+def document(chars, rng, at_end, noisy):
+    words = ['visa', 'entry', 'valid', 'until', 'issued', 'passport', 'the', 'of', 'type', 'schengen', 'no', 'remarks']
+    filler = []
+    length = 0
+    while length < chars:
+        word = rng.choice(words) if rng.random() < 0.8 else str(rng.randint(0, 99999))
+        filler.append(word)
+        length += len(word) + 1
+    fields = [EXPECTED['name'], EXPECTED['email'], EXPECTED['company'], EXPECTED['destination']]
+    phone = '+91 98450 12345'
+    if noisy:
+        fields = [garble(value, rng) for value in fields]
+        phone = '+91 98450 12845'
+    details = f"Name: {fields[0]}\nEmail: {fields[1]}\nEmployer: {fields[2]}\nDestination: {fields[3]}\nPhone: {phone}\nAge: 34\n"
+    body = ' '.join(filler)
+    return body + '\n' + details if at_end else details + body
+
+
+def timed(function, texts, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        for text in texts:
+            result = function(text)
+    return (time.perf_counter() - started) / (runs * len(texts)), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chars', type=int, nargs='+', default=[2000, 20000, 100000])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--documents', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    for chars in args.chars:
+        for at_end in (False, True):
+            for noisy in (False, True):
+                texts = [document(chars, rng, at_end, noisy) for _ in range(args.documents)]
+                legacy_time, legacy = timed(lambda text: legacy_checks(text, EXPECTED), texts, args.runs)
+                matcher_time, matches = timed(lambda text: FieldMatcher(EXPECTED).match(text), texts, args.runs)
+                checks = matches.checks
+                label = f"{chars:>7} chars, fields at {'end' if at_end else 'start'}, {'noisy' if noisy else 'clean'}"
+                print(f"{label:>40}: legacy {legacy_time * 1e3:8.3f} ms ({sum(legacy.values())}/6 fields)"
+                      f"  matcher {matcher_time * 1e3:8.3f} ms ({sum(checks.values())}/6 fields,"
+                      f" min confidence {min(matches.confidence.values()):.2f})")
+
+
+if __name__ == '__main__':
+    main()
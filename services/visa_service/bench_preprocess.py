@@ -0,0 +1,85 @@
+# services/visa_service/bench_preprocess.py
+# Benchmark: OCR latency and field-match accuracy with and without each preprocessing stage.
+#
+# Needs Tesseract installed. From the services/visa_service directory:
+#     PYTHONPATH=.. python bench_preprocess.py --corpus ../../backend/visa_uploads --labels labels.json
+#
+# labels.json maps file names to the traveller's details the visa should contain,
+# in the shape check_visa_text() expects:
+#     {"scan1.jpg": {"name": "...", "email": "...", "company": "...", "destination": "...", "phone": "..."}}
+# Without labels only the 'Age: XX' check is scored (it needs no expected values).
+#
+# Configurations: no preprocessing, the full pipeline (all stages, deskew included),
+# and the full pipeline minus one stage at a time.
+import argparse
+import json
+import os
+import statistics
+import time
+
+import pytesseract
+
+from preprocess import STAGES, PreprocessConfig, open_image, preprocess
+from visa_ocr import check_visa_text, extract_age_from_text
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def score(text, expected):
+    """Returns (fields matched, fields checked) for one OCR result."""
+    if expected is None:
+        return (1 if extract_age_from_text(text) is not None else 0), 1
+    _, _, checks = check_visa_text(text, expected)
+    return sum(checks.values()), len(checks)
+
+
+def run(label, config, files, labels):
+    preprocess_times, ocr_times = [], []
+    matched = checked = 0
+    for path in files:
+        started = time.perf_counter()
+        with open_image(path, config) as img:
+            prepared = preprocess(img, config)
+            prepared.load()
+        preprocessed = time.perf_counter()
+        text = pytesseract.image_to_string(prepared)
+        finished = time.perf_counter()
+        preprocess_times.append(preprocessed - started)
+        ocr_times.append(finished - preprocessed)
+        hits, total = score(text, labels.get(os.path.basename(path)) if labels is not None else None)
+        matched += hits
+        checked += total
+    totals = [p + o for p, o in zip(preprocess_times, ocr_times)]
+    print(f"{label:>18}: total mean {statistics.mean(totals):6.2f}s  median {statistics.median(totals):6.2f}s"
+          f"  (preprocess {statistics.mean(preprocess_times):5.2f}s, ocr {statistics.mean(ocr_times):6.2f}s)"
+          f"  fields matched {matched}/{checked} ({matched / checked:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', default=os.path.join('..', '..', 'backend', 'visa_uploads'))
+    parser.add_argument('--labels', help='JSON file: file name -> expected traveller details')
+    parser.add_argument('--limit', type=int, default=0, help='Only the first N files (0 = all)')
+    args = parser.parse_args()
+
+    files = sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus) if name.lower().endswith(IMAGE_EXTENSIONS))
+    labels = None
+    if args.labels:
+        with open(args.labels, encoding='utf-8') as labels_file:
+            labels = json.load(labels_file)
+        files = [path for path in files if os.path.basename(path) in labels]
+    if args.limit:
+        files = files[:args.limit]
+    if not files:
+        raise SystemExit(f"No labelled images found in {args.corpus}")
+    print(f"{len(files)} images from {args.corpus}")
+
+    base = PreprocessConfig.from_env()
+    run('none', base.with_stages([]), files, labels)
+    run('all stages', base.with_stages(STAGES), files, labels)
+    for stage in STAGES:
+        run(f"all but {stage}", base.with_stages([s for s in STAGES if s != stage]), files, labels)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+# services/visa_service/document_store.py
+# Retained visa documents, stored by content hash in sharded directories:
+#     <root>/objects/ab/cd/abcd...ef        the bytes (file name = SHA-256 of the contents)
+#     <root>/objects/ab/cd/abcd...ef.json   who uploaded it, when, under which names, with what result
+# Identical uploads are stored once; each retention adds a record to the metadata and renews the
+# document's expiry (the blob's mtime). A sweep thread deletes documents not retained for `ttl` seconds.
+#
+# Importing the old flat upload folder (run from the services/visa_service directory):
+#     PYTHONPATH=.. python document_store.py import /app/visa_uploads --root /app/visa_uploads/store
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+import time
+
+from uploads import Upload
+
+DIGEST = re.compile(r'^[0-9a-f]{64}$')
+MAX_RECORDS = 50 # Upload records kept per document (the newest)
+TMP_MAX_AGE_SECONDS = 3600 # Leftovers of interrupted writes are removed by the sweep after this
+
+
+class DocumentStore:
+    """
+    Content-addressed document storage. `put()` takes an uploads.Upload (whose SHA-256
+    is already known) and returns its digest; `open()` / `path()` give streaming access
+    for audits; `sweep()` expires documents last retained more than `ttl` seconds ago.
+    """
+
+    def __init__(self, root, ttl, logger, sweep_interval=3600):
+        self.root = root
+        self.ttl = ttl
+        self.logger = logger
+        self.sweep_interval = sweep_interval
+        self._objects = os.path.join(root, 'objects')
+        self._tmp = os.path.join(root, 'tmp') # Same filesystem as objects/, so os.replace is atomic
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._tmp, exist_ok=True)
+        self._lock = threading.Lock() # Serializes metadata read-modify-write
+        self._thread = None
+        self.stored = 0
+        self.deduplicated = 0
+        self.expired = 0
+        self.sweeps = 0
+        self.last_sweep_seconds = None
+
+    def _blob_path(self, digest):
+        return os.path.join(self._objects, digest[:2], digest[2:4], digest)
+
+    def path(self, digest):
+        """Path of a stored document, or None (also for anything that isn't a digest)."""
+        if not DIGEST.match(digest or ''):
+            return None
+        path = self._blob_path(digest)
+        return path if os.path.exists(path) else None
+
+    def open(self, digest):
+        path = self.path(digest)
+        if path is None:
+            raise FileNotFoundError(digest)
+        return open(path, 'rb')
+
+    def metadata(self, digest):
+        path = self.path(digest)
+        if path is None:
+            return None
+        try:
+            with open(f"{path}.json", 'r', encoding='utf-8') as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return {'sha256': digest, 'size': os.path.getsize(path), 'uploads': []}
+
+    def content_type(self, digest):
+        """Guessed from the most recent upload's file name."""
+        meta = self.metadata(digest) or {}
+        uploads = meta.get('uploads') or [{}]
+        return mimetypes.guess_type(uploads[-1].get('filename') or '')[0] or 'application/octet-stream'
+
+    def put(self, upload, filename, status=None, owner=None):
+        """Stores the upload (taking over a spooled file) unless already present; returns the digest."""
+        digest = upload.sha256
+        blob = self._blob_path(digest)
+        record = {'filename': filename, 'stored_at': int(time.time()), 'status': status, 'owner': owner}
+        with self._lock:
+            if os.path.exists(blob):
+                os.utime(blob) # Renews the expiry
+                self.deduplicated += 1
+                upload.discard()
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                handle, tmp_path = tempfile.mkstemp(dir=self._tmp)
+                os.close(handle)
+                try:
+                    upload.move_to(tmp_path)
+                    os.replace(tmp_path, blob) # Readers never see a partial document
+                    os.utime(blob) # Expiry counts from now, not from the spooled file's age
+                except BaseException:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(tmp_path)
+                    raise
+                self.stored += 1
+            self._add_record(blob, digest, upload.size, record)
+        return digest
+
+    def _add_record(self, blob, digest, size, record):
+        meta_path = f"{blob}.json"
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            meta = {'sha256': digest, 'size': size, 'first_stored_at': record['stored_at'], 'uploads': []}
+        meta['uploads'] = (meta.get('uploads') or [])[-(MAX_RECORDS - 1):] + [record]
+        meta['last_stored_at'] = record['stored_at']
+        tmp_path = os.path.join(self._tmp, f"{digest}.{threading.get_ident()}.json")
+        with open(tmp_path, 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(tmp_path, meta_path)
+
+    def sweep(self, now=None):
+        """Deletes expired documents and stale temporary files; returns how many documents went."""
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        removed = 0
+        for shard in _subdirectories(self._objects):
+            for subshard in _subdirectories(shard):
+                with os.scandir(subshard) as entries:
+                    for entry in entries:
+                        if entry.name.endswith('.json') or not entry.is_file():
+                            continue
+                        try:
+                            expired = now - entry.stat().st_mtime > self.ttl
+                        except FileNotFoundError:
+                            continue
+                        if expired and self._remove(entry.path, now):
+                            removed += 1
+        with os.scandir(self._tmp) as entries:
+            for entry in entries:
+                with contextlib.suppress(FileNotFoundError):
+                    if now - entry.stat().st_mtime > TMP_MAX_AGE_SECONDS:
+                        os.remove(entry.path)
+        with self._lock:
+            self.expired += removed
+            self.sweeps += 1
+            self.last_sweep_seconds = round(time.perf_counter() - started, 3)
+        if removed:
+            self.logger.info(f"Document store: expired {removed} documents")
+        return removed
+
+    def _remove(self, blob, now):
+        with self._lock:
+            # Re-checked under the lock: put() may have just renewed it
+            try:
+                if now - os.path.getmtime(blob) <= self.ttl:
+                    return False
+                os.remove(blob)
+            except FileNotFoundError:
+                return False
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(f"{blob}.json")
+        return True
+
+    def start_sweeper(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='visa-document-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                self.logger.warning(f"Document store: sweep failed, will retry: {e}")
+            time.sleep(self.sweep_interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'stored': self.stored,
+                'deduplicated': self.deduplicated,
+                'expired': self.expired,
+                'sweeps': self.sweeps,
+                'last_sweep_seconds': self.last_sweep_seconds,
+                'ttl_seconds': self.ttl,
+            }
+
+
+def _subdirectories(path):
+    with os.scandir(path) as entries:
+        return [entry.path for entry in entries if entry.is_dir()]
+
+
+def import_flat_folder(store, folder):
+    """Moves the files of an old flat upload folder into the store; returns (imported, duplicates)."""
+    imported = duplicates = 0
+    for entry in list(os.scandir(folder)):
+        if not entry.is_file():
+            continue
+        digest = hashlib.sha256()
+        with open(entry.path, 'rb') as document:
+            for chunk in iter(lambda: document.read(64 * 1024), b''):
+                digest.update(chunk)
+        # Spooled-file Upload: put() moves it into place, or deletes it when already stored
+        upload = Upload(None, entry.path, entry.stat().st_size, digest.hexdigest())
+        existed = store.path(upload.sha256) is not None
+        store.put(upload, entry.name, status='imported')
+        if existed:
+            duplicates += 1
+        else:
+            imported += 1
+    return imported, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintenance for the retained visa document store')
+    parser.add_argument('command', choices=('import', 'sweep'))
+    parser.add_argument('folder', nargs='?', help='Flat upload folder to import')
+    parser.add_argument('--root', default=os.environ.get('VISA_DOCUMENT_STORE_DIR', '/app/visa_uploads/store'))
+    parser.add_argument('--retention-days', type=float, default=float(os.environ.get('VISA_DOCUMENT_RETENTION_DAYS', '30')))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = DocumentStore(args.root, args.retention_days * 86400, logging.getLogger('document_store'))
+    if args.command == 'import':
+        if not args.folder:
+            parser.error('import needs the folder to import')
+        imported, duplicates = import_flat_folder(store, args.folder)
+        print(f"Imported {imported} documents ({duplicates} duplicates of stored ones removed)")
+    else:
+        print(f"Expired {store.sweep()} documents")
+
+
+if __name__ == '__main__':
+    main()
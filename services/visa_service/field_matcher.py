@@ -0,0 +1,201 @@
+# services/visa_service/field_matcher.py
+# Finds the traveller's details in OCR text in one pass, tolerating a few OCR character errors.
+#
+# All patterns are concatenated into one bit vector (a Python int) and matched with the
+# bit-parallel shift-and automaton, extended to k errors (substitution, insertion, deletion)
+# as in Wu & Manber's agrep: row d holds the pattern prefixes that match the text read so far
+# with at most d errors. Each text character costs a few integer operations per row,
+# however many fields there are.
+import re
+
+WHITESPACE = frozenset(' \t\n\r\f\v')
+DIGITS = frozenset('0123456789')
+AGE_LABEL = 'age:'
+AGE_VALUE = re.compile(r'\s*(\d+)\b')
+
+
+def normalize_pattern(value):
+    """Lower-cased with whitespace runs collapsed, as the text is read."""
+    return ' '.join(value.lower().split())
+
+
+def is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def tolerance(pattern, max_errors, chars_per_error):
+    """Errors allowed for one pattern: one per `chars_per_error` characters, at most `max_errors`."""
+    if chars_per_error <= 0:
+        return 0
+    return min(max_errors, len(pattern) // chars_per_error)
+
+
+class Automaton:
+    """
+    Shift-and rows for several patterns at once. Bit `offset + j` of row d is set when
+    the first j + 1 characters of the pattern at `offset` end at the current text
+    position with at most d errors. Matches may start anywhere in the text; row d
+    also always holds the first 1..d characters of each pattern, matched by deleting
+    them, so leading characters can be missing even at the very start of the text.
+    """
+
+    def __init__(self, patterns):
+        # patterns: {name: (pattern, allowed errors)}; empty patterns can never match
+        self.masks = {}
+        self.starts = 0
+        self.end_bits = [] # (end bit, name, allowed errors)
+        offset = 0
+        for name, (pattern, allowed) in patterns.items():
+            if not pattern:
+                continue
+            for j, char in enumerate(pattern):
+                self.masks[char] = self.masks.get(char, 0) | (1 << (offset + j))
+            self.starts |= 1 << offset
+            self.end_bits.append((1 << (offset + len(pattern) - 1), name, allowed))
+            offset += len(pattern)
+        self.all_bits = (1 << offset) - 1
+        self.errors = max((allowed for _, _, allowed in self.end_bits), default=0)
+        # Row d only reports patterns that allow d errors
+        self.end_masks = [
+            sum(bit for bit, _, allowed in self.end_bits if allowed >= d) for d in range(self.errors + 1)
+        ]
+        # Row d: the first 1..d characters of each pattern, deleted before any text (never the whole pattern)
+        self.deleted = [0] * (self.errors + 1)
+        offset = 0
+        for pattern, _ in patterns.values():
+            for d in range(1, self.errors + 1):
+                for k in range(min(d, len(pattern) - 1)):
+                    self.deleted[d] |= 1 << (offset + k)
+            offset += len(pattern)
+        self.rows = list(self.deleted)
+
+    def step(self, char):
+        """Advances every row by one text character; returns the end bits that matched."""
+        mask = self.masks.get(char, 0)
+        starts = self.starts
+        all_bits = self.all_bits
+        rows = self.rows
+        end_masks = self.end_masks
+        deleted = self.deleted
+        above_old = rows[0]
+        above = ((above_old << 1) | starts) & mask
+        rows[0] = above
+        hits = above & end_masks[0]
+        for d in range(1, len(rows)):
+            old = rows[d]
+            # match | insertion (text char extra) | substitution and deletion (pattern char skipped)
+            # | leading pattern characters deleted
+            row = ((((old << 1) | starts) & mask) | above_old | ((((above_old | above) << 1) | starts) & all_bits)
+                   | deleted[d])
+            rows[d] = row
+            hits |= row & end_masks[d]
+            above_old, above = old, row
+        return hits
+
+    def errors_for(self, bit):
+        """Fewest errors with which the pattern ending at `bit` matches at this position."""
+        for d, row in enumerate(self.rows):
+            if row & bit:
+                return d
+        return None
+
+
+class FieldMatches:
+    __slots__ = ('errors', 'lengths', 'age')
+
+    def __init__(self, errors, lengths, age):
+        self.errors = errors # field -> fewest errors found, or None when not found
+        self.lengths = lengths # field -> pattern length
+        self.age = age # First 'Age: XX' value, or None
+
+    @property
+    def checks(self):
+        checks = {field: errors is not None for field, errors in self.errors.items()}
+        checks['age'] = self.age is not None
+        return checks
+
+    @property
+    def confidence(self):
+        """1.0 for an exact match, less for each error; 0.0 when not found."""
+        scores = {
+            field: round(1 - errors / self.lengths[field], 3) if errors is not None else 0.0
+            for field, errors in self.errors.items()
+        }
+        scores['age'] = 1.0 if self.age is not None else 0.0
+        return scores
+
+
+class FieldMatcher:
+    """
+    Matches the expected details ({'name', 'email', 'company', 'destination', 'phone'})
+    against OCR text. Text fields are compared case-insensitively with whitespace runs
+    collapsed; the phone against the digits of the text only (like normalize_phone), exactly
+    unless `max_phone_errors` says otherwise. 'Age: XX' is read exactly, as extract_age_from_text does.
+    The scan stops early once every field has matched exactly and the age is known.
+    """
+
+    TEXT_FIELDS = ('name', 'email', 'company', 'destination')
+
+    def __init__(self, expected, max_errors=2, chars_per_error=6, max_phone_errors=0):
+        patterns = {}
+        for field in self.TEXT_FIELDS:
+            pattern = normalize_pattern(expected.get(field) or '')
+            patterns[field] = (pattern, tolerance(pattern, max_errors, chars_per_error))
+        patterns['age'] = (AGE_LABEL, 0)
+        phone = re.sub(r'\D', '', expected.get('phone') or '')
+        self.lengths = {field: len(pattern) for field, (pattern, _) in patterns.items()}
+        self.lengths['phone'] = len(phone)
+        self.text = Automaton(patterns)
+        self.phone = Automaton({'phone': (phone, tolerance(phone, max_phone_errors, chars_per_error))})
+
+    def match(self, text):
+        text_automaton, phone_automaton = self.text, self.phone
+        text_automaton.rows = list(text_automaton.deleted)
+        phone_automaton.rows = list(phone_automaton.deleted)
+        errors = {field: None for field in self.TEXT_FIELDS + ('phone',)}
+        exact = 0 # Fields matched without errors
+        needed = sum(1 for field in errors if self.lengths[field])
+        age = None
+        lowered = text.lower()
+        previous_space = True # Also drops leading whitespace
+        for i, char in enumerate(lowered):
+            if char in WHITESPACE:
+                if previous_space:
+                    continue
+                previous_space = True
+                char = ' '
+            else:
+                previous_space = False
+            hits = text_automaton.step(char)
+            if char in DIGITS:
+                hits_phone = phone_automaton.step(char)
+                if hits_phone:
+                    exact += self._record(phone_automaton, hits_phone, errors)
+            if hits:
+                for bit, field, _ in text_automaton.end_bits:
+                    if not hits & bit:
+                        continue
+                    if field == 'age':
+                        if age is None and (i < len(AGE_LABEL) or not is_word_char(lowered[i - len(AGE_LABEL)])):
+                            value = AGE_VALUE.match(lowered, i + 1)
+                            if value:
+                                age = int(value.group(1))
+                    else:
+                        exact += self._record_one(text_automaton, bit, field, errors)
+            if exact == needed and age is not None:
+                break
+        return FieldMatches(errors, self.lengths, age)
+
+    def _record(self, automaton, hits, errors):
+        return sum(self._record_one(automaton, bit, field, errors)
+                   for bit, field, _ in automaton.end_bits if hits & bit)
+
+    @staticmethod
+    def _record_one(automaton, bit, field, errors):
+        """Keeps the best match per field; returns 1 when the field has just matched exactly."""
+        found = automaton.errors_for(bit)
+        best = errors[field]
+        if best is None or found < best:
+            errors[field] = found
+            return 1 if found == 0 else 0
+        return 0
@@ -0,0 +1,136 @@
+# services/visa_service/ocr_cache.py
+# OCR text cache keyed by the SHA-256 of the uploaded bytes: in memory, backed by a bounded directory.
+import os
+import threading
+import time
+
+from common.ttl_cache import TTLCache
+
+
+class OcrTextCache:
+    """
+    Maps upload hash -> (OCR text, complete, OCR seconds). Lookups try memory, then disk
+    (promoting disk hits into memory). Disk entries are one file per hash, kept
+    for `ttl` seconds and trimmed oldest-first (by last use) to `max_disk_entries`.
+    The OCR time stored with each entry is what a hit saves. `complete` is False
+    for PDF text that stopped early (pdf_ocr.py): it answers the traveller it was
+    read for, but may lack fields another traveller's check would need.
+    """
+
+    def __init__(self, directory, max_memory_entries, max_disk_entries, ttl, logger):
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.logger = logger
+        self._memory = TTLCache(max_memory_entries, ttl)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.disk_errors = 0
+        os.makedirs(directory, exist_ok=True)
+        self._disk_entries = sum(1 for name in os.listdir(directory) if name.endswith('.txt'))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def get(self, key):
+        """Returns (OCR text, complete), or None."""
+        entry = self._memory.get(key)
+        source = 'memory'
+        if entry is None:
+            entry = self._read_disk(key)
+            source = 'disk'
+            if entry is not None:
+                self._memory.set(key, entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if source == 'memory':
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            self.seconds_saved += entry[2]
+        return entry[0], entry[1]
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                self._remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as cache_file:
+                header, _, text = cache_file.read().partition('\n')
+            seconds, complete = header.split()
+            os.utime(path) # Last use, for trimming
+            return text, complete == '1', float(seconds)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.disk_errors += 1
+            self.logger.warning(f"OCR cache: unreadable entry {path}: {e}")
+            return None
+
+    def put(self, key, text, seconds, complete=True):
+        self._memory.set(key, (text, complete, seconds))
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            existed = os.path.exists(path)
+            with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+                cache_file.write(f"{seconds:.6f} {int(complete)}\n{text}")
+            os.replace(tmp_path, path) # Readers never see a partial entry
+        except OSError as e:
+            self.disk_errors += 1
+            self.logger.warning(f"OCR cache: could not write {path}: {e}")
+            return
+        with self._lock:
+            if not existed:
+                self._disk_entries += 1
+            over_limit = self._disk_entries > self.max_disk_entries
+        if over_limit:
+            self._trim()
+
+    def _trim(self):
+        """Drops the least recently used files down to 90% of the limit, so trimming is occasional."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.txt'):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        entries.sort()
+        keep = int(self.max_disk_entries * 0.9)
+        for _, path in entries[:max(0, len(entries) - keep)]:
+            self._remove(path)
+        with self._lock:
+            self._disk_entries = min(len(entries), keep)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._disk_entries = max(0, self._disk_entries - 1)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'ocr_seconds_saved': round(self.seconds_saved, 3),
+                'memory': self._memory.stats(),
+                'disk_entries': self._disk_entries,
+                'max_disk_entries': self.max_disk_entries,
+                'disk_errors': self.disk_errors,
+            }
@@ -0,0 +1,189 @@
+# services/visa_service/ocr_jobs.py
+# Bounded OCR job queue backed by a process pool, so OCR never runs on (or blocks) the web threads.
+import concurrent.futures
+import multiprocessing
+import secrets
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+
+
+class QueueFull(Exception):
+    """More than `max_pending` jobs are waiting; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__('OCR queue is full')
+        self.retry_after = retry_after
+
+
+def _timed_call(function, args):
+    """Runs in the worker process; returns (seconds spent, result)."""
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+class OcrJob:
+    __slots__ = ('id', 'owner', 'created_at', 'finished_at', 'seconds', 'result', 'future', 'executor', 'done')
+
+    def __init__(self, owner):
+        self.id = secrets.token_urlsafe(16)
+        self.owner = owner
+        self.created_at = time.time()
+        self.finished_at = None
+        self.seconds = None # Worker time, once done
+        self.result = None # Whatever the job function returned, once done
+        self.future = None
+        self.executor = None # The pool the job was submitted to
+        self.done = threading.Event()
+
+    @property
+    def state(self):
+        if self.done.is_set():
+            return DONE
+        return RUNNING if self.future is not None and self.future.running() else QUEUED
+
+
+class OcrJobQueue:
+    """
+    Submits `function(*args)` to `workers` processes. At most `max_pending`
+    jobs may be queued or running; beyond that submit() raises QueueFull with
+    a Retry-After estimate from the recent per-job OCR time. Finished jobs are
+    kept for `result_ttl` seconds so clients can poll for them.
+
+    Workers are started with 'spawn' (the web server is multi-threaded), so
+    `function` must live in a module that does not import the Flask app.
+    """
+
+    def __init__(self, function, workers, max_pending, result_ttl, logger):
+        self.function = function
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.logger = logger
+        self._context = multiprocessing.get_context('spawn')
+        self._executor = self._new_executor()
+        self._jobs = {} # job id -> OcrJob, oldest first
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.pool_restarts = 0
+        self.avg_seconds = None # Moving average of worker time per job
+
+    def _new_executor(self):
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context)
+
+    def submit(self, args, owner=None, on_done=None):
+        """Queues a job and returns it; `on_done(job)` runs once the job has finished either way."""
+        with self._lock:
+            self._purge_expired()
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(self._retry_after())
+            self.pending += 1
+            job = OcrJob(owner)
+            self._jobs[job.id] = job
+            executor = self._executor
+        try:
+            try:
+                job.future = executor.submit(_timed_call, self.function, args)
+            except BrokenProcessPool:
+                executor = self._restart_pool(executor)
+                job.future = executor.submit(_timed_call, self.function, args)
+            job.executor = executor
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+                self._jobs.pop(job.id, None)
+            if on_done:
+                on_done(job)
+            raise
+        job.future.add_done_callback(lambda future: self._finish(job, future, on_done))
+        return job
+
+    def add_finished(self, result, owner=None):
+        """Records a job answered without the pool (e.g. from a cache) so it can be polled like any other."""
+        job = OcrJob(owner)
+        job.result = result
+        job.finished_at = time.time()
+        job.done.set()
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.id] = job
+        return job
+
+    def _restart_pool(self, broken):
+        """
+        A worker died (e.g. killed for memory); replaces the pool once per breakage.
+        Every job still on `broken` fails too, but only the first replaces it.
+        """
+        with self._lock:
+            replaced = self._executor is broken
+            if replaced:
+                self.logger.warning("OCR worker pool broke; starting a new one")
+                self._executor = self._new_executor()
+                self.pool_restarts += 1
+            executor = self._executor
+        if replaced:
+            broken.shutdown(wait=False) # Its manager thread and remaining workers exit
+        return executor
+
+    def _finish(self, job, future, on_done):
+        try:
+            seconds, result = future.result()
+        except Exception as e:
+            self.logger.error(f"OCR job {job.id} failed in the worker pool: {e}")
+            seconds, result = None, (500, {'status': 'error', 'message': 'OCR processing failed or other internal error occurred.'}, None, None, False)
+            if isinstance(e, BrokenProcessPool):
+                self._restart_pool(job.executor)
+        job.result = result
+        job.seconds = seconds
+        job.finished_at = time.time()
+        with self._lock:
+            self.pending -= 1
+            if result[0] >= 500:
+                self.failed += 1
+            else:
+                self.completed += 1
+            if seconds is not None:
+                self.avg_seconds = seconds if self.avg_seconds is None else 0.8 * self.avg_seconds + 0.2 * seconds
+        if on_done:
+            try:
+                on_done(job)
+            except Exception as e:
+                self.logger.warning(f"OCR job {job.id} completion hook failed: {e}")
+        job.done.set()
+
+    def _retry_after(self):
+        per_job = self.avg_seconds or 2.0
+        return max(1, int(per_job * self.pending / self.workers + 0.999))
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'retained_jobs': len(self._jobs),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'pool_restarts': self.pool_restarts,
+                'avg_ocr_seconds': round(self.avg_seconds, 3) if self.avg_seconds is not None else None,
+            }
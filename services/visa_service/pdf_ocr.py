@@ -0,0 +1,53 @@
+# services/visa_service/pdf_ocr.py
+# Multi-page PDF OCR: pages are rasterized (poppler's pdftoppm) and read by Tesseract in parallel,
+# stopping once the text read so far is enough. Runs inside an OCR worker process (see visa_ocr.py).
+#
+# Rasterizing and Tesseract are both external programs, so a thread per page inside the worker is
+# enough for the pages to use separate CPU cores; a nested process pool would gain nothing.
+import concurrent.futures
+
+import pytesseract
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from preprocess import preprocess
+
+
+def page_count(filepath):
+    return int(pdfinfo_from_path(filepath)['Pages'])
+
+
+def ocr_page(filepath, page, config):
+    """Rasterizes one page (1-based) at the target DPI and returns its OCR text."""
+    images = convert_from_path(filepath, dpi=config.target_dpi, first_page=page, last_page=page, grayscale=True)
+    if not images:
+        return ""
+    # Rendered at a known DPI, upright: resizing or EXIF handling would only cost time
+    page_config = config.with_stages(config.stages - {'exif', 'downscale'})
+    with images[0] as img:
+        return pytesseract.image_to_string(preprocess(img, page_config))
+
+
+def ocr_pdf(filepath, config, page_threads, max_pages, is_enough=None):
+    """
+    Returns (text, complete). Pages are OCRed up to `page_threads` at a time, in page
+    order. After each page, `is_enough(text so far)` decides whether to stop: pages not
+    yet started are cancelled and pages in progress are left to finish unread. `complete`
+    is False when pages were skipped that way, or because the PDF has more than `max_pages`.
+    """
+    pages = page_count(filepath)
+    to_read = min(pages, max_pages)
+    texts = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(page_threads, to_read)))
+    try:
+        futures = {executor.submit(ocr_page, filepath, page, config): page for page in range(1, to_read + 1)}
+        for future in concurrent.futures.as_completed(futures):
+            texts[futures[future]] = future.result()
+            if len(texts) < to_read and is_enough is not None and is_enough(join_pages(texts)):
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return join_pages(texts), len(texts) == pages
+
+
+def join_pages(texts):
+    return "\n".join(texts[page] for page in sorted(texts))
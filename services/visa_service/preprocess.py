@@ -0,0 +1,150 @@
+# services/visa_service/preprocess.py
+# Image preprocessing before OCR. Runs in the OCR worker processes (imported by visa_ocr.py).
+#
+# Stages, applied in this order when enabled (VISA_OCR_PREPROCESS, comma separated):
+#   exif       apply the EXIF orientation (phone photos are often stored sideways)
+#   grayscale  one channel instead of three (or four, for screenshots)
+#   downscale  shrink so the long side is at most target_dpi * document_inches pixels;
+#              JPEGs are decoded at reduced size directly (Image.draft), skipping most IDCT work
+#   deskew     rotate by the angle that best aligns text lines (projection profile, +-max_degrees)
+#   binarize   adaptive (local mean) threshold, robust to the uneven lighting of photos
+import hashlib
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+STAGES = ('exif', 'grayscale', 'downscale', 'deskew', 'binarize')
+DEFAULT_STAGES = 'exif,downscale,grayscale,binarize'
+
+
+class PreprocessConfig:
+
+    def __init__(self, stages, target_dpi=300, document_inches=6.0, binarize_window=0,
+                 binarize_threshold=0.15, deskew_max_degrees=5.0, deskew_step_degrees=0.5):
+        unknown = [stage for stage in stages if stage not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown preprocessing stage(s): {', '.join(unknown)} (expected {', '.join(STAGES)})")
+        self.stages = frozenset(stages)
+        self.target_dpi = target_dpi
+        # The DPI in the file is unreliable (a 4080 px phone photo claims 150 dpi), so the target size
+        # is derived from the physical size of the document instead.
+        self.document_inches = document_inches
+        self.binarize_window = binarize_window # Pixels; 0 = 1/8 of the image width
+        self.binarize_threshold = binarize_threshold # Darker than (1 - t) x local mean -> text
+        self.deskew_max_degrees = deskew_max_degrees
+        self.deskew_step_degrees = deskew_step_degrees
+
+    @classmethod
+    def from_env(cls):
+        spec = os.environ.get('VISA_OCR_PREPROCESS', DEFAULT_STAGES)
+        stages = [] if spec.strip().lower() == 'none' else [stage.strip() for stage in spec.split(',') if stage.strip()]
+        return cls(
+            stages,
+            target_dpi=int(os.environ.get('VISA_OCR_TARGET_DPI', '300')),
+            document_inches=float(os.environ.get('VISA_OCR_DOCUMENT_INCHES', '6')),
+            binarize_window=int(os.environ.get('VISA_OCR_BINARIZE_WINDOW', '0')),
+            binarize_threshold=float(os.environ.get('VISA_OCR_BINARIZE_THRESHOLD', '0.15')),
+            deskew_max_degrees=float(os.environ.get('VISA_OCR_DESKEW_MAX_DEGREES', '5')),
+        )
+
+    def with_stages(self, stages):
+        return PreprocessConfig(
+            stages, self.target_dpi, self.document_inches, self.binarize_window,
+            self.binarize_threshold, self.deskew_max_degrees, self.deskew_step_degrees,
+        )
+
+    @property
+    def max_side(self):
+        return int(self.target_dpi * self.document_inches)
+
+    def signature(self):
+        """Short digest of everything that changes the output (part of the OCR cache key)."""
+        parts = (sorted(self.stages), self.target_dpi, self.document_inches, self.binarize_window,
+                 self.binarize_threshold, self.deskew_max_degrees, self.deskew_step_degrees)
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:8]
+
+
+def open_image(source, config):
+    """Opens an upload (path or binary file), letting the JPEG decoder downscale while decoding when possible."""
+    img = Image.open(source)
+    if 'downscale' in config.stages and img.format == 'JPEG':
+        ratio = config.max_side / max(img.size)
+        if ratio < 1:
+            mode = 'L' if 'grayscale' in config.stages else img.mode
+            img.draft(mode, (int(img.size[0] * ratio) + 1, int(img.size[1] * ratio) + 1))
+    return img
+
+
+def preprocess(img, config):
+    stages = config.stages
+    if 'exif' in stages:
+        img = ImageOps.exif_transpose(img)
+    if 'grayscale' in stages and img.mode != 'L':
+        img = img.convert('L')
+    if 'downscale' in stages:
+        ratio = config.max_side / max(img.size)
+        if ratio < 1:
+            size = (max(1, round(img.size[0] * ratio)), max(1, round(img.size[1] * ratio)))
+            img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    if 'deskew' in stages:
+        img = deskew(img, config)
+    if 'binarize' in stages:
+        img = binarize(img, config.binarize_window, config.binarize_threshold)
+    return img
+
+
+def adaptive_threshold(pixels, window, threshold):
+    """
+    Bradley-Roth local mean threshold on a 2-D uint8 array: True where a pixel is
+    darker than (1 - threshold) x the mean of its window. Window sums come from an
+    integral image, so the cost does not depend on the window size.
+    """
+    height, width = pixels.shape
+    if window <= 0:
+        window = max(15, width // 8)
+    half = window // 2
+    integral = np.zeros((height + 1, width + 1), dtype=np.int64)
+    np.cumsum(np.cumsum(pixels, axis=0, dtype=np.int64), axis=1, out=integral[1:, 1:])
+    rows = np.arange(height)
+    cols = np.arange(width)
+    top, bottom = np.clip(rows - half, 0, height), np.clip(rows + half + 1, 0, height)
+    left, right = np.clip(cols - half, 0, width), np.clip(cols + half + 1, 0, width)
+    sums = (integral[np.ix_(bottom, right)] - integral[np.ix_(top, right)]
+            - integral[np.ix_(bottom, left)] + integral[np.ix_(top, left)])
+    counts = (bottom - top)[:, None] * (right - left)[None, :]
+    return pixels.astype(np.int64) * counts * 100 <= sums * int(round((1 - threshold) * 100))
+
+
+def binarize(img, window=0, threshold=0.15):
+    if img.mode != 'L':
+        img = img.convert('L')
+    dark = adaptive_threshold(np.asarray(img), window, threshold)
+    return Image.fromarray(np.where(dark, 0, 255).astype(np.uint8), 'L')
+
+
+def find_skew_angle(img, max_degrees, step_degrees, sample_side=800):
+    """
+    Angle (degrees, counter-clockwise) that makes text rows horizontal: the rotation
+    whose row-darkness profile has the sharpest transitions. Searched on a reduced copy.
+    """
+    small = img if img.mode == 'L' else img.convert('L')
+    ratio = sample_side / max(small.size)
+    if ratio < 1:
+        small = small.resize((max(1, round(small.size[0] * ratio)), max(1, round(small.size[1] * ratio))), Image.BILINEAR)
+    ink = Image.fromarray(np.where(adaptive_threshold(np.asarray(small), 0, 0.15), 255, 0).astype(np.uint8), 'L')
+    best_angle, best_score = 0.0, None
+    for angle in np.arange(-max_degrees, max_degrees + step_degrees / 2, step_degrees):
+        rows = np.asarray(ink.rotate(float(angle), resample=Image.NEAREST, fillcolor=0), dtype=np.int64).sum(axis=1)
+        score = int(np.square(np.diff(rows)).sum())
+        if best_score is None or score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def deskew(img, config):
+    angle = find_skew_angle(img, config.deskew_max_degrees, config.deskew_step_degrees)
+    if abs(angle) < config.deskew_step_degrees / 2:
+        return img
+    fill = 255 if img.mode == 'L' else (255,) * len(img.getbands())
+    return img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
@@ -0,0 +1,121 @@
+# services/visa_service/test_field_matcher.py
+# From the services/visa_service directory: python -m unittest test_field_matcher
+import unittest
+
+from field_matcher import FieldMatcher
+
+EXPECTED = {
+    'name': 'Priya Raghunathan', # 17 characters: 2 errors allowed with the defaults
+    'email': 'priya@acme.com', # 14 characters: 2 errors
+    'company': 'Acme Travel', # 11 characters: 1 error
+    'destination': 'Bonn', # 4 characters: no errors
+    'phone': '+91 98450 12345',
+}
+DETAILS = "Name: Priya Raghunathan\nEmail: priya@acme.com\nEmployer: Acme Travel\nDestination: Bonn\nPhone: +91 98450 12345\nAge: 34\n"
+
+
+def match(text, **options):
+    return FieldMatcher(EXPECTED, **options).match(text)
+
+
+class FieldMatcherTest(unittest.TestCase):
+
+    def test_exact_match_of_every_field(self):
+        matches = match(DETAILS)
+        self.assertEqual(matches.errors, {'name': 0, 'email': 0, 'company': 0, 'destination': 0, 'phone': 0})
+        self.assertEqual(matches.age, 34)
+        self.assertTrue(all(matches.checks.values()))
+        self.assertEqual(set(matches.confidence.values()), {1.0})
+
+    def test_case_and_whitespace_are_ignored(self):
+        matches = match("NAME: priya\n   RAGHUNATHAN\tage: 34")
+        self.assertEqual(matches.errors['name'], 0)
+
+    def test_substitution(self):
+        matches = match("Name: Priya Raghunathon")
+        self.assertEqual(matches.errors['name'], 1)
+        self.assertEqual(matches.confidence['name'], round(1 - 1 / 17, 3))
+
+    def test_insertion(self):
+        self.assertEqual(match("Name: Priya Raghunaathan").errors['name'], 1)
+
+    def test_deletion(self):
+        self.assertEqual(match("Name: Priya Ragunathan").errors['name'], 1)
+
+    def test_deletion_of_first_character_at_start_of_text(self):
+        self.assertEqual(match("riya Raghunathan").errors['name'], 1)
+        self.assertEqual(match("iya Raghunathan").errors['name'], 2)
+
+    def test_errors_up_to_the_field_tolerance(self):
+        self.assertEqual(match("Prija Raghunatham").errors['name'], 2)
+        self.assertIsNone(match("Prija Raghumatham").errors['name']) # 3 errors
+        self.assertEqual(match("Acne Travel").errors['company'], 1)
+        self.assertIsNone(match("Acne Trave1").errors['company']) # 2 errors, 11 characters allow 1
+
+    def test_short_fields_must_match_exactly(self):
+        self.assertEqual(match("Destination: Bonn").errors['destination'], 0)
+        self.assertIsNone(match("Destination: Bomn").errors['destination'])
+
+    def test_max_errors_caps_the_tolerance(self):
+        self.assertIsNone(match("Prija Raghunatham", max_errors=1).errors['name'])
+        self.assertIsNone(match("Priya Raghunathon", chars_per_error=0).errors['name'])
+
+    def test_best_match_is_kept(self):
+        matches = match("Prija Raghunatham ... Priya Raghunathon ... Priya Raghunathan")
+        self.assertEqual(matches.errors['name'], 0)
+
+    def test_phone_is_compared_on_digits_only(self):
+        self.assertEqual(match("Phone: (+91) 984-50-123 45").errors['phone'], 0)
+
+    def test_phone_with_a_wrong_digit_is_rejected_by_default(self):
+        self.assertIsNone(match("Phone: +91 98450 12845").errors['phone'])
+        self.assertEqual(match("Phone: +91 98450 12845", max_phone_errors=1).errors['phone'], 1)
+
+    def test_phone_missing_its_leading_digit(self):
+        self.assertIsNone(match("19845012345").errors['phone'])
+        self.assertEqual(match("19845012345", max_phone_errors=1).errors['phone'], 1)
+
+    def test_age_label_needs_a_word_boundary(self):
+        self.assertIsNone(match("Page: 12").age)
+        self.assertIsNone(match("Stage:7").age)
+        self.assertEqual(match("Page: 12 Age:41").age, 41)
+        self.assertEqual(match("(age: 29)").age, 29)
+
+    def test_age_value_must_be_a_whole_number(self):
+        self.assertIsNone(match("Age: 34x").age)
+        self.assertIsNone(match("Age: thirty").age)
+        self.assertEqual(match("Age: 34x Age: 35").age, 35)
+
+    def test_scan_stops_once_every_field_matched_exactly(self):
+        matcher = FieldMatcher(EXPECTED)
+        steps = []
+        step = matcher.text.step
+        matcher.text.step = lambda char: steps.append(char) or step(char)
+        matches = matcher.match(DETAILS + "x" * 10000)
+        self.assertTrue(all(matches.checks.values()))
+        self.assertLess(len(steps), len(DETAILS) + 10)
+
+    def test_scan_continues_while_a_field_is_only_approximate(self):
+        matcher = FieldMatcher(EXPECTED)
+        steps = []
+        step = matcher.text.step
+        matcher.text.step = lambda char: steps.append(char) or step(char)
+        text = DETAILS.replace('Raghunathan', 'Raghunathon') + "x" * 1000 + " Priya Raghunathan"
+        matches = matcher.match(text)
+        self.assertEqual(matches.errors['name'], 0)
+        self.assertEqual(len(steps), len(text))
+
+    def test_missing_fields(self):
+        matches = match("nothing to see here")
+        self.assertEqual(matches.checks, {field: False for field in matches.checks})
+        self.assertEqual(set(matches.confidence.values()), {0.0})
+
+    def test_matcher_can_be_reused(self):
+        matcher = FieldMatcher(EXPECTED)
+        self.assertEqual(matcher.match(DETAILS).errors['name'], 0)
+        self.assertIsNone(matcher.match("iya Raghunathan Age: 3").errors['email'])
+        self.assertEqual(matcher.match("riya Raghunathan").errors['name'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
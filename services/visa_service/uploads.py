@@ -0,0 +1,105 @@
+# services/visa_service/uploads.py
+# Visa uploads held in memory for OCR, spooled to a local file only when large, and stored
+# (document_store.py) only when the retention policy keeps them. Upload objects are sent to the OCR
+# worker processes (pickled with their bytes), so this module must not import app.py.
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+CHUNK_BYTES = 64 * 1024
+
+RETAIN_NONE = 'none'
+RETAIN_FAILED = 'failed' # Keep uploads whose verification did not succeed, e.g. for review
+RETAIN_ALL = 'all'
+RETENTION_POLICIES = (RETAIN_NONE, RETAIN_FAILED, RETAIN_ALL)
+
+
+class Upload:
+    """An uploaded file: its bytes (`data`) or, past the memory limit, a spooled file (`path`)."""
+    __slots__ = ('data', 'path', 'size', 'sha256')
+
+    def __init__(self, data, path, size, sha256):
+        self.data = data
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def in_memory(self):
+        return self.data is not None
+
+    def open(self):
+        """A binary file object positioned at the start (e.g. for Image.open)."""
+        return io.BytesIO(self.data) if self.in_memory else open(self.path, 'rb')
+
+    @contextlib.contextmanager
+    def local_path(self, directory=None):
+        """A filesystem path with the contents, for tools that only read files (poppler)."""
+        if not self.in_memory:
+            yield self.path
+            return
+        handle, path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, 'wb') as tmp:
+                tmp.write(self.data)
+            yield path
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def move_to(self, path):
+        """Writes the contents to `path`; a spooled file is moved there instead of copied."""
+        if self.in_memory:
+            with open(path, 'wb') as out:
+                out.write(self.data)
+        else:
+            shutil.move(self.path, path)
+            self.path = None
+
+    def discard(self):
+        """Drops the spooled file, if any (memory is freed with the object)."""
+        if self.path:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path)
+            self.path = None
+
+
+def read_upload(stream, max_memory_bytes, spool_dir):
+    """
+    Reads an upload stream once, hashing it on the way. Up to `max_memory_bytes` stay in
+    memory; a larger upload continues into a temporary file in `spool_dir` instead.
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    spool = None
+    path = None
+    size = 0
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_BYTES), b''):
+            digest.update(chunk)
+            size += len(chunk)
+            if spool is None and size > max_memory_bytes:
+                handle, path = tempfile.mkstemp(dir=spool_dir, suffix='.upload')
+                spool = os.fdopen(handle, 'wb')
+                spool.write(buffer)
+                buffer = None
+            if spool is not None:
+                spool.write(chunk)
+            else:
+                buffer += chunk
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(path)
+        raise
+    if spool is not None:
+        spool.close()
+        return Upload(None, path, size, digest.hexdigest())
+    return Upload(bytes(buffer), None, size, digest.hexdigest())
+
+
+def should_retain(policy, status):
+    return policy == RETAIN_ALL or (policy == RETAIN_FAILED and status != 200)
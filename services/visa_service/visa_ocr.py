@@ -0,0 +1,131 @@
+# services/visa_service/visa_ocr.py
+# OCR and the visa checks. Runs inside the OCR worker processes (see ocr_jobs.py), so it must
+# not import app.py and every result it returns has to be picklable.
+import os
+import re
+
+import pytesseract
+from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+from PIL import Image
+
+from field_matcher import FieldMatcher
+from pdf_ocr import ocr_pdf
+from preprocess import PreprocessConfig, open_image, preprocess
+
+# Part of the OCR cache key (ocr_cache.py): bump when OCR output for the same bytes would change.
+# The preprocessing settings are part of the key too, see pipeline_key().
+OCR_PIPELINE_VERSION = 3
+
+# Read from the environment in each worker process (spawned workers inherit the service's env)
+PREPROCESS_CONFIG = PreprocessConfig.from_env()
+# OCR worker processes (the pool in app.py / ocr_jobs.py); read here too because the page threads below depend on it
+VISA_OCR_WORKERS = int(os.environ.get('VISA_OCR_WORKERS', str(os.cpu_count() or 2)))
+# Pages of one PDF OCRed at the same time, and the most pages read from one upload. Each page thread
+# runs its own pdftoppm and tesseract, and every worker has its own page threads, so up to
+# VISA_OCR_WORKERS x VISA_OCR_PDF_PAGE_THREADS OCR processes run at once: the default splits the CPUs.
+VISA_OCR_PDF_PAGE_THREADS = int(os.environ.get(
+    'VISA_OCR_PDF_PAGE_THREADS', str(max(1, (os.cpu_count() or 2) // VISA_OCR_WORKERS))
+))
+VISA_OCR_PDF_MAX_PAGES = int(os.environ.get('VISA_OCR_PDF_MAX_PAGES', '20'))
+# OCR errors tolerated per field (field_matcher.py): one per VISA_MATCH_CHARS_PER_ERROR characters,
+# at most VISA_MATCH_MAX_ERRORS. The phone number's digits must match exactly by default: one wrong
+# digit is a different number, not an OCR error (VISA_MATCH_MAX_PHONE_ERRORS allows some anyway)
+VISA_MATCH_MAX_ERRORS = int(os.environ.get('VISA_MATCH_MAX_ERRORS', '2'))
+VISA_MATCH_CHARS_PER_ERROR = int(os.environ.get('VISA_MATCH_CHARS_PER_ERROR', '6'))
+VISA_MATCH_MAX_PHONE_ERRORS = int(os.environ.get('VISA_MATCH_MAX_PHONE_ERRORS', '0'))
+
+
+def pipeline_key():
+    return f"v{OCR_PIPELINE_VERSION}.{PREPROCESS_CONFIG.signature()}"
+
+
+# === Helper: Extract Age Function ===
+def extract_age_from_text(text):
+    """Searches text for 'Age: XX' (case-insensitive) and returns integer age or None."""
+    match = re.search(r'\bAge:\s*(\d+)\b', text, re.IGNORECASE)
+    if match:
+        try:
+            return int(match.group(1))
+        except ValueError:
+            return None
+    return None
+
+# === Helper: Normalize Phone Number ===
+def normalize_phone(phone_string):
+    """Removes all non-digit characters from a string."""
+    if not phone_string:
+        return ""
+    return re.sub(r'\D', '', phone_string)
+
+
+def ocr_file(upload, filename, config=None, is_enough=None):
+    """
+    Returns (OCR text, complete) for an uploaded image or PDF (an uploads.Upload). PDFs stop
+    early once `is_enough(text)` is true, in which case `complete` is False; images are always complete.
+    """
+    config = config or PREPROCESS_CONFIG
+    if filename.lower().endswith('.pdf'):
+        # poppler reads files only: an in-memory PDF gets a temporary file for the duration
+        with upload.local_path() as path:
+            return ocr_pdf(path, config, VISA_OCR_PDF_PAGE_THREADS, VISA_OCR_PDF_MAX_PAGES, is_enough)
+    with upload.open() as source, open_image(source, config) as img:
+        return pytesseract.image_to_string(preprocess(img, config)), True
+
+
+def check_visa_text(text, expected):
+    """
+    Compares OCR text with the traveller's details ({'name', 'email', 'company',
+    'destination', 'phone'}). Returns (http status, response body, checks).
+    """
+    # One pass over the text for every field, tolerating a few OCR errors; phone numbers are compared digits-only
+    matches = FieldMatcher(
+        expected, VISA_MATCH_MAX_ERRORS, VISA_MATCH_CHARS_PER_ERROR, VISA_MATCH_MAX_PHONE_ERRORS
+    ).match(text)
+    checks = matches.checks
+    extracted_age = matches.age
+
+    if all(checks.values()):
+        return 200, {
+            'status': 'success',
+            'message': f'✅ Visa verified successfully (including destination, phone, and age). Extracted Age: {extracted_age}',
+            'extracted_age': extracted_age,
+            'field_confidence': matches.confidence,
+        }, checks
+
+    missing_details = []
+    if not checks['name']: missing_details.append("name")
+    if not checks['email']: missing_details.append("email")
+    if not checks['company']: missing_details.append("company")
+    if not checks['destination']: missing_details.append(f"destination ({expected['destination']})")
+    if not checks['phone']: missing_details.append("phone number")
+    if not checks['age']: missing_details.append("age (expected format 'Age: XX')")
+    message = f'❌ Visa details mismatch or required info not found. Check failed for: {", ".join(missing_details)}.' if missing_details else '❌ Visa details do not match required criteria.'
+    return 403, {'status': 'error', 'message': message, 'field_confidence': matches.confidence}, checks
+
+
+def all_fields_found(text, expected):
+    return all(check_visa_text(text, expected)[2].values())
+
+
+def verify_visa_file(upload, filename, expected):
+    """
+    Worker entry point: OCR + checks for one upload. Returns (status, body,
+    checks, OCR text, complete) and never raises; errors become (status, body, None,
+    None, False) so they cross the process boundary intact. `complete` is False when
+    the text only covers the PDF pages that were needed to find every field.
+    """
+    try:
+        text, complete = ocr_file(upload, filename, is_enough=lambda text: all_fields_found(text, expected))
+    except pytesseract.TesseractNotFoundError:
+        return 500, {'status': 'error', 'message': 'Server configuration error: OCR engine not found.'}, None, None, False
+    except PDFInfoNotInstalledError:
+        return 500, {'status': 'error', 'message': 'Server configuration error: PDF renderer not found.'}, None, None, False
+    except FileNotFoundError:
+        return 500, {'status': 'error', 'message': 'Server error: Could not find spooled upload file.'}, None, None, False
+    except Image.UnidentifiedImageError:
+        return 400, {'status': 'error', 'message': 'Uploaded file is not a valid or supported image format.'}, None, None, False
+    except (PDFPageCountError, PDFSyntaxError):
+        return 400, {'status': 'error', 'message': 'Uploaded file is not a valid PDF.'}, None, None, False
+    except Exception:
+        return 500, {'status': 'error', 'message': 'OCR processing failed or other internal error occurred.'}, None, None, False
+    return (*check_visa_text(text, expected), text, complete)